@@ -0,0 +1,2 @@
+from benchmarks.fakes.hana import FakeHana
+from benchmarks.fakes.openai_server import FakeOpenAIServer
@@ -0,0 +1,232 @@
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+# SQLite-backed stand-in for hdbcli.dbapi. It understands the HANA dialect this app uses
+# (DUMMY, SYS catalog views, CREATE COLUMN TABLE, ALTER TABLE ... ADD (...), UTC timestamps,
+# UPSERT ... WHERE) by rewriting statements before handing them to SQLite. Every connection
+# opened through one FakeHana shares the same database file, like connections to the same
+# HANA schema do.
+
+SKILLS_DDL = """
+CREATE TABLE IF NOT EXISTS SKILLS (
+    SkillID INTEGER PRIMARY KEY AUTOINCREMENT,
+    SkillName NVARCHAR(256),
+    SkillDescription NVARCHAR(5000),
+    Parameters NCLOB,
+    PythonFunction NCLOB
+)
+"""
+
+SKILLS_BACKUP_DDL = """
+CREATE TABLE IF NOT EXISTS SKILLS_BACKUP (
+    SkillID INTEGER PRIMARY KEY,
+    SkillName NVARCHAR(256),
+    SkillDescription NVARCHAR(5000),
+    Parameters NCLOB,
+    PythonFunction NCLOB
+)
+"""
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_REWRITES = [
+    (re.compile(r'\s+FROM\s+DUMMY\b', re.IGNORECASE), ''),
+    (re.compile(r'\bCREATE\s+COLUMN\s+TABLE\b', re.IGNORECASE), 'CREATE TABLE'),
+    # millisecond resolution like HANA's TIMESTAMP, so back-to-back writes get distinct ModifiedAt values
+    (re.compile(r'\bCURRENT_UTCTIMESTAMP\b', re.IGNORECASE), "(STRFTIME('%Y-%m-%d %H:%M:%f', 'now'))"),
+    (re.compile(r'\bALTER\s+TABLE\s+(\w+)\s+ADD\s*\((\w+)\s+(.*)\)\s*$', re.IGNORECASE | re.DOTALL),
+     r'ALTER TABLE \1 ADD COLUMN \2 \3'),
+    (re.compile(r'SELECT\s+COUNT\(\*\)\s+FROM\s+SYS\.TABLES\s+WHERE\s+SCHEMA_NAME\s*=\s*CURRENT_SCHEMA\s+AND\s+TABLE_NAME\s*=\s*\?',
+                re.IGNORECASE),
+     "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND UPPER(name) = ?"),
+    (re.compile(r'SELECT\s+COLUMN_NAME\s+FROM\s+SYS\.TABLE_COLUMNS\s+WHERE\s+SCHEMA_NAME\s*=\s*CURRENT_SCHEMA\s+AND\s+TABLE_NAME\s*=\s*\?',
+                re.IGNORECASE),
+     'SELECT name FROM pragma_table_info(?)'),
+]
+
+
+_UPSERT = re.compile(r'^\s*UPSERT\s+(\w+)\s*\(([^)]*)\)\s*VALUES\s*\((.*)\)\s*WHERE\s+(.*?)\s*$',
+                     re.IGNORECASE | re.DOTALL)
+
+
+def translate_upsert(sql):
+    """``UPSERT t (cols) VALUES (...) WHERE key = ?`` -> SQLite ``INSERT ... ON CONFLICT DO UPDATE``.
+
+    Returns the statement and how many trailing parameters (the WHERE placeholders) to drop.
+    The key columns must carry a unique constraint in the fake schema.
+    """
+    match = _UPSERT.match(sql)
+    if not match:
+        return sql, 0
+    table, columns, values, where = match.groups()
+    keys = re.findall(r'(\w+)\s*=\s*\?', where)
+    updates = ', '.join(f"{c.strip()} = excluded.{c.strip()}" for c in columns.split(',') if c.strip() not in keys)
+    return (f"INSERT INTO {table} ({columns}) VALUES ({values}) "
+            f"ON CONFLICT({', '.join(keys)}) DO UPDATE SET {updates}"), where.count('?')
+
+
+def translate(sql):
+    for pattern, replacement in _REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def _add_seconds(timestamp, seconds):
+    if timestamp is None:
+        return None
+    value = datetime.strptime(str(timestamp)[:19], TIMESTAMP_FORMAT) + timedelta(seconds=seconds)
+    return value.strftime(TIMESTAMP_FORMAT) + str(timestamp)[19:23]
+
+
+class Error(Exception):
+    pass
+
+
+class Cursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._sqlite.cursor()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, operation, parameters=None):
+        self.connection._fake.count(operation)
+        self.connection._fake.sleep()
+        operation, trim = translate_upsert(translate(operation))
+        parameters = tuple(parameters or ())
+        try:
+            self._cursor.execute(operation, parameters[:len(parameters) - trim])
+        except sqlite3.Error as e:
+            raise Error(str(e)) from e
+        return True
+
+    def executemany(self, operation, seq_of_parameters):
+        self.connection._fake.count(operation)
+        self.connection._fake.sleep()
+        operation, trim = translate_upsert(translate(operation))
+        try:
+            self._cursor.executemany(operation, [tuple(p)[:len(p) - trim] for p in seq_of_parameters])
+        except sqlite3.Error as e:
+            raise Error(str(e)) from e
+        return True
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size) if size else self._cursor.fetchmany()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class Connection:
+    def __init__(self, fake):
+        self._fake = fake
+        self._sqlite = sqlite3.connect(fake.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._sqlite.create_function('ADD_SECONDS', 2, _add_seconds)
+        self._autocommit = True
+        self._open = True
+
+    def cursor(self):
+        return Cursor(self)
+
+    def setautocommit(self, autocommit):
+        if autocommit == self._autocommit:
+            return
+        self._autocommit = autocommit
+        if not autocommit:
+            self._sqlite.execute('BEGIN')
+        elif self._sqlite.in_transaction:
+            self._sqlite.execute('COMMIT')
+
+    def getautocommit(self):
+        return self._autocommit
+
+    def commit(self):
+        if self._sqlite.in_transaction:
+            self._sqlite.execute('COMMIT')
+        if not self._autocommit:
+            self._sqlite.execute('BEGIN')
+
+    def rollback(self):
+        if self._sqlite.in_transaction:
+            self._sqlite.execute('ROLLBACK')
+        if not self._autocommit:
+            self._sqlite.execute('BEGIN')
+
+    def isconnected(self):
+        return self._open
+
+    def close(self):
+        self._open = False
+        self._sqlite.close()
+
+
+class FakeHana:
+    """A shared SQLite database plus query counters; ``connect`` mirrors ``dbapi.connect``."""
+
+    def __init__(self, path, latency=0.0):
+        self.path = path
+        self.latency = latency
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.connections = 0
+        self._failures = []  # [pattern, matching statements to let through first]
+        with sqlite3.connect(path) as conn:
+            conn.execute(SKILLS_DDL)
+            conn.execute(SKILLS_BACKUP_DDL)
+
+    def connect(self, address=None, port=None, user=None, password=None, **kwargs):
+        with self._lock:
+            self.connections += 1
+        return Connection(self)
+
+    def count(self, operation):
+        with self._lock:
+            self.queries += 1
+            for failure in self._failures:
+                if failure[0].search(operation):
+                    failure[1] -= 1
+                    if failure[1] < 0:
+                        self._failures.remove(failure)
+                        raise Error(f"injected failure: {operation.strip()[:60]}")
+
+    def fail_on(self, pattern, skip=0):
+        """Make the statement after the next ``skip`` ones matching ``pattern`` raise ``Error``."""
+        with self._lock:
+            self._failures.append([re.compile(pattern, re.IGNORECASE), skip])
+
+    def sleep(self):
+        if self.latency:
+            import time
+            time.sleep(self.latency)
+
+    def seed_skills(self, skills):
+        """Insert ``(name, description, parameters, source)`` tuples into SKILLS."""
+        with sqlite3.connect(self.path) as conn:
+            conn.executemany(
+                "INSERT INTO SKILLS (SkillName, SkillDescription, Parameters, PythonFunction) VALUES (?, ?, ?, ?)",
+                list(skills)
+            )
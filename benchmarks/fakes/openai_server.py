@@ -0,0 +1,353 @@
+import re
+import json
+import time
+import uuid
+import random
+import threading
+from collections import Counter
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# In-process HTTP stand-in for the OpenAI Assistants endpoints the app uses. Point a real
+# ``OpenAI(base_url=server.base_url)`` client at it. Latency, the status sequence every run
+# walks through, the share of runs that stop for tool calls and injected HTTP failures (e.g. 429s)
+# are configurable, and every request is counted per route so benchmarks can report API calls per stage. ``stream: true`` on run create
+# and submit_tool_outputs answers with server-sent events like the real streaming runs API.
+
+DEFAULT_RUN_STATUSES = ("queued", "in_progress", "requires_action", "in_progress", "completed")
+ANSWER_TEXT = "Here is your answer."
+TERMINAL_STATUSES = ("requires_action", "completed", "cancelled", "failed", "expired")
+
+
+def _id(prefix):
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+def _message(thread_id, role, text, run_id=None):
+    return {
+        "id": _id("msg"), "object": "thread.message", "created_at": int(time.time()),
+        "thread_id": thread_id, "role": role, "status": "completed",
+        "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+        "assistant_id": None, "run_id": run_id, "attachments": [], "metadata": {},
+    }
+
+
+class FakeOpenAIState:
+    def __init__(self, latency=0.0, run_statuses=DEFAULT_RUN_STATUSES, tool_calls=(), failures=(), failure_rate=0.0,
+                 failure_status=429, seed=0, stream_delay=0.0, tool_call_rate=1.0):
+        self.latency = latency
+        self.stream_delay = stream_delay  # seconds between streamed run steps and text deltas
+        self.run_statuses = tuple(run_statuses)
+        self.tool_calls = list(tool_calls)  # (function name, arguments dict) per requires_action step
+        self.tool_call_rate = tool_call_rate  # share of runs that go through requires_action
+        self.failures = list(failures)  # HTTP statuses returned by the next requests, in order
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.assistants = {}
+        self.threads = {}  # thread id -> list of messages in creation order
+        self.runs = {}  # run id -> (run dict, position in run_statuses)
+        self.runs_without_tools = set()  # runs that skip requires_action
+        self._random = random.Random(seed)
+
+    def next_failure(self):
+        with self.lock:
+            if self.failures:
+                return self.failures.pop(0)
+            if self.failure_rate and self._random.random() < self.failure_rate:
+                return self.failure_status
+        return None
+
+    def seed_thread(self, count):
+        thread_id = _id("thread")
+        with self.lock:
+            self.threads[thread_id] = [
+                _message(thread_id, "user" if i % 2 == 0 else "assistant", f"message {i}") for i in range(count)
+            ]
+        return thread_id
+
+    def api_calls(self):
+        with self.lock:
+            return sum(self.calls.values())
+
+
+class EventStream:
+    """Handler result that is sent as ``text/event-stream``: an iterable of (event, data) pairs."""
+
+    def __init__(self, events):
+        self.events = events
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out as separate writes; without this Nagle adds ~40ms per request
+    disable_nagle_algorithm = True
+    routes = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_events(self, status, stream, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.close_connection = True
+        for event, data in stream.events:
+            self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"event: done\ndata: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _dispatch(self, method):
+        state = self.server.state
+        parts = urlsplit(self.path)
+        path = parts.path[len("/v1"):] if parts.path.startswith("/v1") else parts.path
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        body = self._body() if method == "POST" else {}
+
+        for route_method, pattern, name, handler in self.routes:
+            match = pattern.fullmatch(path) if route_method == method else None
+            if match:
+                with state.lock:
+                    state.calls[name] += 1
+                if state.latency:
+                    time.sleep(state.latency)
+                failure = state.next_failure()
+                if failure:
+                    headers = {"retry-after-ms": "50", "x-ratelimit-remaining-requests": "0",
+                               "x-ratelimit-reset-requests": "50ms"} if failure == 429 else {}
+                    return self._send(failure, {"error": {"message": f"injected {failure}", "type": "fake",
+                                                          "code": str(failure)}}, headers)
+                status, payload = handler(state, query, body, *match.groups())
+                headers = {"x-ratelimit-remaining-requests": "1000", "x-ratelimit-limit-requests": "1000"}
+                if isinstance(payload, EventStream):
+                    return self._send_events(status, payload, headers)
+                return self._send(status, payload, headers)
+        self._send(404, {"error": {"message": f"no route for {method} {path}", "type": "not_found"}})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+def route(method, template, name):
+    pattern = re.compile(template.replace("{id}", r"([^/]+)"))
+
+    def register(function):
+        Handler.routes.append((method, pattern, name, function))
+        return function
+    return register
+
+
+@route("GET", "/models", "models.list")
+def list_models(state, query, body):
+    return 200, {"object": "list", "data": [{"id": "gpt-3.5-turbo-1106", "object": "model", "created": 0,
+                                             "owned_by": "openai"}]}
+
+
+@route("POST", "/assistants", "assistants.create")
+def create_assistant(state, query, body):
+    assistant = dict(body, id=_id("asst"), object="assistant", created_at=int(time.time()))
+    with state.lock:
+        state.assistants[assistant["id"]] = assistant
+    return 200, assistant
+
+
+@route("GET", "/assistants/{id}", "assistants.retrieve")
+def retrieve_assistant(state, query, body, assistant_id):
+    assistant = state.assistants.get(assistant_id)
+    return (200, assistant) if assistant else (404, {"error": {"message": "No assistant found"}})
+
+
+@route("DELETE", "/assistants/{id}", "assistants.delete")
+def delete_assistant(state, query, body, assistant_id):
+    with state.lock:
+        state.assistants.pop(assistant_id, None)
+    return 200, {"id": assistant_id, "object": "assistant.deleted", "deleted": True}
+
+
+@route("POST", "/threads", "threads.create")
+def create_thread(state, query, body):
+    thread_id = _id("thread")
+    with state.lock:
+        state.threads[thread_id] = []
+    return 200, {"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {}}
+
+
+@route("POST", "/threads/{id}/messages", "messages.create")
+def create_message(state, query, body, thread_id):
+    content = body.get("content")
+    text = content if isinstance(content, str) else json.dumps(content)
+    message = _message(thread_id, body.get("role", "user"), text)
+    with state.lock:
+        state.threads.setdefault(thread_id, []).append(message)
+    return 200, message
+
+
+@route("GET", "/threads/{id}/messages", "messages.list")
+def list_messages(state, query, body, thread_id):
+    limit = int(query.get("limit", 20))
+    with state.lock:
+        messages = list(state.threads.get(thread_id, []))
+    if query.get("order", "desc") == "desc":
+        messages.reverse()
+    if "after" in query:
+        ids = [message["id"] for message in messages]
+        start = ids.index(query["after"]) + 1 if query["after"] in ids else len(messages)
+        messages = messages[start:]
+    page = messages[:limit]
+    return 200, {"object": "list", "data": page, "first_id": page[0]["id"] if page else None,
+                 "last_id": page[-1]["id"] if page else None, "has_more": len(messages) > limit}
+
+
+def _advance(state, run_id):
+    run, position = state.runs[run_id]
+    if run["status"] in ("requires_action", "completed", "cancelled", "failed", "expired"):
+        return run
+    position = min(position + 1, len(state.run_statuses) - 1)
+    status = state.run_statuses[position]
+    if status == "requires_action" and run_id in state.runs_without_tools:
+        position = min(position + 1, len(state.run_statuses) - 1)
+        status = state.run_statuses[position]
+    run = dict(run, status=status, required_action=None)
+    if status == "requires_action":
+        run["required_action"] = {"type": "submit_tool_outputs", "submit_tool_outputs": {"tool_calls": [
+            {"id": _id("call"), "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+            for name, arguments in state.tool_calls
+        ]}}
+    if status == "completed":
+        state.threads.setdefault(run["thread_id"], []).append(
+            _message(run["thread_id"], "assistant", ANSWER_TEXT, run_id=run_id))
+    state.runs[run_id] = (run, position)
+    return run
+
+
+def _run_events(state, run_id, created=False):
+    """Walk the run to its next stop like ``runs.retrieve`` would, as stream events."""
+    with state.lock:
+        run = state.runs[run_id][0]
+    if created:
+        yield "thread.run.created", run
+    yield f"thread.run.{run['status']}", run
+    while run["status"] not in TERMINAL_STATUSES:
+        if state.stream_delay:
+            time.sleep(state.stream_delay)
+        with state.lock:
+            run = _advance(state, run_id)
+            message = state.threads[run["thread_id"]][-1] if run["status"] == "completed" else None
+        if message is not None:
+            yield "thread.message.created", dict(message, status="in_progress", content=[])
+            for index, word in enumerate(re.findall(r"\S+\s*", ANSWER_TEXT)):
+                if state.stream_delay:
+                    time.sleep(state.stream_delay)
+                yield "thread.message.delta", {"id": message["id"], "object": "thread.message.delta", "delta": {
+                    "content": [{"index": 0, "type": "text", "text": {"value": word, "annotations": []}}]}}
+            yield "thread.message.completed", message
+        yield f"thread.run.{run['status']}", run
+
+
+@route("POST", "/threads/{id}/runs", "runs.create")
+def create_run(state, query, body, thread_id):
+    run = {"id": _id("run"), "object": "thread.run", "created_at": int(time.time()), "thread_id": thread_id,
+           "assistant_id": body.get("assistant_id"), "status": state.run_statuses[0], "required_action": None,
+           "model": "gpt-3.5-turbo-1106", "instructions": body.get("instructions") or "", "tools": [],
+           "metadata": {}}
+    with state.lock:
+        state.runs[run["id"]] = (run, 0)
+        if state.tool_call_rate < 1.0 and state._random.random() >= state.tool_call_rate:
+            state.runs_without_tools.add(run["id"])
+    if body.get("stream"):
+        return 200, EventStream(_run_events(state, run["id"], created=True))
+    return 200, run
+
+
+@route("GET", "/threads/{id}/runs/{id}", "runs.retrieve")
+def retrieve_run(state, query, body, thread_id, run_id):
+    with state.lock:
+        return 200, _advance(state, run_id)
+
+
+@route("POST", "/threads/{id}/runs/{id}/submit_tool_outputs", "runs.submit_tool_outputs")
+def submit_tool_outputs(state, query, body, thread_id, run_id):
+    with state.lock:
+        run, position = state.runs[run_id]
+        run = dict(run, status="queued", required_action=None)
+        state.runs[run_id] = (run, position)
+    if body.get("stream"):
+        return 200, EventStream(_run_events(state, run_id))
+    return 200, run
+
+
+@route("POST", "/threads/{id}/runs/{id}/cancel", "runs.cancel")
+def cancel_run(state, query, body, thread_id, run_id):
+    with state.lock:
+        run, position = state.runs[run_id]
+        run = dict(run, status="cancelled", required_action=None)
+        state.runs[run_id] = (run, position)
+    return 200, run
+
+
+class FakeOpenAIServer:
+    """Runs the stand-in on a free localhost port in a background thread."""
+
+    def __init__(self, **state_options):
+        self.state = FakeOpenAIState(**state_options)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._server.state = self.state
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def client(self, api_key="bench", **kwargs):
+        from openai import OpenAI
+        kwargs.setdefault("max_retries", 0)
+        return OpenAI(api_key=api_key, base_url=self.base_url, **kwargs)
+
+    def async_client(self, api_key="bench", **kwargs):
+        from openai import AsyncOpenAI
+        kwargs.setdefault("max_retries", 0)
+        return AsyncOpenAI(api_key=api_key, base_url=self.base_url, **kwargs)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
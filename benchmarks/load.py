@@ -0,0 +1,394 @@
+"""Multi-session load test of the chat and Skills Studio pages.
+
+Drives concurrent sessions through pages/1_chat_window.py and pages/2_skills_studio.py with
+Streamlit's AppTest, all in this process and against the local stand-ins (benchmarks.fakes) for
+HANA and the OpenAI Assistants API. The load ramps through the given numbers of sessions; every
+step reports throughput, turn latency percentiles, memory per session and the error rate and
+checks them against the SLO thresholds. The exit code is 1 when a step missed an SLO.
+
+    python -m benchmarks.load                                      # ramp through 1, 5, 10 and 25 sessions
+    python -m benchmarks.load --sessions 1,10,50 --turns 5 --latency 0.1
+    python -m benchmarks.load --failure-rate 0.05 --tool-call-rate 0.3 --slo-p95-ms 4000
+
+A turn is one interaction that reruns a page: a chat prompt, or a search or page flip in the
+Skills Studio. Memory per session is the growth of this process' RSS while a step's sessions are
+alive divided by their number, so it is an estimate that includes AppTest's own bookkeeping.
+"""
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import warnings
+from collections import Counter, defaultdict
+
+from benchmarks.fakes import FakeHana, FakeOpenAIServer
+from benchmarks.fakes.openai_server import ANSWER_TEXT
+from benchmarks.run import TOOL_CALLS, bench_skills, percentile
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pages')
+CHAT_PAGE = os.path.join(PAGES_DIR, '1_chat_window.py')
+STUDIO_PAGE = os.path.join(PAGES_DIR, '2_skills_studio.py')
+
+PROMPTS = [
+    "What is the weather in Paris?",
+    "Do I have open approvals in Fieldglass?",
+    "How many Swiss francs do I get for 100 euros?",
+    "Thanks, that is all.",
+]
+SEARCHES = ["weather", "filler", "rate", ""]
+
+TURN_ACTIONS = ('chat.turn', 'studio.search', 'studio.page')
+# the chat page's fragment timer, which AppTest does not run on its own
+RUN_REFRESH_SECONDS = float(os.getenv('CHAT_RUN_REFRESH_SECONDS', '0.25'))
+
+
+class Recorder:
+    """Collects the latency and outcome of every page run of one ramp step, from all sessions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings = defaultdict(list)  # action -> ms
+        self.errors = Counter()
+        self.messages = Counter()
+
+    def timed(self, action, run, check):
+        """Run ``run()``, record how long it took and whether ``check()`` holds afterwards."""
+        started = time.perf_counter()
+        try:
+            run()
+            error = check()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.timings[action].append(elapsed)
+            if error:
+                self.errors[action] += 1
+                self.messages[error[:120]] += 1
+        return not error
+
+
+def allow_concurrent_apptests():
+    """Let AppTest runs of several sessions overlap in this process.
+
+    AppTest installs a mock Runtime for each run and removes it when the run ends, which pulls
+    it out from under the scripts of the other sessions still running; keep serving the last one
+    that was installed instead. Every run also compiles the page again, and Python 3.11 can fail
+    two ast.parse calls running at the same time, so compiling is serialized.
+    """
+    from streamlit.runtime.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    if getattr(Runtime, '_load_test_shared', False):
+        return
+    last = []
+    compile_lock = threading.Lock()
+    get_bytecode = ScriptCache.get_bytecode
+
+    def locked_get_bytecode(self, script_path):
+        with compile_lock:
+            return get_bytecode(self, script_path)
+
+    def instance(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+        if not last:
+            raise RuntimeError("Runtime hasn't been created!")
+        return last[0]
+
+    def exists(cls):
+        return cls._instance is not None or bool(last)
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+    Runtime._load_test_shared = True
+    ScriptCache.get_bytecode = locked_get_bytecode
+
+
+def page_error(at):
+    """Why the last run of ``at`` counts as failed, or None."""
+    if at.exception:
+        return f"exception: {at.exception[0].value}"
+    if at.error:
+        return f"st.error: {at.error[0].value}"
+    return None
+
+
+def answered(at):
+    error = page_error(at)
+    if error:
+        return error
+    messages = at.chat_message
+    if not messages or messages[-1].name != 'assistant' or not any(
+            ANSWER_TEXT in str(markdown.value) for markdown in messages[-1].markdown):
+        return "no assistant answer after the turn"
+    return None
+
+
+def send_prompt(at, prompt, timeout):
+    """Submit ``prompt`` and rerun the page until the engine run it started has been collected."""
+    at.chat_input[0].set_value(prompt).run()
+    deadline = time.monotonic() + timeout
+    while 'pending_run' in at.session_state:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"no answer within {timeout}s")
+        time.sleep(RUN_REFRESH_SECONDS)
+        at.run()
+
+
+def chat_session(recorder, turns, think_time, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(CHAT_PAGE, default_timeout=timeout)
+    if not recorder.timed('chat.open', at.run, lambda: page_error(at)):
+        return at
+    for turn in range(turns):
+        prompt = PROMPTS[turn % len(PROMPTS)]
+        recorder.timed('chat.turn', lambda: send_prompt(at, prompt, timeout), lambda: answered(at))
+        time.sleep(think_time)
+    return at
+
+
+def studio_session(recorder, turns, think_time, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(STUDIO_PAGE, default_timeout=timeout)
+    if not recorder.timed('studio.open', at.run, lambda: page_error(at)):
+        return at
+    for turn in range(turns):
+        if turn % 2 == 0:
+            search = SEARCHES[(turn // 2) % len(SEARCHES)]
+            recorder.timed('studio.search', lambda: at.text_input[0].set_value(search).run(), lambda: page_error(at))
+        else:
+            buttons = {button.label: button for button in at.button}
+            button = buttons.get("Next ➡️")
+            if button is None or button.disabled:
+                button = buttons.get("⬅️ Previous")
+            if button is None or button.disabled:
+                recorder.timed('studio.page', at.run, lambda: page_error(at))
+            else:
+                recorder.timed('studio.page', lambda: button.click().run(), lambda: page_error(at))
+        time.sleep(think_time)
+    return at
+
+
+class LoadEnvironment:
+    """Fake HANA + fake OpenAI, with the app's pool and environment pointed at them."""
+
+    def __init__(self, workdir, skill_count, latency, tool_calls, tool_call_rate, failure_rate, stream_delay):
+        self.hana = FakeHana(os.path.join(workdir, 'hana.sqlite3'))
+        self.hana.seed_skills(bench_skills(skill_count))
+        self.server = FakeOpenAIServer(latency=latency, tool_calls=tool_calls, tool_call_rate=tool_call_rate,
+                                       failure_rate=failure_rate, failure_status=429,
+                                       stream_delay=stream_delay).start()
+        # read by every OpenAI and AsyncOpenAI client the pages and the run engine create
+        os.environ['OPENAI_BASE_URL'] = self.server.base_url
+        os.environ['OPENAI_API_KEY'] = 'bench'
+        os.environ.setdefault('SAP_API_KEY', 'bench')
+
+        from octo_packages import db
+
+        self.pool = db._pool = db.ConnectionPool(self.hana.connect, ping_query="SELECT 1 FROM DUMMY")
+
+    def counters(self):
+        return self.server.state.api_calls(), self.hana.queries
+
+    def close(self):
+        from octo_packages import session_store
+
+        # write the queued session bindings while the pool is still open
+        if session_store._store is not None:
+            session_store._store.close()
+        self.pool.close()
+        self.server.stop()
+
+
+def run_step(env, sessions, studio_share, turns, think_time, ramp_seconds, timeout):
+    """Run ``sessions`` concurrent sessions to completion and summarize them."""
+    from octo_packages.bootstrap import rss_mb
+
+    recorder = Recorder()
+    studio_sessions = round(sessions * studio_share)
+    apps = []
+    apps_lock = threading.Lock()
+
+    def session(index):
+        # spread the session starts over the ramp so they do not all open in the same instant
+        time.sleep(ramp_seconds * index / sessions)
+        user = studio_session if index < studio_sessions else chat_session
+        try:
+            at = user(recorder, turns, think_time, timeout)
+        except Exception as e:
+            with recorder._lock:
+                recorder.errors['session'] += 1
+                recorder.messages[f"{type(e).__name__}: {e}"[:120]] += 1
+            return
+        with apps_lock:
+            apps.append(at)
+
+    gc.collect()
+    rss_before = rss_mb()
+    api_before, db_before = env.counters()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(index,), name=f"load-session-{index}", daemon=True)
+               for index in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    api_after, db_after = env.counters()
+    # the sessions' state is still referenced by ``apps`` here
+    gc.collect()
+    rss_after = rss_mb()
+    del apps[:]
+
+    turn_timings = [ms for action in TURN_ACTIONS for ms in recorder.timings[action]]
+    operations = sum(len(timings) for timings in recorder.timings.values()) + recorder.errors['session']
+    turn_errors = sum(recorder.errors[action] for action in TURN_ACTIONS)
+    return {
+        'sessions': sessions,
+        'studio_sessions': studio_sessions,
+        'seconds': elapsed,
+        'turns': len(turn_timings),
+        'throughput_tps': (len(turn_timings) - turn_errors) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(turn_timings, 0.50) if turn_timings else None,
+        'p95_ms': percentile(turn_timings, 0.95) if turn_timings else None,
+        'p99_ms': percentile(turn_timings, 0.99) if turn_timings else None,
+        'memory_per_session_mb': max(0.0, rss_after - rss_before) / sessions,
+        'rss_mb': rss_after,
+        'errors': sum(recorder.errors.values()),
+        'error_rate': sum(recorder.errors.values()) / operations if operations else 0.0,
+        'api_calls': api_after - api_before,
+        'db_queries': db_after - db_before,
+        'actions': {
+            action: {'count': len(timings), 'errors': recorder.errors[action],
+                     'p50_ms': percentile(timings, 0.50), 'p95_ms': percentile(timings, 0.95),
+                     'p99_ms': percentile(timings, 0.99)}
+            for action, timings in sorted(recorder.timings.items()) if timings
+        },
+        'error_messages': dict(recorder.messages.most_common(5)),
+    }
+
+
+def check_slos(step, slos):
+    """Return a list of SLO misses of one step; a threshold of None is not checked."""
+    misses = []
+    for key, limit in (('p95_ms', slos['p95_ms']), ('p99_ms', slos['p99_ms']),
+                       ('error_rate', slos['error_rate']), ('memory_per_session_mb', slos['memory_per_session_mb'])):
+        value = step[key]
+        if limit is not None and value is not None and value > limit:
+            misses.append(f"{step['sessions']} sessions: {key} {value:.4g} > {limit:g}")
+    minimum = slos['throughput_tps']
+    if minimum is not None and step['throughput_tps'] < minimum:
+        misses.append(f"{step['sessions']} sessions: throughput_tps {step['throughput_tps']:.4g} < {minimum:g}")
+    return misses
+
+
+def print_report(steps):
+    def ms(value):
+        return f"{value:.0f}" if value is not None else '-'
+
+    print(f"{'sessions':>8} {'turns':>6} {'turns/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'MB/session':>10} {'errors':>7} {'api calls':>10} {'db queries':>11}  SLO")
+    for step in steps:
+        print(f"{step['sessions']:>8} {step['turns']:>6} {step['throughput_tps']:>8.2f} {ms(step['p50_ms']):>8} "
+              f"{ms(step['p95_ms']):>8} {ms(step['p99_ms']):>8} {step['memory_per_session_mb']:>10.2f} "
+              f"{step['error_rate']:>7.1%} {step['api_calls']:>10} {step['db_queries']:>11}  "
+              f"{'miss' if step['slo_misses'] else 'ok'}")
+        for message, count in step['error_messages'].items():
+            print(f"{'':>8} {count} x {message}")
+
+
+def parse_sessions(value):
+    counts = [int(part) for part in value.split(',') if part.strip()]
+    if not counts or min(counts) < 1:
+        raise argparse.ArgumentTypeError("expected a comma-separated list of positive session counts")
+    return counts
+
+
+def parse_tools(value):
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    known = dict(TOOL_CALLS)
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown tools {unknown}; choose from {sorted(known)}")
+    return [(name, known[name]) for name in names]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=parse_sessions, default=[1, 5, 10, 25],
+                        help="concurrent sessions per ramp step, e.g. 1,5,10,25")
+    parser.add_argument('--turns', type=int, default=3, help="turns per session")
+    parser.add_argument('--studio-share', type=float, default=0.2,
+                        help="share of the sessions that browse the Skills Studio instead of chatting")
+    parser.add_argument('--think-time', type=float, default=0.0, help="pause between the turns of a session (s)")
+    parser.add_argument('--ramp-seconds', type=float, default=1.0, help="spread the session starts of a step over this")
+    parser.add_argument('--timeout', type=float, default=120.0, help="AppTest timeout per page run (s)")
+    parser.add_argument('--skills', type=int, default=50, help="number of skills seeded into the fake HANA")
+    parser.add_argument('--latency', type=float, default=0.05, help="simulated OpenAI latency per request (s)")
+    parser.add_argument('--stream-delay', type=float, default=0.0, help="simulated delay between streamed events (s)")
+    parser.add_argument('--tools', type=parse_tools, default=list(TOOL_CALLS),
+                        help="comma-separated tool calls of a run that requires action")
+    parser.add_argument('--tool-call-rate', type=float, default=1.0, help="share of the runs that call tools")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="share of OpenAI requests answered with 429")
+    parser.add_argument('--engine', choices=('async', 'sync'), default=os.getenv('CHAT_ENGINE', 'async'),
+                        help="CHAT_ENGINE of the chat page")
+    parser.add_argument('--log-level', default='WARNING', help="LOG_LEVEL of the app while under load")
+    parser.add_argument('--slo-p95-ms', type=float, default=3000.0)
+    parser.add_argument('--slo-p99-ms', type=float, default=6000.0)
+    parser.add_argument('--slo-error-rate', type=float, default=0.01)
+    parser.add_argument('--slo-memory-per-session-mb', type=float, default=8.0)
+    parser.add_argument('--slo-throughput', type=float, default=None, help="minimum turns per second")
+    parser.add_argument('--stop-on-miss', action='store_true', help="stop the ramp at the first step that misses an SLO")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args(argv)
+    warnings.filterwarnings('ignore', message='The Assistants API is deprecated', category=DeprecationWarning)
+
+    # read when octo_packages is first imported, i.e. by the first page run
+    os.environ['CHAT_ENGINE'] = args.engine
+    os.environ['LOG_LEVEL'] = args.log_level
+    slos = {'p95_ms': args.slo_p95_ms, 'p99_ms': args.slo_p99_ms, 'error_rate': args.slo_error_rate,
+            'memory_per_session_mb': args.slo_memory_per_session_mb, 'throughput_tps': args.slo_throughput}
+
+    allow_concurrent_apptests()
+    steps = []
+    with tempfile.TemporaryDirectory() as workdir:
+        env = LoadEnvironment(workdir, args.skills, args.latency, args.tools, args.tool_call_rate,
+                              args.failure_rate, args.stream_delay)
+        try:
+            # imports, pools, clients and the run engine are set up once per process; keep them
+            # out of the first step's latency and memory per session
+            run_step(env, 1, 0.0, 1, 0.0, 0.0, args.timeout)
+            run_step(env, 1, 1.0, 1, 0.0, 0.0, args.timeout)
+            for sessions in args.sessions:
+                step = run_step(env, sessions, args.studio_share, args.turns, args.think_time,
+                                args.ramp_seconds, args.timeout)
+                step['slo_misses'] = check_slos(step, slos)
+                steps.append(step)
+                if not args.json:
+                    print(f"{sessions} sessions done in {step['seconds']:.1f}s", file=sys.stderr)
+                if step['slo_misses'] and args.stop_on_miss:
+                    break
+        finally:
+            env.close()
+
+    misses = [miss for step in steps for miss in step['slo_misses']]
+    within = [step['sessions'] for step in steps if not step['slo_misses']]
+    if args.json:
+        print(json.dumps({'slos': slos, 'steps': steps}, indent=2))
+    else:
+        print_report(steps)
+        print(f"Largest step within the SLOs: {max(within)} sessions" if within else "No step met the SLOs")
+    for miss in misses:
+        print(f"SLO MISS {miss}", file=sys.stderr)
+    return 1 if misses else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
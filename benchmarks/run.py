@@ -0,0 +1,483 @@
+"""Offline benchmarks for the chat and Skills Studio hot paths.
+
+Runs the real octo_packages code against local stand-ins (benchmarks.fakes) for HANA and
+the OpenAI Assistants API and reports per-stage latency plus API calls and DB queries per
+iteration. Results are compared with benchmarks/baseline.json; the exit code is 1 when a
+stage regressed.
+
+    python -m benchmarks.run                      # run and compare against the baseline
+    python -m benchmarks.run --update-baseline    # run and store the results as the new baseline
+    python -m benchmarks.run --stage message_sync_1000 --repeat 10
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import warnings
+import statistics
+
+from benchmarks.fakes import FakeHana, FakeOpenAIServer
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+TOOL_LATENCY = 0.05
+
+BENCH_SKILLS = [
+    ("get_current_weather", "Get the current weather in a given location",
+     '{"type": "object", "properties": {"location": {"type": "string"}}, "required": ["location"]}',
+     "import time\n\ndef get_current_weather(location, unit=\"fahrenheit\"):\n"
+     f"    time.sleep({TOOL_LATENCY})\n"
+     "    return json.dumps({\"location\": location, \"temperature\": \"22\", \"unit\": unit})\n"),
+    ("get_fieldglass_approvals", "Get open approvals from SAP Fieldglass",
+     '{"type": "object", "properties": {}}',
+     "import time\n\ndef get_fieldglass_approvals(sap_api_key):\n"
+     f"    time.sleep({TOOL_LATENCY})\n"
+     "    return {\"approvals\": [], \"key_set\": bool(sap_api_key)}\n"),
+    ("get_exchange_rate", "Get the exchange rate between two currencies",
+     '{"type": "object", "properties": {"base": {"type": "string"}, "target": {"type": "string"}}}',
+     "import time\n\ndef get_exchange_rate(base=\"EUR\", target=\"USD\"):\n"
+     f"    time.sleep({TOOL_LATENCY})\n"
+     "    return {\"base\": base, \"target\": target, \"rate\": 1.1}\n"),
+]
+
+FILLER_SKILL = (
+    "def {name}(value=None):\n"
+    "    \"\"\"Benchmark filler skill\"\"\"\n"
+    "    return {{\"skill\": \"{name}\", \"value\": value}}\n"
+)
+
+TOOL_CALLS = [
+    ("get_current_weather", {"location": "Paris"}),
+    ("get_fieldglass_approvals", {}),
+    ("get_exchange_rate", {"base": "EUR", "target": "CHF"}),
+]
+
+
+def bench_credentials():
+    from octo_packages.credentials import CredentialProvider
+
+    # fixed secrets, no VCAP_SERVICES, environment or credential files
+    return CredentialProvider({'sap_api_key': 'bench'}, environ={}, vcap_services='{}')
+
+
+def bench_skills(skill_count):
+    """BENCH_SKILLS padded with filler skills to ``skill_count`` rows for FakeHana.seed_skills."""
+    skills = list(BENCH_SKILLS)
+    for i in range(max(0, skill_count - len(skills))):
+        name = f"filler_skill_{i}"
+        skills.append((name, "Benchmark filler skill", '{"type": "object", "properties": {}}',
+                       FILLER_SKILL.format(name=name)))
+    return skills
+
+
+class Environment:
+    """Fake HANA + fake OpenAI wired up with the app's own pool, registries and clients."""
+
+    def __init__(self, skill_count, workdir, latency=0.0):
+        from octo_packages.db import ConnectionPool
+
+        self.hana = FakeHana(os.path.join(workdir, 'hana.sqlite3'))
+        self.hana.seed_skills(bench_skills(skill_count))
+
+        self.server = FakeOpenAIServer(latency=latency, tool_calls=TOOL_CALLS).start()
+        self.client = self.server.client()
+        self.pool = ConnectionPool(self.hana.connect, ping_query="SELECT 1 FROM DUMMY")
+        self.sandbox = None
+
+    def counters(self):
+        return self.server.state.api_calls(), self.hana.queries
+
+    def close(self):
+        if self.sandbox is not None:
+            self.sandbox.close()
+        self.pool.close()
+        self.server.stop()
+
+
+def stage_bootstrap_cold(env):
+    from octo_packages import chat
+    from octo_packages.db import get_db_credentials
+    from octo_packages.skills import SkillRegistry
+    from octo_packages.result_cache import SkillResultCache
+    from octo_packages.assistants import build_tools
+
+    def run():
+        get_db_credentials()
+        chat.initialize_functions(env.pool, SkillRegistry(), SkillResultCache())
+        build_tools(chat.fetch_skill_details(env.pool))
+    return run
+
+
+def stage_bootstrap_rerun(env):
+    from octo_packages import chat
+    from octo_packages.db import get_db_credentials
+    from octo_packages.skills import SkillRegistry
+    from octo_packages.result_cache import SkillResultCache
+
+    registry, cache = SkillRegistry(), SkillResultCache()
+    chat.initialize_functions(env.pool, registry, cache)
+
+    def run():
+        get_db_credentials()
+        chat.initialize_functions(env.pool, registry, cache)
+    return run
+
+
+def stage_bootstrap_rerun_catalog(env):
+    from octo_packages import chat
+    from octo_packages.catalog import SkillCatalog
+    from octo_packages.skills import SkillRegistry
+    from octo_packages.result_cache import SkillResultCache
+
+    # poll on every rerun, the worst case of the version check
+    catalog = SkillCatalog(env.pool, poll_interval=0, resync_seconds=0)
+    registry, cache = SkillRegistry(), SkillResultCache()
+    chat.initialize_functions(env.pool, registry, cache, catalog=catalog)
+
+    def run():
+        chat.initialize_functions(env.pool, registry, cache, catalog=catalog)
+    return run
+
+
+def stage_catalog_change_1(env):
+    from octo_packages import chat, studio
+    from octo_packages.catalog import SkillCatalog
+    from octo_packages.skills import SkillRegistry
+    from octo_packages.result_cache import SkillResultCache
+
+    catalog = SkillCatalog(env.pool, poll_interval=0, resync_seconds=0)
+    registry, cache = SkillRegistry(), SkillResultCache()
+    chat.initialize_functions(env.pool, registry, cache, catalog=catalog)
+    ttls = iter(range(1, 10 ** 9))
+
+    def run():
+        # as written by another instance: one changed skill, then this instance's next rerun
+        studio.update_cache_policy(env.pool, 'get_exchange_rate', 'ttl', next(ttls))
+        chat.initialize_functions(env.pool, registry, cache, catalog=catalog)
+        assert cache.policy_for('get_exchange_rate')[0] == 'ttl'
+    return run
+
+
+def stage_wait_on_run(env):
+    from octo_packages import chat
+    from octo_packages.skills import SkillRegistry
+    from octo_packages.polling import RunPoller, BackoffPolicy
+    from octo_packages.tool_dispatch import ToolCallDispatcher
+    from octo_packages.result_cache import SkillResultCache
+    from octo_packages.http_pool import HttpSessionPool
+    from octo_packages.dispatch_table import DispatchTable
+
+    registry, cache = SkillRegistry(), SkillResultCache()
+    chat.initialize_functions(env.pool, registry, cache)
+    execute_tool_call = chat.make_tool_executor(DispatchTable(registry, bench_credentials()), cache, HttpSessionPool())
+    poller, dispatcher = RunPoller(BackoffPolicy.from_env()), ToolCallDispatcher()
+    thread_id = env.client.beta.threads.create().id
+
+    def run():
+        run = env.client.beta.threads.runs.create(thread_id=thread_id, assistant_id='asst_bench')
+        run = chat.wait_on_run(env.client, poller, dispatcher, run, thread_id, execute_tool_call)
+        assert run.status == 'completed', run.status
+    return run
+
+
+def stage_wait_on_run_sandbox(env):
+    from octo_packages import chat
+    from octo_packages.skills import SkillRegistry
+    from octo_packages.polling import RunPoller, BackoffPolicy
+    from octo_packages.tool_dispatch import ToolCallDispatcher
+    from octo_packages.result_cache import SkillResultCache
+    from octo_packages.http_pool import HttpSessionPool
+    from octo_packages.dispatch_table import DispatchTable
+    from octo_packages.sandbox import SkillSandbox
+
+    env.sandbox = SkillSandbox(workers=3).start()
+    registry, cache = SkillRegistry(), SkillResultCache()
+    chat.initialize_functions(env.pool, registry, cache, env.sandbox)
+    poller, dispatcher = RunPoller(BackoffPolicy.from_env()), ToolCallDispatcher()
+    execute_tool_call = chat.make_tool_executor(DispatchTable(registry, bench_credentials()), cache, HttpSessionPool(),
+                                                sandbox=env.sandbox, timeout_for=dispatcher.timeout_for)
+    thread_id = env.client.beta.threads.create().id
+
+    def run():
+        run = env.client.beta.threads.runs.create(thread_id=thread_id, assistant_id='asst_bench')
+        run = chat.wait_on_run(env.client, poller, dispatcher, run, thread_id, execute_tool_call)
+        assert run.status == 'completed', run.status
+    return run
+
+
+def stage_wait_on_run_throttled(env):
+    from octo_packages import chat
+    from octo_packages.skills import SkillRegistry
+    from octo_packages.polling import RunPoller, BackoffPolicy
+    from octo_packages.tool_dispatch import ToolCallDispatcher
+    from octo_packages.result_cache import SkillResultCache
+    from octo_packages.http_pool import HttpSessionPool
+    from octo_packages.dispatch_table import DispatchTable
+    from octo_packages.rate_limit import RateLimiter, http_client, limited_client
+
+    registry, cache = SkillRegistry(), SkillResultCache()
+    chat.initialize_functions(env.pool, registry, cache)
+    execute_tool_call = chat.make_tool_executor(DispatchTable(registry, bench_credentials()), cache, HttpSessionPool())
+    poller, dispatcher = RunPoller(BackoffPolicy.from_env()), ToolCallDispatcher()
+    limiter = RateLimiter(base_delay=0.05)
+    client = limited_client(env.server.client(http_client=http_client(limiter)), limiter)
+    thread_id = client.beta.threads.create().id
+
+    def run():
+        # wait_on_run_3_tools through the limiter, with a 429 and a 503 to retry on every run
+        env.server.state.failures.extend([429, 503])
+        run = client.beta.threads.runs.create(thread_id=thread_id, assistant_id='asst_bench')
+        run = chat.wait_on_run(client, poller, dispatcher, run, thread_id, execute_tool_call)
+        assert run.status == 'completed', run.status
+    return run
+
+
+def stage_stream_run_3_tools(env):
+    from octo_packages import chat
+    from octo_packages.skills import SkillRegistry
+    from octo_packages.streaming import StreamState, stream_run
+    from octo_packages.tool_dispatch import ToolCallDispatcher
+    from octo_packages.result_cache import SkillResultCache
+    from octo_packages.http_pool import HttpSessionPool
+    from octo_packages.dispatch_table import DispatchTable
+
+    registry, cache = SkillRegistry(), SkillResultCache()
+    chat.initialize_functions(env.pool, registry, cache)
+    execute_tool_call = chat.make_tool_executor(DispatchTable(registry, bench_credentials()), cache, HttpSessionPool())
+    dispatcher = ToolCallDispatcher()
+    thread_id = env.client.beta.threads.create().id
+
+    def run():
+        # same run as wait_on_run_3_tools, streamed: no polling, text arrives before the run ends
+        state = StreamState()
+        run = stream_run(env.client, dispatcher, thread_id, 'asst_bench', execute_tool_call, state=state)
+        assert run.status == 'completed', run.status
+        assert state.text and state.ttft is not None
+    return run
+
+
+def make_message_sync_stage(message_count):
+    def stage(env):
+        from octo_packages.messages import MessageSync
+        thread_id = env.server.state.seed_thread(message_count)
+
+        def run():
+            sync = MessageSync(thread_id)
+            sync.sync(env.client)
+            assert len(sync.history) == message_count
+            # a follow-up refresh with nothing new should be a single cheap call
+            sync.sync(env.client)
+        return run
+    return stage
+
+
+def stage_message_window_10000(env):
+    from octo_packages.messages import MessageSync
+    thread_id = env.server.state.seed_thread(10000)
+
+    def run():
+        # what a session entering a long thread holds and fetches with the default window
+        sync = MessageSync(thread_id, max_messages=40, max_bytes=256 * 1024)
+        sync.sync(env.client)
+        assert len(sync.history) == 40 and sync.has_earlier
+        assert sync.load_earlier(env.client, 20) == 20 and len(sync.history) == 60
+        sync.sync(env.client)
+    return run
+
+
+def stage_session_touch_100(env):
+    from octo_packages.openai_keys import key_fingerprint
+    from octo_packages.session_store import HanaSessionStore, SessionBinding, new_session_id
+
+    # the flusher thread is left out; run() flushes once, like one flush interval of 100 active sessions
+    store = HanaSessionStore(env.pool, flush_interval=3600)
+    session_ids = [new_session_id() for _ in range(100)]
+    for session_id in session_ids:
+        store.put(SessionBinding(session_id, key_fingerprint('bench'), 'asst_bench', f'thread_{session_id}'))
+    store.flush()
+
+    def run():
+        for session_id in session_ids:
+            store.touch(session_id)
+        assert store.flush() == len(session_ids)
+    return run
+
+
+def stage_studio_fetch_data(env):
+    from octo_packages import studio
+
+    def run():
+        assert not studio.fetch_data(env.pool).empty
+    return run
+
+
+def stage_studio_fetch_page(env):
+    from octo_packages import studio
+    from octo_packages.result_cache import ensure_cache_columns
+    ensure_cache_columns(env.pool)
+
+    def run():
+        skills, has_more = studio.fetch_skill_page(env.pool, search='filler')
+        assert skills and has_more
+        studio.fetch_skill_detail(env.pool, skills[0]['SkillName'])
+        studio.fetch_function_names(env.pool)
+    return run
+
+
+def stage_studio_insert_backup(env):
+    from octo_packages import studio
+    from octo_packages.result_cache import ensure_cache_columns
+    from octo_packages.backup import ensure_backup_schema
+    ensure_cache_columns(env.pool)
+    ensure_backup_schema(env.pool)
+    counter = iter(range(10 ** 9))
+
+    def run():
+        name = f"bench_inserted_{next(counter)}"
+        result = studio.insert_skill_data(env.pool, name, "Inserted by the benchmark", '{"type": "object"}',
+                                          FILLER_SKILL.format(name=name))
+        assert result.startswith("Skill added successfully"), result
+        studio.update_skills_backup(env.pool)
+    return run
+
+
+def stage_bundle_import_200(env):
+    import io
+    from octo_packages import bundles
+    counter = iter(range(10 ** 9))
+
+    def run():
+        batch = next(counter)
+        stream = io.StringIO('\n'.join(json.dumps({
+            'name': f"bench_bundle_{batch}_{i}", 'description': "Imported by the benchmark",
+            'parameters': {'type': 'object', 'properties': {}},
+            'source': FILLER_SKILL.format(name=f"bench_bundle_{batch}_{i}"),
+        }) for i in range(200)))
+        report = bundles.import_bundle(env.pool, stream)
+        assert report['inserted'] == 200, report
+    return run
+
+
+STAGES = {
+    'bootstrap_cold': stage_bootstrap_cold,
+    'bootstrap_rerun': stage_bootstrap_rerun,
+    'bootstrap_rerun_catalog': stage_bootstrap_rerun_catalog,
+    'catalog_change_1': stage_catalog_change_1,
+    'wait_on_run_3_tools': stage_wait_on_run,
+    'wait_on_run_sandbox': stage_wait_on_run_sandbox,
+    'wait_on_run_throttled': stage_wait_on_run_throttled,
+    'stream_run_3_tools': stage_stream_run_3_tools,
+    'message_sync_10': make_message_sync_stage(10),
+    'message_sync_100': make_message_sync_stage(100),
+    'message_sync_1000': make_message_sync_stage(1000),
+    'message_sync_10000': make_message_sync_stage(10000),
+    'message_window_10000': stage_message_window_10000,
+    'session_touch_100': stage_session_touch_100,
+    'studio_fetch_data': stage_studio_fetch_data,
+    'studio_fetch_page': stage_studio_fetch_page,
+    'studio_insert_backup': stage_studio_insert_backup,
+    'bundle_import_200': stage_bundle_import_200,
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_stage(name, env, repeat):
+    run = STAGES[name](env)
+    run()  # warm-up, not measured
+    timings = []
+    api_before, db_before = env.counters()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    api_after, db_after = env.counters()
+    return {
+        'median_ms': statistics.median(timings),
+        'p95_ms': percentile(timings, 0.95),
+        'max_ms': max(timings),
+        'api_calls': (api_after - api_before) / repeat,
+        'db_queries': (db_after - db_before) / repeat,
+        'repeat': repeat,
+    }
+
+
+def compare(results, baseline, tolerance, slack_ms):
+    """Return a list of regression descriptions; counts must not grow, latency may grow by tolerance."""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        limit = expected['median_ms'] * (1 + tolerance) + slack_ms
+        if result['median_ms'] > limit:
+            regressions.append(f"{name}: median {result['median_ms']:.1f}ms > {limit:.1f}ms "
+                               f"(baseline {expected['median_ms']:.1f}ms)")
+        for counter in ('api_calls', 'db_queries'):
+            if result[counter] > expected[counter] + 1e-9:
+                regressions.append(f"{name}: {counter} {result[counter]:g} > baseline {expected[counter]:g}")
+    return regressions
+
+
+def print_report(results, baseline):
+    print(f"{'stage':<24} {'median ms':>10} {'p95 ms':>10} {'base ms':>10} {'api calls':>10} {'db queries':>11}")
+    for name, result in results.items():
+        base = baseline.get(name, {}).get('median_ms')
+        print(f"{name:<24} {result['median_ms']:>10.1f} {result['p95_ms']:>10.1f} "
+              f"{(f'{base:.1f}' if base is not None else '-'):>10} {result['api_calls']:>10g} {result['db_queries']:>11g}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stage', action='append', choices=sorted(STAGES), help="run only these stages")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--skills', type=int, default=50, help="number of skills seeded into the fake HANA")
+    parser.add_argument('--latency', type=float, default=0.0, help="simulated OpenAI latency per request (s)")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.5, help="allowed relative latency growth")
+    parser.add_argument('--slack-ms', type=float, default=5.0, help="allowed absolute latency growth")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args(argv)
+    warnings.filterwarnings('ignore', message='The Assistants API is deprecated', category=DeprecationWarning)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        env = Environment(args.skills, workdir, latency=args.latency)
+        try:
+            for name in args.stage or STAGES:
+                results[name] = run_stage(name, env, args.repeat)
+        finally:
+            env.close()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results, baseline)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance, args.slack_ms)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
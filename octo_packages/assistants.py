@@ -0,0 +1,281 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+
+from octo_packages.db import ensure_table
+from octo_packages.openai_keys import key_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Every new browser session used to call assistants.create. Assistants are now content
+# addressed: the definition (name, instructions, model, tools) is hashed and the hash is
+# mapped to an assistant ID in ASSISTANT_REGISTRY, per API key since assistants belong to
+# the key's organisation. A new assistant is only created when the definition changes.
+
+REGISTRY_TABLE = 'ASSISTANT_REGISTRY'
+REGISTRY_DDL = """
+CREATE COLUMN TABLE ASSISTANT_REGISTRY (
+    OwnerHash NVARCHAR(64) NOT NULL,
+    DefinitionHash NVARCHAR(64) NOT NULL,
+    AssistantID NVARCHAR(64) NOT NULL,
+    CreatedAt TIMESTAMP DEFAULT CURRENT_UTCTIMESTAMP,
+    SupersededAt TIMESTAMP,
+    PRIMARY KEY (OwnerHash, DefinitionHash)
+)
+"""
+
+# Superseded assistants may still be referenced by open sessions, so they are only deleted
+# once they have been superseded for this long. A background thread collects them for every
+# API key this process has seen: once right away and then every GC_INTERVAL_SECONDS.
+GC_GRACE_SECONDS = int(os.getenv('ASSISTANT_GC_GRACE_SECONDS', str(24 * 3600)))
+GC_INTERVAL_SECONDS = int(os.getenv('ASSISTANT_GC_INTERVAL_SECONDS', '3600'))
+
+
+def build_tools(skill_details):
+    tools = [{"type": "code_interpreter"}]  # Starting with the code interpreter tool
+
+    for skill_name, skill_description, parameters in skill_details:
+        try:
+            # Load parameters if not empty, else set to empty dict
+            parameters_data = json.loads(parameters) if parameters and parameters.strip() else {}
+        except json.JSONDecodeError as e:
+            # Fallback to empty dict if JSON parsing fails
+            logger.error(f"JSON decoding error for parameters of {skill_name}: {e}")
+            parameters_data = {}
+
+        tools.append({
+            "type": "function",
+            "function": {
+                "name": skill_name,
+                "description": skill_description,
+                "parameters": parameters_data
+            }})
+    return tools
+
+
+def definition_hash(name, instructions, model, tools):
+    # sort_keys plus sorted function tools make the hash independent of row order
+    ordered_tools = sorted(tools, key=lambda tool: json.dumps(tool, sort_keys=True))
+    definition = {"name": name, "instructions": instructions, "model": model, "tools": ordered_tools}
+    return hashlib.sha256(json.dumps(definition, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class AssistantRegistry:
+    def __init__(self, pool, gc_grace_seconds=GC_GRACE_SECONDS, gc_interval_seconds=GC_INTERVAL_SECONDS):
+        self.pool = pool
+        self.gc_grace_seconds = gc_grace_seconds
+        self.gc_interval_seconds = gc_interval_seconds
+        self._lock = threading.Lock()
+        self._known = {}  # (owner hash, definition hash) -> assistant id
+        self._table_ready = False
+        self._owners = {}  # owner hash -> a client of that key, for the GC thread
+        self._gc_thread = None
+        self._gc_wakeup = threading.Event()
+        self._collecting = set()  # owners whose garbage is being collected right now
+        self._definition_locks = {}  # (owner hash, definition hash) -> lock held while resolving it
+
+    def _ensure_table(self):
+        if not self._table_ready:
+            ensure_table(self.pool, REGISTRY_TABLE, REGISTRY_DDL)
+            self._table_ready = True
+
+    def _lookup(self, owner, digest):
+        with self.pool.cursor() as cursor:
+            cursor.execute(
+                "SELECT AssistantID FROM ASSISTANT_REGISTRY WHERE OwnerHash = ? AND DefinitionHash = ?",
+                (owner, digest)
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def _register(self, owner, digest, assistant_id):
+        """Store the new mapping and mark older definitions superseded; False if we lost a race."""
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            try:
+                cursor.execute(
+                    "INSERT INTO ASSISTANT_REGISTRY (OwnerHash, DefinitionHash, AssistantID) VALUES (?, ?, ?)",
+                    (owner, digest, assistant_id)
+                )
+            except Exception as e:
+                logger.warning(f"Assistant definition already registered by another instance: {e}")
+                conn.rollback()
+                return False
+            self._supersede_others(cursor, owner, digest)
+            conn.commit()
+        return True
+
+    def _activate(self, owner, digest):
+        """Make an already registered definition the current one again, e.g. after a revert."""
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE ASSISTANT_REGISTRY SET SupersededAt = NULL
+                WHERE OwnerHash = ? AND DefinitionHash = ? AND SupersededAt IS NOT NULL
+                """,
+                (owner, digest)
+            )
+            self._supersede_others(cursor, owner, digest)
+            conn.commit()
+
+    @staticmethod
+    def _supersede_others(cursor, owner, digest):
+        cursor.execute(
+            """
+            UPDATE ASSISTANT_REGISTRY SET SupersededAt = CURRENT_UTCTIMESTAMP
+            WHERE OwnerHash = ? AND DefinitionHash <> ? AND SupersededAt IS NULL
+            """,
+            (owner, digest)
+        )
+
+    def _use(self, owner, digest, assistant_id):
+        with self._lock:
+            # an older definition must go through _activate again if this process reverts to it
+            for key in [key for key in self._known if key[0] == owner and key[1] != digest]:
+                del self._known[key]
+            self._known[(owner, digest)] = assistant_id
+
+    def get_or_create(self, client, api_key, name, instructions, model, tools):
+        owner = key_fingerprint(api_key)
+        digest = definition_hash(name, instructions, model, tools)
+        key = (owner, digest)
+        if owner not in self._owners:
+            self._watch_owner(owner, client)
+
+        assistant_id = self._known.get(key)
+        if assistant_id:
+            return assistant_id
+
+        # sessions wanting the same definition wait for each other; the registry lock only
+        # covers registry reads and writes, never the OpenAI calls
+        with self._lock:
+            definition_lock = self._definition_locks.setdefault(key, threading.Lock())
+        with definition_lock:
+            assistant_id = self._known.get(key)
+            if assistant_id:
+                return assistant_id
+
+            with self._lock:
+                self._ensure_table()
+                assistant_id = self._lookup(owner, digest)
+            if assistant_id:
+                try:
+                    # once per process, make sure nobody deleted it on the OpenAI side
+                    client.beta.assistants.retrieve(assistant_id)
+                except Exception as e:
+                    logger.warning(f"Registered assistant {assistant_id} is not usable, recreating: {e}")
+                    with self._lock:
+                        self._forget(owner, digest)
+                    assistant_id = None
+                else:
+                    with self._lock:
+                        self._activate(owner, digest)
+
+            if not assistant_id:
+                assistant = client.beta.assistants.create(
+                    name=name, instructions=instructions, tools=tools, model=model
+                )
+                with self._lock:
+                    registered = self._register(owner, digest, assistant.id)
+                if registered:
+                    assistant_id = assistant.id
+                    logger.info(f"Created assistant {assistant_id} for definition {digest[:12]}")
+                else:
+                    # another instance registered the same definition first - use theirs
+                    client.beta.assistants.delete(assistant.id)
+                    with self._lock:
+                        assistant_id = self._lookup(owner, digest)
+
+            self._use(owner, digest, assistant_id)
+            return assistant_id
+
+    def _forget(self, owner, digest):
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM ASSISTANT_REGISTRY WHERE OwnerHash = ? AND DefinitionHash = ?",
+                (owner, digest)
+            )
+            conn.commit()
+
+    # -- garbage collection ----------------------------------------------------------------
+
+    def _watch_owner(self, owner, client):
+        """Have the GC thread look after ``owner``'s assistants, starting it if needed."""
+        with self._lock:
+            if owner in self._owners:
+                return
+            self._owners[owner] = client
+            if self._gc_thread is None:
+                self._gc_thread = threading.Thread(target=self._gc_loop, name='assistant-gc', daemon=True)
+                self._gc_thread.start()
+        # a key seen for the first time is collected right away, not after a full interval
+        self._gc_wakeup.set()
+
+    def _gc_loop(self):
+        while True:
+            self._gc_wakeup.wait(self.gc_interval_seconds)
+            self._gc_wakeup.clear()
+            with self._lock:
+                owners = list(self._owners.items())
+            for owner, client in owners:
+                self._collect(client, owner)
+
+    def collect_garbage(self, client, api_key):
+        """Delete assistants that were superseded more than the grace period ago."""
+        return self._collect(client, key_fingerprint(api_key))
+
+    def _collect(self, client, owner):
+        with self._lock:
+            if owner in self._collecting:
+                return 0
+            self._collecting.add(owner)
+        deleted = 0
+        try:
+            # only the candidate lookup holds the registry lock; the deletes are network calls
+            with self._lock:
+                self._ensure_table()
+                with self.pool.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        SELECT DefinitionHash, AssistantID FROM ASSISTANT_REGISTRY
+                        WHERE OwnerHash = ? AND SupersededAt IS NOT NULL
+                        AND SupersededAt < ADD_SECONDS(CURRENT_UTCTIMESTAMP, ?)
+                        """,
+                        (owner, -self.gc_grace_seconds)
+                    )
+                    stale = cursor.fetchall()
+            for digest, assistant_id in stale:
+                if (owner, digest) in self._known:
+                    continue  # reverted to while the candidates were collected
+                try:
+                    client.beta.assistants.delete(assistant_id)
+                except Exception as e:
+                    # already gone on the OpenAI side is fine, anything else we retry next time
+                    if getattr(e, 'status_code', None) != 404:
+                        logger.error(f"Failed to delete superseded assistant {assistant_id}: {e}")
+                        continue
+                self._forget(owner, digest)
+                self._known.pop((owner, digest), None)
+                deleted += 1
+        except Exception as e:
+            logger.error(f"Assistant garbage collection failed: {e}")
+        finally:
+            with self._lock:
+                self._collecting.discard(owner)
+        if deleted:
+            logger.info(f"Deleted {deleted} superseded assistants")
+        return deleted
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_assistant_registry(pool):
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = AssistantRegistry(pool)
+    return _registry
@@ -0,0 +1,220 @@
+import os
+import time
+import logging
+import threading
+
+from octo_packages.db import ensure_columns, ensure_table
+from octo_packages.result_cache import SKILL_CACHE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# SKILLS_BACKUP used to be refreshed with an INSERT ... SELECT ... WHERE SkillID NOT IN (...)
+# after every insert, which never picked up edits or deletes. Skills now carry a ModifiedAt
+# timestamp; the sync copies rows modified after the stored high-water mark in batches with
+# UPSERT, and deletes leave a tombstone (DeletedAt) on the backup row instead of a gap.
+
+STATE_TABLE = 'SKILLS_BACKUP_STATE'
+STATE_DDL = """
+CREATE COLUMN TABLE SKILLS_BACKUP_STATE (
+    Name NVARCHAR(64) PRIMARY KEY,
+    Watermark TIMESTAMP,
+    LastRunAt TIMESTAMP,
+    RowsCopied INTEGER,
+    Tombstones INTEGER,
+    DurationMs INTEGER
+)
+"""
+STATE_NAME = 'skills'
+
+MODIFIED_COLUMN = {'ModifiedAt': 'TIMESTAMP'}
+TOMBSTONE_COLUMN = {'DeletedAt': 'TIMESTAMP'}
+
+BACKUP_COLUMNS = (
+    ('SkillID', 'SkillName', 'SkillDescription', 'Parameters', 'PythonFunction')
+    + tuple(SKILL_CACHE_COLUMNS) + tuple(MODIFIED_COLUMN)
+)
+
+DEFAULT_BATCH_SIZE = int(os.getenv('BACKUP_BATCH_SIZE', '200'))
+# A row can commit a little after a sync has read past its ModifiedAt. The watermark therefore
+# never advances beyond "sync start minus this many seconds", so such rows are read again by the
+# next sync (UPSERT makes the repeat copy harmless)
+DEFAULT_OVERLAP_SECONDS = int(os.getenv('BACKUP_OVERLAP_SECONDS', '5'))
+DEFAULT_SYNC_DELAY = float(os.getenv('BACKUP_SYNC_DELAY', '2'))
+
+
+_schema_ready = False
+
+
+def ensure_backup_schema(pool):
+    """Add ModifiedAt/DeletedAt and the watermark table once per process."""
+    global _schema_ready
+    if not _schema_ready:
+        ensure_columns(pool, 'Skills', MODIFIED_COLUMN)
+        ensure_columns(pool, 'SKILLS_BACKUP', dict(MODIFIED_COLUMN, **TOMBSTONE_COLUMN))
+        ensure_table(pool, STATE_TABLE, STATE_DDL)
+        _schema_ready = True
+
+
+def record_tombstone(cursor, skill_name):
+    """Mark the backup rows of ``skill_name`` deleted; call in the same transaction as the DELETE."""
+    cursor.execute(
+        """
+        UPDATE SKILLS_BACKUP SET DeletedAt = CURRENT_UTCTIMESTAMP
+        WHERE DeletedAt IS NULL AND SkillID IN (SELECT SkillID FROM Skills WHERE SkillName = ?)
+        """,
+        (skill_name,)
+    )
+    return cursor.rowcount
+
+
+class BackupSync:
+    """Incremental Skills -> SKILLS_BACKUP copy driven by a ModifiedAt high-water mark.
+
+    ``sync()`` runs in the caller's thread and returns a report; ``request_sync()`` schedules
+    one on a background thread, coalescing requests that arrive within ``delay`` seconds.
+    """
+
+    def __init__(self, pool, batch_size=DEFAULT_BATCH_SIZE, overlap_seconds=DEFAULT_OVERLAP_SECONDS,
+                 delay=DEFAULT_SYNC_DELAY):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.overlap_seconds = overlap_seconds
+        self.delay = delay
+        self._sync_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self.last_report = None
+
+    def _load_watermark(self, cursor):
+        cursor.execute("SELECT Watermark FROM SKILLS_BACKUP_STATE WHERE Name = ?", (STATE_NAME,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def _save_state(self, cursor, watermark, report):
+        cursor.execute(
+            """
+            UPSERT SKILLS_BACKUP_STATE (Name, Watermark, LastRunAt, RowsCopied, Tombstones, DurationMs)
+            VALUES (?, ?, CURRENT_UTCTIMESTAMP, ?, ?, ?) WHERE Name = ?
+            """,
+            (STATE_NAME, watermark, report['rows_copied'], report['tombstones'], report['duration_ms'], STATE_NAME)
+        )
+
+    def _next_batch(self, cursor, watermark, last_key):
+        columns = ', '.join(BACKUP_COLUMNS)
+        if last_key is not None:
+            # keyset over (ModifiedAt, SkillID) inside one sync
+            cursor.execute(
+                f"SELECT {columns} FROM Skills WHERE ModifiedAt > ? OR (ModifiedAt = ? AND SkillID > ?) "
+                f"ORDER BY ModifiedAt, SkillID LIMIT {int(self.batch_size)}",
+                (last_key[0], last_key[0], last_key[1])
+            )
+        elif watermark is not None:
+            cursor.execute(
+                f"SELECT {columns} FROM Skills WHERE ModifiedAt > ? "
+                f"ORDER BY ModifiedAt, SkillID LIMIT {int(self.batch_size)}",
+                (watermark,)
+            )
+        else:
+            cursor.execute(
+                f"SELECT {columns} FROM Skills WHERE ModifiedAt IS NOT NULL "
+                f"ORDER BY ModifiedAt, SkillID LIMIT {int(self.batch_size)}"
+            )
+        return cursor.fetchall()
+
+    def sync(self, reconcile_deletes=False):
+        """Copy new and changed skills; returns ``{rows_copied, tombstones, batches, duration_ms}``.
+
+        ``reconcile_deletes`` additionally tombstones backup rows whose skill no longer exists,
+        for deletes that bypassed ``record_tombstone`` (e.g. made directly in the database).
+        """
+        started = time.monotonic()
+        report = {'rows_copied': 0, 'tombstones': 0, 'batches': 0, 'duration_ms': 0}
+        column_list = ', '.join(BACKUP_COLUMNS)
+        placeholders = ', '.join('?' for _ in BACKUP_COLUMNS)
+        upsert = f"UPSERT SKILLS_BACKUP ({column_list}) VALUES ({placeholders}) WHERE SkillID = ?"
+
+        with self._sync_lock:
+            ensure_backup_schema(self.pool)
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                # rows written without ModifiedAt (older app versions, manual inserts) count as new
+                cursor.execute("UPDATE Skills SET ModifiedAt = CURRENT_UTCTIMESTAMP WHERE ModifiedAt IS NULL")
+                watermark = self._load_watermark(cursor)
+                cursor.execute("SELECT ADD_SECONDS(CURRENT_UTCTIMESTAMP, ?) FROM DUMMY", (-self.overlap_seconds,))
+                safe_point = cursor.fetchone()[0]
+                last_key = None
+                while True:
+                    rows = self._next_batch(cursor, watermark, last_key)
+                    if not rows:
+                        break
+                    cursor.executemany(upsert, [tuple(row) + (row[0],) for row in rows])
+                    last_key = (rows[-1][-1], rows[-1][0])
+                    report['rows_copied'] += len(rows)
+                    report['batches'] += 1
+                    if len(rows) < self.batch_size:
+                        break
+
+                if reconcile_deletes:
+                    cursor.execute(
+                        """
+                        UPDATE SKILLS_BACKUP SET DeletedAt = CURRENT_UTCTIMESTAMP
+                        WHERE DeletedAt IS NULL AND NOT EXISTS (SELECT 1 FROM Skills WHERE Skills.SkillID = SKILLS_BACKUP.SkillID)
+                        """
+                    )
+                    report['tombstones'] = max(cursor.rowcount, 0)
+
+                if last_key is not None:
+                    advanced = min(last_key[0], safe_point)
+                    watermark = max(advanced, watermark) if watermark is not None else advanced
+                report['duration_ms'] = int((time.monotonic() - started) * 1000)
+                self._save_state(cursor, watermark, report)
+                conn.commit()
+
+        self.last_report = report
+        logger.info(f"SKILLS_BACKUP sync copied {report['rows_copied']} rows in {report['batches']} batches, "
+                    f"{report['tombstones']} tombstones, {report['duration_ms']}ms")
+        return report
+
+    def request_sync(self):
+        """Schedule a sync off the request path."""
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run_worker, name='skills-backup', daemon=True)
+                self._worker.start()
+        self._wakeup.set()
+
+    def _run_worker(self):
+        while True:
+            self._wakeup.wait()
+            # let a burst of inserts settle into one sync
+            time.sleep(self.delay)
+            self._wakeup.clear()
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"SKILLS_BACKUP sync failed: {e}")
+
+    def last_state(self):
+        """The persisted state of the last sync by any instance, or None."""
+        with self.pool.cursor() as cursor:
+            cursor.execute(
+                "SELECT Watermark, LastRunAt, RowsCopied, Tombstones, DurationMs FROM SKILLS_BACKUP_STATE WHERE Name = ?",
+                (STATE_NAME,)
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip(('watermark', 'last_run_at', 'rows_copied', 'tombstones', 'duration_ms'), row))
+
+
+_backup_sync = None
+_backup_sync_lock = threading.Lock()
+
+
+def get_backup_sync(pool):
+    global _backup_sync
+    if _backup_sync is None:
+        with _backup_sync_lock:
+            if _backup_sync is None:
+                _backup_sync = BackupSync(pool)
+    return _backup_sync
@@ -0,0 +1,166 @@
+import os
+import sys
+import time
+import logging
+import importlib
+import threading
+
+from octo_packages.credentials import get_credentials
+from octo_packages.logs import bind_log_context, configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Every page used to repeat the logger setup, load_dotenv() and the credential file reads at
+# the top of the script, i.e. on every rerun, and import pandas, openai, hdbcli, cfenv and
+# requests eagerly. bootstrap() does the process-level part exactly once; heavy dependencies
+# are imported through lazy_import() on first use, which also records how long that took.
+# Together with begin_page() this feeds the startup report on the Performance page.
+
+
+def rss_mb():
+    """Current resident set size of this process in MB."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        # peak rather than current RSS, kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+_import_timings = {}  # module name -> ms spent on its first import
+_import_lock = threading.Lock()
+
+
+def lazy_import(name):
+    """Import ``name`` on first use and remember what the first import cost."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    with _import_lock:
+        _import_timings.setdefault(name, (time.perf_counter() - started) * 1000)
+    return module
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        return getattr(lazy_import(self._name), attribute)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}>"
+
+
+class PageStats:
+    def __init__(self):
+        self.runs = 0
+        self.cold_ms = None
+        self.cold_rss_delta_mb = None
+        self.cold_new_modules = None
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.rss_mb = 0.0
+
+    def as_dict(self):
+        return {
+            'runs': self.runs, 'cold_ms': self.cold_ms, 'cold_rss_delta_mb': self.cold_rss_delta_mb,
+            'cold_new_modules': self.cold_new_modules, 'last_ms': self.last_ms, 'max_ms': self.max_ms,
+            'rss_mb': self.rss_mb,
+        }
+
+
+class PageRun:
+    def __init__(self, process, page):
+        self._process = process
+        self.page = page
+        self.started = time.perf_counter()
+        self.rss_before = rss_mb()
+        self.modules_before = len(sys.modules)
+
+    def finish(self):
+        self._process._record_page(self, (time.perf_counter() - self.started) * 1000)
+
+
+class ProcessContext:
+    """Result of the one-time process setup, shared by every page, session and rerun."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.credentials = None
+        self.setup_ms = 0.0
+        self.rss_after_setup_mb = 0.0
+        self._lock = threading.Lock()
+        self._pages = {}
+
+    def _setup(self):
+        started = time.perf_counter()
+        # queue-based, sampled logging; see octo_packages.logs
+        configure_logging()
+        try:
+            # Load .env file if it exists for local development
+            lazy_import('dotenv').load_dotenv()
+        except ImportError:
+            pass
+        # skill secrets are resolved by name when the dispatch table is built, then cached
+        self.credentials = get_credentials()
+        self.setup_ms = (time.perf_counter() - started) * 1000
+        self.rss_after_setup_mb = rss_mb()
+
+    def begin_page(self, page):
+        """Start timing one run of ``page``; call ``finish()`` on the result at the end of the script.
+
+        Runs that end early (st.stop, exceptions) are simply not recorded.
+        """
+        # the script thread may have served another session or run before
+        bind_log_context()
+        return PageRun(self, page)
+
+    def _record_page(self, run, elapsed_ms):
+        rss = rss_mb()
+        with self._lock:
+            stats = self._pages.setdefault(run.page, PageStats())
+            stats.runs += 1
+            if stats.cold_ms is None:
+                stats.cold_ms = elapsed_ms
+                stats.cold_rss_delta_mb = rss - run.rss_before
+                stats.cold_new_modules = len(sys.modules) - run.modules_before
+            stats.last_ms = elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.rss_mb = rss
+
+    def startup_report(self):
+        with self._lock:
+            pages = {page: stats.as_dict() for page, stats in self._pages.items()}
+        with _import_lock:
+            imports = dict(sorted(_import_timings.items(), key=lambda item: item[1], reverse=True))
+        return {
+            'setup_ms': self.setup_ms,
+            'rss_after_setup_mb': self.rss_after_setup_mb,
+            'rss_mb': rss_mb(),
+            'modules_loaded': len(sys.modules),
+            'uptime_s': time.time() - self.started_at,
+            'lazy_imports_ms': imports,
+            'pages': pages,
+        }
+
+
+_process = None
+_process_lock = threading.Lock()
+
+
+def bootstrap():
+    """Run the process-level setup once and return the shared ProcessContext."""
+    global _process
+    if _process is None:
+        with _process_lock:
+            if _process is None:
+                process = ProcessContext()
+                process._setup()
+                _process = process
+    return _process
@@ -0,0 +1,308 @@
+"""Bulk import and export of skills as JSON or JSONL bundles.
+
+A bundle is a JSON array of skill objects or one skill object per line (JSONL):
+
+    {"name": "get_current_weather", "description": "...", "parameters": {"type": "object", ...},
+     "source": "def get_current_weather(location): ...", "cache_policy": "none", "cache_ttl": 300}
+
+    python -m octo_packages.bundles export skills.jsonl
+    python -m octo_packages.bundles import skills.jsonl --on-conflict replace
+    python -m octo_packages.bundles import skills.json --dry-run
+"""
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+
+from octo_packages.backup import ensure_backup_schema, get_backup_sync
+from octo_packages.catalog import bump_catalog_version, ensure_catalog_schema
+from octo_packages.logs import configure_logging
+from octo_packages.result_cache import CACHE_POLICIES, ensure_cache_columns
+from octo_packages.skills import SkillRegistry
+from octo_packages.studio import invalidate_skill_names
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMATS = ('jsonl', 'json')
+ON_CONFLICT = ('error', 'skip', 'replace')
+DEFAULT_BATCH_SIZE = int(os.getenv('BUNDLE_BATCH_SIZE', '200'))
+# An entry that is still incomplete past this many characters is rejected rather than buffering
+# (and re-parsing) the rest of the bundle.
+MAX_OBJECT_SIZE = int(os.getenv('BUNDLE_MAX_OBJECT_SIZE', str(16 * 1024 * 1024)))
+
+_SKILL_NAME = re.compile(r'^[A-Za-z_]\w*$')
+_SEPARATORS = ' \t\r\n,'
+_END = object()
+# a value cut off by the chunk boundary fails at most this far before the end of the buffer
+# ('fals', '1e-', a partial \u escape); anything earlier is a real syntax error
+_TRUNCATION_SLACK = 8
+
+
+class BundleError(ValueError):
+    """Raised when a bundle has invalid skills; ``errors`` lists ``(position, name, message)``."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} invalid skill(s) in bundle, nothing was imported")
+
+
+def _truncated(error, buffer):
+    """True if ``error`` may only mean that ``buffer`` ends in the middle of a value."""
+    # strings cannot span lines, so an unterminated one has simply not been read to its end
+    return error.msg.startswith('Unterminated string') or error.pos >= len(buffer) - _TRUNCATION_SLACK
+
+
+def iter_bundle(stream, chunk_size=64 * 1024, max_object_size=MAX_OBJECT_SIZE):
+    """Yield the objects of a JSON array or JSONL text stream without reading it whole."""
+    decoder = json.JSONDecoder()
+    buffer, position, eof, started = '', 0, False, False
+    while True:
+        while position < len(buffer) and buffer[position] in _SEPARATORS:
+            position += 1
+        if position < len(buffer) and not started:
+            started = True
+            if buffer[position] == '[':
+                position += 1
+                continue
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        if position < len(buffer):
+            try:
+                obj, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                if eof or not _truncated(e, buffer):
+                    raise
+                if len(buffer) - position > max_object_size:
+                    raise json.JSONDecodeError(f"entry is larger than {max_object_size} characters", buffer, position)
+                # the object continues in the next chunk
+            else:
+                yield obj
+                position = end
+                continue
+        elif eof:
+            return
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def validate_skill(record, registry):
+    """Normalize one bundle entry into a Skills row; raises ValueError if it is not importable."""
+    if not isinstance(record, dict):
+        raise ValueError("entry is not a JSON object")
+    name = record.get('name')
+    if not isinstance(name, str) or not _SKILL_NAME.match(name):
+        raise ValueError(f"invalid skill name {name!r}")
+
+    parameters = record.get('parameters') or {"type": "object", "properties": {}}
+    if isinstance(parameters, str):
+        parameters = json.loads(parameters)
+    if not isinstance(parameters, dict) or parameters.get('type', 'object') != 'object':
+        raise ValueError("parameters must be a JSON schema of type object")
+
+    source = record.get('source')
+    if not isinstance(source, str) or not source.strip():
+        raise ValueError("source is missing")
+    registry.check(name, source)
+
+    cache_policy = record.get('cache_policy', 'none')
+    if cache_policy not in CACHE_POLICIES:
+        raise ValueError(f"cache_policy must be one of {', '.join(CACHE_POLICIES)}")
+    cache_ttl = int(record.get('cache_ttl', 300))
+    if cache_ttl < 0:
+        raise ValueError("cache_ttl must not be negative")
+
+    return (name, record.get('description') or '', json.dumps(parameters), source, cache_policy, cache_ttl)
+
+
+def import_bundle(pool, stream, on_conflict='error', dry_run=False, batch_size=DEFAULT_BATCH_SIZE):
+    """Validate every skill of ``stream`` and write them all in one transaction.
+
+    ``on_conflict`` decides what happens to skills that already exist: 'error' rejects the
+    bundle, 'skip' keeps the stored skill, 'replace' overwrites it. Raises BundleError without
+    writing anything if any entry is invalid. Returns ``{inserted, updated, skipped, duration_ms}``.
+    """
+    if on_conflict not in ON_CONFLICT:
+        raise ValueError(f"on_conflict must be one of {', '.join(ON_CONFLICT)}")
+    started = time.monotonic()
+    ensure_cache_columns(pool)
+    ensure_backup_schema(pool)
+    ensure_catalog_schema(pool)
+    registry = SkillRegistry()
+    report = {'inserted': 0, 'updated': 0, 'skipped': 0, 'duration_ms': 0}
+    errors, seen = [], set()
+    inserts, updates = [], []
+
+    insert_query = """
+    INSERT INTO Skills (SkillName, SkillDescription, Parameters, PythonFunction, CachePolicy, CacheTTL, ModifiedAt)
+    VALUES (?, ?, ?, ?, ?, ?, CURRENT_UTCTIMESTAMP)
+    """
+    update_query = """
+    UPDATE Skills SET SkillDescription = ?, Parameters = ?, PythonFunction = ?, CachePolicy = ?, CacheTTL = ?,
+    ModifiedAt = CURRENT_UTCTIMESTAMP WHERE SkillName = ?
+    """
+
+    with pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT SkillName FROM Skills")
+        existing = {row[0] for row in cursor.fetchall()}
+
+        def flush():
+            # nothing is written once the bundle is known to be invalid; the rollback discards the rest
+            if inserts and not errors and not dry_run:
+                cursor.executemany(insert_query, inserts)
+            if updates and not errors and not dry_run:
+                cursor.executemany(update_query, [row[1:] + row[:1] for row in updates])
+            inserts.clear()
+            updates.clear()
+
+        conn.setautocommit(False)
+        position = 0
+        try:
+            records = iter_bundle(stream)
+            while True:
+                try:
+                    record = next(records, _END)
+                except json.JSONDecodeError as e:
+                    errors.append((position + 1, None, f"invalid JSON: {e}"))
+                    break
+                if record is _END:
+                    break
+                position += 1
+                name = record.get('name') if isinstance(record, dict) else None
+                try:
+                    row = validate_skill(record, registry)
+                except Exception as e:
+                    errors.append((position, name, str(e)))
+                    continue
+                if name in seen:
+                    errors.append((position, name, "duplicate skill name in bundle"))
+                    continue
+                seen.add(name)
+                if name not in existing:
+                    inserts.append(row)
+                    report['inserted'] += 1
+                elif on_conflict == 'replace':
+                    updates.append(row)
+                    report['updated'] += 1
+                elif on_conflict == 'skip':
+                    report['skipped'] += 1
+                else:
+                    errors.append((position, name, "skill already exists"))
+                if len(inserts) + len(updates) >= batch_size:
+                    flush()
+            flush()
+            if errors:
+                conn.rollback()
+                raise BundleError(errors)
+            if not dry_run:
+                if report['inserted'] or report['updated']:
+                    bump_catalog_version(cursor)
+                conn.commit()
+        except Exception:
+            # re-enabling autocommit would commit the batches already written
+            conn.rollback()
+            raise
+        finally:
+            conn.setautocommit(True)
+
+    if not dry_run and (report['inserted'] or report['updated']):
+        invalidate_skill_names()
+    report['duration_ms'] = int((time.monotonic() - started) * 1000)
+    logger.info(f"Imported skill bundle: {report}")
+    return report
+
+
+def export_bundle(pool, out, fmt='jsonl', batch_size=DEFAULT_BATCH_SIZE):
+    """Write every skill to the text stream ``out``, fetching ``batch_size`` rows at a time."""
+    if fmt not in BUNDLE_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(BUNDLE_FORMATS)}")
+    ensure_cache_columns(pool)
+    count = 0
+    with pool.cursor() as cursor:
+        cursor.execute(
+            "SELECT SkillName, SkillDescription, Parameters, PythonFunction, CachePolicy, CacheTTL "
+            "FROM Skills ORDER BY SkillName"
+        )
+        if fmt == 'json':
+            out.write('[')
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for name, description, parameters, source, cache_policy, cache_ttl in rows:
+                try:
+                    parameters = json.loads(parameters) if parameters else {}
+                except ValueError:
+                    pass  # keep what is stored, the import validates it
+                entry = json.dumps({
+                    'name': name, 'description': description, 'parameters': parameters, 'source': source,
+                    'cache_policy': cache_policy or 'none', 'cache_ttl': cache_ttl if cache_ttl is not None else 300,
+                })
+                if fmt == 'json':
+                    out.write(('\n  ' if count == 0 else ',\n  ') + entry)
+                else:
+                    out.write(entry + '\n')
+                count += 1
+        if fmt == 'json':
+            out.write('\n]\n')
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import or export Skills as JSON/JSONL bundles.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="write all skills to a bundle")
+    export.add_argument('path', help="output file, - for stdout")
+    export.add_argument('--format', choices=BUNDLE_FORMATS, help="default: from the file extension, else jsonl")
+    load = commands.add_parser('import', help="validate a bundle and write it in one transaction")
+    load.add_argument('path', help="bundle file, - for stdin")
+    load.add_argument('--on-conflict', choices=ON_CONFLICT, default='error')
+    load.add_argument('--dry-run', action='store_true', help="only validate and compile")
+    load.add_argument('--no-backup', action='store_true', help="skip the SKILLS_BACKUP sync afterwards")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    from octo_packages.db import get_pool
+    pool = get_pool()
+
+    if args.command == 'export':
+        fmt = args.format or ('json' if args.path.endswith('.json') else 'jsonl')
+        if args.path == '-':
+            count = export_bundle(pool, sys.stdout, fmt)
+        else:
+            with open(args.path, 'w', encoding='utf-8') as out:
+                count = export_bundle(pool, out, fmt)
+        print(f"Exported {count} skills", file=sys.stderr)
+        return 0
+
+    try:
+        if args.path == '-':
+            report = import_bundle(pool, sys.stdin, args.on_conflict, args.dry_run)
+        else:
+            with open(args.path, encoding='utf-8') as stream:
+                report = import_bundle(pool, stream, args.on_conflict, args.dry_run)
+    except BundleError as e:
+        for position, name, message in e.errors:
+            print(f"#{position} {name or '?'}: {message}", file=sys.stderr)
+        print(e, file=sys.stderr)
+        return 1
+    print(f"{'Validated' if args.dry_run else 'Imported'}: {report['inserted']} new, {report['updated']} replaced, "
+          f"{report['skipped']} skipped in {report['duration_ms']} ms", file=sys.stderr)
+    if not args.dry_run and not args.no_backup:
+        backup = get_backup_sync(pool).sync()
+        print(f"SKILLS_BACKUP: {backup['rows_copied']} rows copied in {backup['duration_ms']} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import os
+import time
+import logging
+import threading
+
+from octo_packages.backup import ensure_backup_schema
+from octo_packages.db import ensure_table
+from octo_packages.result_cache import ensure_cache_columns
+
+logger = logging.getLogger(__name__)
+
+# Every rerun of the chat window used to re-read the whole Skills table to find out whether a
+# skill had been added or edited, and another app instance only noticed a change made in the
+# Skills Studio on its next full reload. Writers now bump a version counter in
+# SKILL_CATALOG_VERSION (in the same transaction where they have one); readers poll that single
+# row at most every POLL_INTERVAL seconds and, when it moved, diff SkillName/ModifiedAt and
+# fetch the sources of the changed skills only.
+
+VERSION_TABLE = 'SKILL_CATALOG_VERSION'
+VERSION_DDL = """
+CREATE COLUMN TABLE SKILL_CATALOG_VERSION (
+    Name NVARCHAR(64) PRIMARY KEY,
+    Version BIGINT,
+    ModifiedAt TIMESTAMP
+)
+"""
+CATALOG_NAME = 'skills'
+
+DEFAULT_POLL_INTERVAL = float(os.getenv('SKILL_CATALOG_POLL_SECONDS', '3'))
+# Writes that bypass the app (e.g. made directly in the database) don't bump the version; a
+# SkillName/ModifiedAt diff this often picks them up anyway. 0 disables it
+DEFAULT_RESYNC_SECONDS = float(os.getenv('SKILL_CATALOG_RESYNC_SECONDS', '300'))
+FETCH_CHUNK_SIZE = 100
+
+
+_schema_ready = False
+
+
+def ensure_catalog_schema(pool):
+    """Create the version table and its row once per process."""
+    global _schema_ready
+    if not _schema_ready:
+        ensure_cache_columns(pool)
+        ensure_backup_schema(pool)
+        ensure_table(pool, VERSION_TABLE, VERSION_DDL)
+        with pool.connection() as conn, conn.cursor() as cursor:
+            # the ModifiedAt diff needs a timestamp on rows written by older app versions
+            cursor.execute("UPDATE Skills SET ModifiedAt = CURRENT_UTCTIMESTAMP WHERE ModifiedAt IS NULL")
+            if read_catalog_version(cursor) is None:
+                try:
+                    cursor.execute(
+                        "INSERT INTO SKILL_CATALOG_VERSION (Name, Version, ModifiedAt) VALUES (?, 0, CURRENT_UTCTIMESTAMP)",
+                        (CATALOG_NAME,)
+                    )
+                    conn.commit()
+                except Exception as e:
+                    # another instance created the row first
+                    logger.debug(f"Catalog version row already exists: {e}")
+        _schema_ready = True
+
+
+def read_catalog_version(cursor):
+    cursor.execute("SELECT Version FROM SKILL_CATALOG_VERSION WHERE Name = ?", (CATALOG_NAME,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def bump_catalog_version(cursor):
+    """Announce a change to the Skills table; call after the write, in its transaction if there is one."""
+    cursor.execute(
+        "UPDATE SKILL_CATALOG_VERSION SET Version = Version + 1, ModifiedAt = CURRENT_UTCTIMESTAMP WHERE Name = ?",
+        (CATALOG_NAME,)
+    )
+
+
+class SkillCatalog:
+    """Process-wide copy of the Skills rows the chat window needs, refreshed by catalog version.
+
+    ``refresh()`` is meant to be called on every rerun: between polls it costs nothing, a poll
+    is one single-row query, and only a changed version leads to reading Skills. ``rows()``
+    returns ``(SkillName, PythonFunction, CachePolicy, CacheTTL, Parameters)`` tuples; the
+    returned tuple is the same object until the catalog changes.
+    """
+
+    def __init__(self, pool, poll_interval=DEFAULT_POLL_INTERVAL, resync_seconds=DEFAULT_RESYNC_SECONDS):
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.resync_seconds = resync_seconds
+        self._lock = threading.Lock()
+        self._skills = {}  # name -> (PythonFunction, CachePolicy, CacheTTL, ModifiedAt, Parameters)
+        self._rows = ()
+        self._version = None
+        self._checked_at = 0.0
+        self._resynced_at = 0.0
+        self._stats = {'polls': 0, 'reloads': 0, 'skills_fetched': 0, 'skills_removed': 0}
+
+    @property
+    def version(self):
+        return self._version
+
+    def rows(self):
+        return self._rows
+
+    def refresh(self, force=False):
+        """Pick up catalog changes; returns the names that were added, changed or removed."""
+        now = time.monotonic()
+        if not force and self._version is not None and now - self._checked_at < self.poll_interval:
+            return []
+        # one poll at a time; concurrent reruns keep using the rows they already have
+        if not self._lock.acquire(blocking=self._version is None or force):
+            return []
+        try:
+            ensure_catalog_schema(self.pool)
+            with self.pool.cursor() as cursor:
+                version = read_catalog_version(cursor)
+                self._checked_at = time.monotonic()
+                self._stats['polls'] += 1
+                resync = self.resync_seconds > 0 and self._checked_at - self._resynced_at >= self.resync_seconds
+                if version == self._version and not (force or resync):
+                    return []
+                changed = self._reload(cursor, version)
+                self._version = version
+                self._resynced_at = self._checked_at
+                return changed
+        finally:
+            self._lock.release()
+
+    def _reload(self, cursor, version):
+        if not self._skills:
+            cursor.execute("SELECT SkillName, PythonFunction, CachePolicy, CacheTTL, ModifiedAt, Parameters FROM Skills")
+            skills = {name: tuple(rest) for name, *rest in cursor.fetchall()}
+            changed = sorted(skills)
+            fetched = len(skills)
+        else:
+            cursor.execute("SELECT SkillName, ModifiedAt FROM Skills")
+            stamps = dict(cursor.fetchall())
+            # rows without ModifiedAt (written by older app versions) are always re-read
+            stale = [name for name, modified_at in stamps.items()
+                     if modified_at is None or name not in self._skills or self._skills[name][3] != modified_at]
+            removed = set(self._skills) - set(stamps)
+            skills = {name: row for name, row in self._skills.items() if name not in removed}
+            for start in range(0, len(stale), FETCH_CHUNK_SIZE):
+                chunk = stale[start:start + FETCH_CHUNK_SIZE]
+                cursor.execute(
+                    "SELECT SkillName, PythonFunction, CachePolicy, CacheTTL, ModifiedAt, Parameters FROM Skills "
+                    f"WHERE SkillName IN ({', '.join('?' for _ in chunk)})",
+                    tuple(chunk)
+                )
+                for name, *rest in cursor.fetchall():
+                    skills[name] = tuple(rest)
+            changed = sorted(name for name in stale if skills.get(name) != self._skills.get(name)) + sorted(removed)
+            fetched = len(stale)
+            self._stats['skills_removed'] += len(removed)
+            if not changed:
+                return []
+        self._stats['reloads'] += 1
+        self._stats['skills_fetched'] += fetched
+        self._skills = skills
+        self._rows = tuple((name, func_code, policy, ttl, parameters)
+                           for name, (func_code, policy, ttl, _, parameters) in skills.items())
+        logger.info(f"Skill catalog at version {version}: reloaded {len(changed)} skill(s)")
+        return changed
+
+    def stats(self):
+        return dict(self._stats, version=self._version, skills=len(self._rows),
+                    poll_interval_s=self.poll_interval)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(pool):
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = SkillCatalog(pool)
+    return _catalog
@@ -0,0 +1,116 @@
+import json
+import logging
+
+from octo_packages.http_pool import HTTP_CLIENT_PARAMETER
+from octo_packages.logs import set_run_id
+from octo_packages.result_cache import ensure_cache_columns
+
+logger = logging.getLogger(__name__)
+
+# Hot-path functions of the chat window. They live here rather than in the page script so
+# they can be imported without a streamlit runtime, e.g. by the benchmarks.
+
+
+def fetch_python_functions(pool):
+    ensure_cache_columns(pool)
+    with pool.cursor() as cursor:
+        cursor.execute("SELECT SkillName, PythonFunction, CachePolicy, CacheTTL, Parameters FROM Skills")
+        return cursor.fetchall()
+
+
+def initialize_functions(pool, skill_registry, result_cache, sandbox=None, catalog=None):
+    """Compile new or changed skills into the registry; returns the names that were compiled.
+
+    With a SkillCatalog the rows come from its version-polled copy instead of a Skills scan.
+    """
+    if catalog is not None:
+        catalog.refresh()
+        rows = catalog.rows()
+        if rows is skill_registry.catalog_rows:
+            return []
+    else:
+        rows = fetch_python_functions(pool)
+    sources = [(name, func_code) for name, func_code, _, _, _ in rows]
+    changed = skill_registry.sync(sources, {name: parameters for name, _, _, _, parameters in rows})
+    if sandbox is not None:
+        # workers pick the new sources up before their next call
+        sandbox.sync(sources)
+    result_cache.set_policies({name: (policy, ttl) for name, _, policy, ttl, _ in rows})
+    if catalog is not None:
+        skill_registry.catalog_rows = rows
+    return changed
+
+
+def fetch_skill_details(pool):
+    try:
+        with pool.cursor() as cursor:
+            cursor.execute("SELECT SKILLNAME, SKILLDESCRIPTION, PARAMETERS FROM SKILLS")
+            return cursor.fetchall()
+    except Exception as e:
+        logger.error(f"An error occurred while fetching skill details: {e}")
+        return []
+
+
+def make_tool_executor(dispatch_table, result_cache, http_pool, sandbox=None, timeout_for=None):
+    """Build the ``execute_tool_call(tool_call)`` function handed to the tool dispatcher.
+
+    Skills are looked up in the ``dispatch_table``, which also supplies their secrets. With a
+    ``sandbox`` the skill runs in one of its worker processes (``timeout_for(name)`` bounds
+    the call).
+    """
+
+    def execute_tool_call(tool):
+        # Runs on a tool dispatcher worker thread, so no st.* calls in here
+        function_name = tool.function.name
+        logger.debug(f"Selected tool: {function_name}")
+
+        entry = dispatch_table.get(function_name)
+        if entry is None:
+            # logging.warning(f"Function {function_name} not found")
+            return None
+
+        function_args = json.loads(tool.function.arguments) if tool.function.arguments else {}
+        logger.debug(f"Function arguments: {function_args}")
+
+        def call():
+            kwargs = entry.arguments(function_args)
+            if sandbox is not None:
+                # the worker injects its own pooled http_client
+                timeout = timeout_for(function_name) if timeout_for is not None else None
+                return sandbox.call(function_name, (), kwargs, timeout=timeout)
+            # Skills that declare an http_client parameter get a pooled keep-alive client
+            if entry.wants_http_client:
+                kwargs[HTTP_CLIENT_PARAMETER] = http_pool.client()
+            return entry.function(**kwargs)
+
+        # Served from the per-skill result cache when the skill's CachePolicy allows it
+        output = result_cache.call(function_name, entry.source_hash, function_args, call)
+
+        logger.debug(f"Output of {function_name}")
+        return output
+
+    return execute_tool_call
+
+
+def submit_required_tool_outputs(client, tool_dispatcher, run, thread_id, execute_tool_call):
+    # Tool calls run in parallel with per-tool timeouts; failures come back as error outputs
+    tool_output_array = tool_dispatcher.dispatch(run.required_action.submit_tool_outputs.tool_calls, execute_tool_call)
+
+    # Submit the tool outputs
+    return client.beta.threads.runs.submit_tool_outputs(
+        thread_id=thread_id,
+        run_id=run.id,
+        tool_outputs=tool_output_array
+    )
+
+
+def wait_on_run(client, run_poller, tool_dispatcher, run, thread_id, execute_tool_call, on_status=None):
+    # records logged while waiting (tool calls included) carry the run ID
+    set_run_id(run.id)
+    def on_requires_action(run):
+        if on_status is not None:
+            on_status(run)
+        return submit_required_tool_outputs(client, tool_dispatcher, run, thread_id, execute_tool_call)
+
+    # Backoff with jitter instead of hammering runs.retrieve; cancels the run past its deadline
+    return run_poller.wait(client, thread_id, run, on_status=on_status, on_requires_action=on_requires_action)
@@ -0,0 +1,145 @@
+import os
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Skills get their backend secrets by naming them as parameters. Any parameter whose name ends
+# in one of SECRET_SUFFIXES (sap_api_key, weather_api_key, github_token, ...) and that the
+# skill's Parameters schema does not declare is filled in by the runtime and never taken from
+# the model's arguments; a declared one (page_token, ...) is an ordinary argument. A secret
+# called ``<name>`` is looked up
+#   1. in the credentials of any bound Cloud Foundry service (VCAP_SERVICES), e.g. a
+#      user-provided service created with ``cf cups skill-secrets -p '{"sap_api_key": "..."}'``
+#   2. in the environment as ``<NAME>`` (e.g. SAP_API_KEY, also from .env)
+#   3. in the file ``.<service>_credentials``, e.g. .sap_credentials for sap_api_key
+# so a new backend needs a credential, not a code change.
+
+SECRET_SUFFIXES = tuple(
+    suffix.strip() for suffix in os.getenv('SKILL_SECRET_SUFFIXES', '_api_key,_token,_secret,_password').split(',')
+    if suffix.strip()
+)
+
+
+def is_secret_parameter(name):
+    return name.endswith(SECRET_SUFFIXES)
+
+
+def secret_file_name(name):
+    """``sap_api_key`` -> ``.sap_credentials``, the files the app has always read."""
+    for suffix in SECRET_SUFFIXES:
+        if name.endswith(suffix) and len(name) > len(suffix):
+            return f".{name[:-len(suffix)]}_credentials"
+    return f".{name}_credentials"
+
+
+def read_secret_file(path):
+    # not pushed to github but exposed in cloud foundry until we switch to CF env vars
+    try:
+        with open(path, 'r') as file:
+            return file.read().strip()
+    except FileNotFoundError:
+        logger.debug(f"{path} not found")
+    except Exception as e:
+        logger.error(f"Error loading {path}: {e}")
+    return None
+
+
+def vcap_credentials(vcap_services=None):
+    """All credential entries of the bound services, flattened to ``{name: value}``."""
+    raw = vcap_services if vcap_services is not None else os.getenv('VCAP_SERVICES')
+    if not raw:
+        return {}
+    try:
+        services = json.loads(raw)
+    except ValueError as e:
+        logger.error(f"VCAP_SERVICES is not valid JSON: {e}")
+        return {}
+    found = {}
+    for instances in services.values():
+        for instance in instances:
+            credentials = instance.get('credentials') or {}
+            for key, value in credentials.items():
+                if isinstance(value, str):
+                    # the first service that has it wins, like the label lookup for hana
+                    found.setdefault(key, value)
+    return found
+
+
+class CredentialProvider:
+    """Resolves secrets by name and caches what it found for the lifetime of the process.
+
+    ``values`` are fixed secrets that take precedence over every source (used by the
+    benchmarks). Missing secrets are not cached, so one added later is found the next time
+    the dispatch table is rebuilt; ``refresh()`` forgets everything.
+    """
+
+    def __init__(self, values=None, environ=None, vcap_services=None, directory='.'):
+        self._values = dict(values or {})
+        self._environ = environ if environ is not None else os.environ
+        self._vcap_services = vcap_services
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._cache = {}  # name -> (value, source)
+        self._vcap = None
+        self._stats = {'lookups': 0, 'hits': 0, 'missing': 0}
+
+    def _vcap_credentials(self):
+        if self._vcap is None:
+            self._vcap = vcap_credentials(self._vcap_services)
+        return self._vcap
+
+    def _resolve(self, name):
+        if name in self._values:
+            return self._values[name], 'static'
+        value = self._vcap_credentials().get(name)
+        if value:
+            return value, 'VCAP_SERVICES'
+        value = self._environ.get(name.upper())
+        if value:
+            return value, 'environment'
+        path = os.path.join(self._directory, secret_file_name(name))
+        value = read_secret_file(path)
+        if value:
+            return value, f'file {path}'
+        return None, None
+
+    def get(self, name):
+        """The secret called ``name`` or None."""
+        with self._lock:
+            self._stats['lookups'] += 1
+            cached = self._cache.get(name)
+            if cached is not None:
+                self._stats['hits'] += 1
+                return cached[0]
+            value, source = self._resolve(name)
+            if value is None:
+                self._stats['missing'] += 1
+                return None
+            self._cache[name] = (value, source)
+        logger.info(f"Credential {name} loaded from {source}")
+        return value
+
+    def refresh(self):
+        with self._lock:
+            self._cache.clear()
+            self._vcap = None
+
+    def stats(self):
+        with self._lock:
+            # which secrets came from where, never their values
+            return dict(self._stats, sources={name: source for name, (_, source) in self._cache.items()})
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_credentials():
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = CredentialProvider()
+    return _provider
@@ -0,0 +1,331 @@
+import os
+import re
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from octo_packages.bootstrap import lazy_import
+from octo_packages.tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+# Pages used to open (and the skills studio to close) a fresh HANA connection on every
+# streamlit rerun. This module keeps one bounded pool per process instead, so all pages
+# and all sessions check connections out per query and hand them back afterwards.
+
+DEFAULT_POOL_SIZE = int(os.getenv('HANA_POOL_SIZE', '4'))
+DEFAULT_CHECKOUT_TIMEOUT = float(os.getenv('HANA_POOL_TIMEOUT', '10'))
+DEFAULT_HEALTH_CHECK_INTERVAL = float(os.getenv('HANA_POOL_HEALTH_CHECK', '30'))
+
+
+_credentials = None
+
+
+def get_db_credentials():
+    # resolved once per process; VCAP_SERVICES and the environment don't change at runtime
+    global _credentials
+    if _credentials is not None:
+        return _credentials
+    logger.debug("Retrieving database credentials")
+    if 'VCAP_SERVICES' in os.environ:
+        logger.debug("Running on Cloud Foundry - fetching credentials from VCAP_SERVICES")
+        env = lazy_import('cfenv').AppEnv()
+        hana_service = env.get_service(label='hana')
+        credentials = hana_service.credentials
+        credentials = credentials['host'], credentials['port'], credentials['user'], credentials['password']
+    else:
+        logger.debug("Running locally - fetching credentials from environment")
+        credentials = os.getenv('HANA_HOST'), os.getenv('HANA_PORT'), os.getenv('HANA_USER'), os.getenv('HANA_PASSWORD')
+    if all(credentials):
+        _credentials = credentials
+    return credentials
+
+
+def connect_hana():
+    dbapi = lazy_import('hdbcli.dbapi')
+    host, port, user, password = get_db_credentials()
+    return dbapi.connect(address=host, port=int(port), user=user, password=password)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+_STATEMENT_TARGET = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE)\s+([\w.]+)', re.IGNORECASE)
+
+
+def statement_name(operation):
+    """Short span name for a SQL statement, e.g. ``hana.SELECT Skills``."""
+    words = operation.split(None, 1)
+    verb = words[0].upper() if words else '?'
+    target = _STATEMENT_TARGET.search(operation)
+    return f"hana.{verb} {target.group(1)}" if target else f"hana.{verb}"
+
+
+class TracedCursor:
+    """Cursor wrapper that records every statement as a 'hana' span."""
+
+    def __init__(self, cursor, tracer):
+        self._cursor = cursor
+        self._tracer = tracer
+
+    def execute(self, operation, parameters=None):
+        with self._tracer.span(statement_name(operation), 'hana'):
+            if parameters is None:
+                return self._cursor.execute(operation)
+            return self._cursor.execute(operation, parameters)
+
+    def executemany(self, operation, seq_of_parameters):
+        with self._tracer.span(statement_name(operation), 'hana', batch=True):
+            return self._cursor.executemany(operation, seq_of_parameters)
+
+    def fetchall(self):
+        with self._tracer.span('hana.fetchall', 'hana'):
+            return self._cursor.fetchall()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+        return False
+
+
+class TracedConnection:
+    def __init__(self, conn, tracer):
+        self._conn = conn
+        self._tracer = tracer
+
+    def cursor(self):
+        return TracedCursor(self._conn.cursor(), self._tracer)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of database connections.
+
+    Connections are created lazily up to ``max_size``. A connection that has been idle for
+    longer than ``health_check_interval`` seconds is pinged before it is handed out and
+    replaced if the ping fails.
+    """
+
+    def __init__(self, connect, max_size=DEFAULT_POOL_SIZE, checkout_timeout=DEFAULT_CHECKOUT_TIMEOUT,
+                 health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL, ping_query="SELECT 1 FROM DUMMY", tracer=None):
+        self._connect = connect
+        self._tracer = tracer or get_tracer()
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self.ping_query = ping_query
+
+        self._cond = threading.Condition()
+        self._idle = []  # (connection, last_used) pairs, most recently used last
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._connects = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _open(self):
+        conn = self._connect()
+        with self._cond:
+            self._connects += 1
+        return conn
+
+    def _is_healthy(self, conn):
+        try:
+            if hasattr(conn, 'isconnected') and not conn.isconnected():
+                return False
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.ping_query)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled connection failed health check: {e}")
+            return False
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    create = False
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, last_used = None, None
+                    create = True
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No database connection available after {self.checkout_timeout}s")
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        try:
+            if create:
+                conn = self._open()
+            elif time.monotonic() - last_used > self.health_check_interval and not self._is_healthy(conn):
+                self._discard(conn)
+                conn = self._open()
+                with self._cond:
+                    self._reconnects += 1
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def release(self, conn, broken=False):
+        if not broken and hasattr(conn, 'isconnected'):
+            try:
+                broken = not conn.isconnected()
+            except Exception:
+                broken = True
+        with self._cond:
+            self._in_use -= 1
+            if broken or self._closed:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if broken or self._closed:
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        broken = False
+        try:
+            yield TracedConnection(conn, self._tracer)
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self.release(conn, broken=broken)
+
+    @contextmanager
+    def cursor(self):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def metrics(self):
+        with self._cond:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'connects': self._connects,
+                'reconnects': self._reconnects,
+                'wait_avg_ms': (self._wait_total / self._checkouts * 1000) if self._checkouts else 0.0,
+                'wait_max_ms': self._wait_max * 1000,
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+
+def table_exists(cursor, table_name):
+    cursor.execute(
+        "SELECT COUNT(*) FROM SYS.TABLES WHERE SCHEMA_NAME = CURRENT_SCHEMA AND TABLE_NAME = ?",
+        (table_name.upper(),)
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def ensure_table(pool, table_name, ddl):
+    """Create ``table_name`` with ``ddl`` unless it already exists in the current schema."""
+    with pool.connection() as conn, conn.cursor() as cursor:
+        if table_exists(cursor, table_name):
+            return False
+        cursor.execute(ddl)
+        conn.commit()
+        logger.info(f"Created table {table_name}")
+        return True
+
+
+def ensure_columns(pool, table_name, columns):
+    """Add the ``{column name: column definition}`` entries that ``table_name`` is still missing."""
+    with pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT COLUMN_NAME FROM SYS.TABLE_COLUMNS WHERE SCHEMA_NAME = CURRENT_SCHEMA AND TABLE_NAME = ?",
+            (table_name.upper(),)
+        )
+        existing = {row[0].upper() for row in cursor.fetchall()}
+        added = []
+        for column_name, definition in columns.items():
+            if column_name.upper() not in existing:
+                cursor.execute(f"ALTER TABLE {table_name} ADD ({column_name} {definition})")
+                added.append(column_name)
+        if added:
+            conn.commit()
+            logger.info(f"Added columns {added} to {table_name}")
+        return added
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide HANA pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(connect_hana)
+                logger.debug("HANA connection pool created")
+    return _pool
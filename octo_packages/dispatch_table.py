@@ -0,0 +1,201 @@
+import os
+import inspect
+import logging
+import threading
+
+from octo_packages.credentials import get_credentials, is_secret_parameter
+from octo_packages.http_pool import HTTP_CLIENT_PARAMETER
+
+logger = logging.getLogger(__name__)
+
+# Every tool call used to fetch the skill from the registry and then scan its
+# __code__.co_varnames for sap_api_key or weather_api_key to decide which secret to pass, so
+# a new backend secret meant editing the executor. The dispatch table is built when the skills
+# (re)load instead: one SkillEntry per skill with its secrets already resolved from the
+# CredentialProvider by parameter name, so a call is a dict lookup plus a kwargs merge.
+# A parameter the skill's Parameters schema declares is always the model's to fill, even if
+# its name looks like a secret (page_token, reset_password, ...).
+#
+# SKILL_ARG_COERCION=on additionally converts the model's JSON arguments to the type a
+# parameter declares (annotation, or the type of its default), e.g. "5" -> 5 for
+# ``days: int``, and drops arguments the skill does not accept instead of failing the call.
+
+COERCE_ARGUMENTS = os.getenv('SKILL_ARG_COERCION', 'off').lower() in ('on', '1', 'true', 'yes')
+
+COERCIBLE_TYPES = {'int': int, 'float': float, 'bool': bool, 'str': str}
+TRUE_STRINGS = ('true', 'yes', '1', 'on')
+FALSE_STRINGS = ('false', 'no', '0', 'off')
+
+
+def parameter_type(parameter):
+    """int, float, bool or str if ``parameter`` declares one of them, else None."""
+    annotation = parameter.annotation
+    if isinstance(annotation, str):
+        # from __future__ import annotations, or a quoted annotation
+        annotation = COERCIBLE_TYPES.get(annotation)
+    if annotation in COERCIBLE_TYPES.values():
+        return annotation
+    default = parameter.default
+    if default is not inspect.Parameter.empty and type(default) in COERCIBLE_TYPES.values():
+        return type(default)
+    return None
+
+
+def coerce_value(value, kind):
+    """Convert ``value`` to ``kind`` where that is unambiguous; anything else is returned unchanged."""
+    if value is None or type(value) is kind:
+        return value
+    try:
+        if kind is bool:
+            if isinstance(value, str) and value.strip().lower() in TRUE_STRINGS + FALSE_STRINGS:
+                return value.strip().lower() in TRUE_STRINGS
+            if isinstance(value, int) and value in (0, 1):
+                return bool(value)
+        elif kind is int:
+            if isinstance(value, str):
+                return int(value.strip())
+            if isinstance(value, float) and value.is_integer():
+                return int(value)
+        elif kind is float:
+            if isinstance(value, str):
+                return float(value.strip())
+            if isinstance(value, int) and not isinstance(value, bool):
+                return float(value)
+        elif kind is str:
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return str(value)
+    except ValueError:
+        pass
+    return value
+
+
+class SkillEntry:
+    """A skill with everything a call needs precomputed from its signature."""
+
+    __slots__ = ('name', 'function', 'source_hash', 'secrets', 'wants_http_client', 'accepted', 'types', 'declared')
+
+    def __init__(self, name, function, source_hash, secrets, wants_http_client, accepted=None, types=None,
+                 declared=None):
+        self.name = name
+        self.function = function
+        self.source_hash = source_hash
+        self.secrets = secrets  # parameter -> resolved secret
+        self.wants_http_client = wants_http_client
+        self.accepted = accepted  # parameters the model may fill; None when the skill takes **kwargs
+        self.types = types  # parameter -> type to coerce to; None when coercion is off
+        self.declared = declared  # parameters of the skill's schema it was built with
+
+    def arguments(self, function_args):
+        """Keyword arguments for one call: the model's arguments plus the skill's secrets."""
+        # secrets always come from the credential provider, never from the model
+        kwargs = {key: value for key, value in function_args.items() if key not in self.secrets}
+        if self.types is not None:
+            if self.accepted is not None:
+                kwargs = {key: value for key, value in kwargs.items() if key in self.accepted}
+            for key, kind in self.types.items():
+                if key in kwargs:
+                    kwargs[key] = coerce_value(kwargs[key], kind)
+        kwargs.update(self.secrets)
+        return kwargs
+
+
+def build_entry(name, function, source_hash, credentials, coerce=False, declared=None):
+    signature = inspect.signature(function)
+    secrets, accepted, types = {}, set(), {}
+    takes_kwargs = False
+    for parameter in signature.parameters.values():
+        if parameter.kind is inspect.Parameter.VAR_KEYWORD:
+            takes_kwargs = True
+            continue
+        if parameter.kind in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.POSITIONAL_ONLY):
+            continue
+        if parameter.name == HTTP_CLIENT_PARAMETER:
+            continue
+        if is_secret_parameter(parameter.name) and (declared is None or parameter.name not in declared):
+            value = credentials.get(parameter.name)
+            if value is not None:
+                secrets[parameter.name] = value
+            elif parameter.default is inspect.Parameter.empty:
+                # the skill decides what to do without it, as it always had to
+                logger.warning(f"No credential found for {parameter.name} of skill {name}")
+                secrets[parameter.name] = None
+            continue
+        accepted.add(parameter.name)
+        kind = parameter_type(parameter)
+        if kind is not None:
+            types[parameter.name] = kind
+    return SkillEntry(
+        name, function, source_hash, secrets,
+        wants_http_client=HTTP_CLIENT_PARAMETER in signature.parameters,
+        accepted=None if takes_kwargs else frozenset(accepted),
+        types=types if coerce else None,
+        declared=declared,
+    )
+
+
+class DispatchTable:
+    """Skill name -> SkillEntry for everything loaded in a SkillRegistry.
+
+    ``get()`` rebuilds the table when the registry's version moved (i.e. once after skills
+    were loaded or changed) and is a dict lookup otherwise. Entries of unchanged skills are
+    kept across rebuilds.
+    """
+
+    def __init__(self, registry, credentials=None, coerce=COERCE_ARGUMENTS):
+        self.registry = registry
+        self.credentials = credentials or get_credentials()
+        self.coerce = coerce
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._version = None
+        self._stats = {'builds': 0, 'entries_built': 0, 'build_errors': 0}
+
+    def get(self, name):
+        if self._version != self.registry.version:
+            self.rebuild()
+        return self._entries.get(name)
+
+    def rebuild(self):
+        with self._lock:
+            version = self.registry.version
+            if version == self._version:
+                return
+            entries = {}
+            for name, function, digest in self.registry.items():
+                declared = self.registry.declared_parameters(name)
+                current = self._entries.get(name)
+                if (current is not None and current.source_hash == digest and current.function is function
+                        and current.declared == declared):
+                    entries[name] = current
+                    continue
+                try:
+                    entries[name] = build_entry(name, function, digest, self.credentials, self.coerce, declared)
+                    self._stats['entries_built'] += 1
+                except (TypeError, ValueError) as e:
+                    # no inspectable signature: call it with the model's arguments only
+                    logger.error(f"Cannot inspect the signature of skill {name}: {e}")
+                    entries[name] = SkillEntry(name, function, digest, {}, False, declared=declared)
+                    self._stats['build_errors'] += 1
+            # swap in a fresh dict so lookups never see a half-built table
+            self._entries = entries
+            self._version = version
+            self._stats['builds'] += 1
+
+    def stats(self):
+        entries = self._entries
+        return dict(self._stats, entries=len(entries), coerce=self.coerce,
+                    secrets=sorted({name for entry in entries.values() for name in entry.secrets}),
+                    credentials=self.credentials.stats())
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_dispatch_table(registry):
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = DispatchTable(registry)
+    return _table
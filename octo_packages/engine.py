@@ -0,0 +1,267 @@
+import os
+import time
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from octo_packages.bootstrap import lazy_import
+from octo_packages.openai_keys import key_fingerprint
+from octo_packages.rate_limit import RATE_LIMIT_ENABLED, async_http_client, get_rate_limiter, limited_client
+from octo_packages.polling import CANCEL, SUBMIT_TOOL_OUTPUTS, get_poller
+from octo_packages.streaming import MESSAGE_DELTA_EVENT, STREAMING_ENABLED, StreamState
+from octo_packages.tool_dispatch import get_dispatcher
+from octo_packages.logs import bind_log_context, current_session_id, set_run_id
+from octo_packages.tracing import TracedProxy, current_trace_id, get_tracer, set_trace_id
+
+logger = logging.getLogger(__name__)
+
+# The blocking chat path ties up a streamlit script thread for the whole run. The engine
+# runs every session's run on one shared asyncio loop in a background thread instead; pages
+# submit a prompt and get a RunHandle back that they can wait on or poll.
+
+DEFAULT_MAX_CONCURRENT_RUNS = int(os.getenv('ENGINE_MAX_CONCURRENT_RUNS', '64'))
+
+
+class RunHandle:
+    """Lightweight view of a submitted run that can be polled from a streamlit script."""
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.run_id = None
+        self.status = 'submitted'
+        self.polls = 0
+        self.submitted_at = time.monotonic()
+        self.finished_at = None
+        self.stream = None  # StreamState when the run was submitted for streaming; never reset
+        self._future = None
+
+    def done(self):
+        return self._future is not None and self._future.done()
+
+    def result(self, timeout=None):
+        """Wait for the final run object; re-raises whatever the run raised."""
+        return self._future.result(timeout)
+
+    def cancel(self):
+        return self._future.cancel()
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.monotonic()) - self.submitted_at
+
+
+class RunEngine:
+    def __init__(self, poller=None, dispatcher=None, max_concurrent_runs=DEFAULT_MAX_CONCURRENT_RUNS,
+                 client_factory=None, streaming=STREAMING_ENABLED):
+        self.poller = poller or get_poller()
+        self.dispatcher = dispatcher or get_dispatcher()
+        self.max_concurrent_runs = max_concurrent_runs
+        self._client_factory = client_factory
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._semaphore = None
+        self._executor = None
+        self._active = 0
+        self._submitted = 0
+        self.streaming = streaming
+        self._streamed = 0
+        self._stream_fallbacks = 0
+
+    def start(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            # tool dispatch waits on threads; keep them apart from the loop's default executor
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent_runs,
+                                                thread_name_prefix='run-engine-dispatch')
+            self._thread = threading.Thread(target=self._loop.run_forever, name='run-engine', daemon=True)
+            self._thread.start()
+            # created on the loop so it binds there
+            self._semaphore = asyncio.run_coroutine_threadsafe(self._make_semaphore(), self._loop).result()
+
+    async def _make_semaphore(self):
+        return asyncio.Semaphore(self.max_concurrent_runs)
+
+    def stop(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _client(self, api_key):
+        fingerprint = key_fingerprint(api_key)
+        with self._lock:
+            client = self._clients.get(fingerprint)
+            if client is None:
+                if self._client_factory is not None:
+                    client = self._client_factory(api_key)
+                else:
+                    options = {}
+                    if RATE_LIMIT_ENABLED:
+                        options = {'max_retries': 0, 'http_client': async_http_client(get_rate_limiter())}
+                    client = lazy_import('openai').AsyncOpenAI(api_key=api_key, **options)
+                client = self._clients[fingerprint] = TracedProxy(limited_client(client), get_tracer())
+        return client
+
+    def forget_client(self, api_key):
+        with self._lock:
+            self._clients.pop(key_fingerprint(api_key), None)
+
+    def submit(self, api_key, thread_id, assistant_id, prompt, execute_tool_call, instructions=None):
+        """Post ``prompt`` to the thread, run the assistant and return a RunHandle right away.
+
+        ``execute_tool_call(tool_call)`` is called on a worker thread for every tool call. While
+        the engine streams, ``handle.stream.text`` holds the answer written so far; if the stream
+        cannot start, ``handle.stream.fell_back`` is set and the run is polled instead.
+        """
+        self.start()
+        handle = RunHandle(thread_id)
+        if self.streaming:
+            handle.stream = StreamState()
+        coroutine = self._run(handle, self._client(api_key), assistant_id, prompt, execute_tool_call, instructions,
+                              current_trace_id(), current_session_id())
+        handle._future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        with self._lock:
+            self._submitted += 1
+        return handle
+
+    async def _run(self, handle, client, assistant_id, prompt, execute_tool_call, instructions, trace_id,
+                   session_id=None):
+        # the task runs in the loop thread's context, so carry the submitting turn's trace and session over
+        set_trace_id(trace_id)
+        bind_log_context(session_id)
+        async with self._semaphore:
+            with self._lock:
+                self._active += 1
+            try:
+                return await self._drive(handle, client, assistant_id, prompt, execute_tool_call, instructions)
+            finally:
+                handle.finished_at = time.monotonic()
+                with self._lock:
+                    self._active -= 1
+
+    async def _drive(self, handle, client, assistant_id, prompt, execute_tool_call, instructions):
+        thread_id = handle.thread_id
+        await client.beta.threads.messages.create(thread_id=thread_id, role="user", content=prompt)
+
+        params = {"thread_id": thread_id, "assistant_id": assistant_id}
+        if instructions:
+            params["instructions"] = instructions
+
+        stream = handle.stream
+        if stream is not None:
+            try:
+                return await self._stream(handle, client, params, execute_tool_call)
+            except Exception as e:
+                if stream.events:
+                    raise
+                # the stream never started (e.g. no SSE support in front of the API); poll instead.
+                # The page may be reading handle.stream right now, so flag it rather than dropping it.
+                logger.warning(f"Streaming run failed before its first event, falling back to polling: {e}")
+                stream.fell_back = True
+                with self._lock:
+                    self._stream_fallbacks += 1
+
+        run = await client.beta.threads.runs.create(**params)
+        handle.run_id, handle.status = run.id, run.status
+        set_run_id(run.id)
+        return await self._poll(handle, client, run, execute_tool_call)
+
+    async def _dispatch(self, tool_calls, execute_tool_call):
+        loop = asyncio.get_running_loop()
+        # the dispatcher blocks on its own thread pool, so keep it off the event loop
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, context.run, self.dispatcher.dispatch, tool_calls,
+                                          execute_tool_call)
+
+    async def _stream(self, handle, client, params, execute_tool_call):
+        state = handle.stream
+        try:
+            stream = await client.beta.threads.runs.create(stream=True, **params)
+            while True:
+                required = None
+                async with stream:
+                    async for event in stream:
+                        required = state.handle(event) or required
+                        if state.run is not None and event.event != MESSAGE_DELTA_EVENT:
+                            if handle.run_id != state.run.id:
+                                set_run_id(state.run.id)
+                            handle.run_id, handle.status = state.run.id, state.run.status
+                if required is None:
+                    break
+                tool_outputs = await self._dispatch(required.required_action.submit_tool_outputs.tool_calls,
+                                                    execute_tool_call)
+                state.tool_rounds += 1
+                stream = await client.beta.threads.runs.submit_tool_outputs(
+                    thread_id=handle.thread_id, run_id=required.id, tool_outputs=tool_outputs, stream=True
+                )
+        finally:
+            if state.events:
+                state.finish()
+        with self._lock:
+            self._streamed += 1
+        return state.run
+
+    async def _poll(self, handle, client, run, execute_tool_call):
+        # backoff, deadline and cancel come from the poller; this only does the I/O without blocking
+        thread_id = handle.thread_id
+        steps = self.poller.steps(run)
+        try:
+            action, run, delay = next(steps)
+            while True:
+                if action == SUBMIT_TOOL_OUTPUTS:
+                    tool_outputs = await self._dispatch(run.required_action.submit_tool_outputs.tool_calls,
+                                                        execute_tool_call)
+                    run = await client.beta.threads.runs.submit_tool_outputs(
+                        thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs
+                    )
+                elif action == CANCEL:
+                    try:
+                        run = await client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+                    except Exception as e:
+                        logger.error(f"Failed to cancel run {run.id}: {e}")
+                else:
+                    await asyncio.sleep(delay)
+                    run = await client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+                    handle.polls += 1
+                handle.status = run.status
+                action, run, delay = steps.send(run)
+        except StopIteration as done:
+            run = done.value
+        handle.status = run.status
+        return run
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self._loop is not None,
+                'active_runs': self._active,
+                'submitted_runs': self._submitted,
+                'streaming': self.streaming,
+                'streamed_runs': self._streamed,
+                'stream_fallbacks': self._stream_fallbacks,
+                'clients': len(self._clients),
+                'max_concurrent_runs': self.max_concurrent_runs,
+            }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RunEngine()
+    return _engine
@@ -79,7 +79,7 @@
     
 # import requests
 
-# def get_fieldglass_approvals(sap_api_key):
+# def get_fieldglass_approvals(sap_api_key, http_client=None):
 #     """
 #     Function to send a GET request to the SAP Fieldglass API for approvals.
 #     The API key is read from a file named '.sap_credentials'.
@@ -96,8 +96,8 @@
 #         "Accept": "application/json"
 #     }
 
-#     # Sending the GET request
-#     response = requests.get(url, headers=headers)
+#     # Sending the GET request (http_client is the runtime's pooled keep-alive client when injected)
+#     response = (http_client or requests).get(url, headers=headers)
 
 #     # Check if the request was successful
 #     if response.status_code == 200:
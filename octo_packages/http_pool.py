@@ -0,0 +1,204 @@
+import os
+import time
+import logging
+import threading
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Skills used to call bare requests.get(...), paying for DNS, TCP and TLS on every tool call.
+# The runtime keeps one keep-alive session per host instead and hands skills a client for it
+# when they declare an ``http_client`` parameter (the same way sap_api_key gets injected).
+# Skills in sandbox workers use the worker's own pool; the worker sends the counters of each
+# call back with its reply and the app process merges them, so the per-host stats cover both.
+
+HTTP_CLIENT_PARAMETER = 'http_client'
+
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv('SKILL_HTTP_CONNECT_TIMEOUT', '5'))
+DEFAULT_READ_TIMEOUT = float(os.getenv('SKILL_HTTP_READ_TIMEOUT', '20'))
+DEFAULT_RETRIES = int(os.getenv('SKILL_HTTP_RETRIES', '2'))
+DEFAULT_POOL_MAXSIZE = int(os.getenv('SKILL_HTTP_POOL_MAXSIZE', '8'))
+
+
+def host_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+class HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.remote_connections = 0  # opened by sandbox workers
+
+    def as_dict(self, connections):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'connections_opened': connections,
+            'reused_requests': max(0, self.requests - connections),
+            'avg_ms': self.total_seconds / self.requests * 1000 if self.requests else 0.0,
+            'max_ms': self.max_seconds * 1000,
+        }
+
+
+class HttpSessionPool:
+    """One keep-alive ``requests.Session`` per host with default timeouts and retries."""
+
+    def __init__(self, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 retries=DEFAULT_RETRIES, pool_maxsize=DEFAULT_POOL_MAXSIZE):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.pool_maxsize = pool_maxsize
+        self._lock = threading.Lock()
+        self._sessions = {}  # host -> (session, adapter)
+        self._stats = {}  # host -> HostStats
+
+    def _new_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=0.3,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE']),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session, adapter
+
+    def session_for(self, url):
+        host = host_key(url)
+        with self._lock:
+            entry = self._sessions.get(host)
+            if entry is None:
+                entry = self._sessions[host] = self._new_session()
+                self._stats[host] = HostStats()
+        return entry[0]
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        session = self.session_for(url)
+        host = host_key(url)
+        started = time.monotonic()
+        try:
+            return session.request(method, url, **kwargs)
+        except Exception:
+            with self._lock:
+                self._stats[host].errors += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                stats = self._stats[host]
+                stats.requests += 1
+                stats.total_seconds += elapsed
+                stats.max_seconds = max(stats.max_seconds, elapsed)
+
+    @staticmethod
+    def _connections_opened(adapter):
+        # urllib3 counts the connections each host pool had to open
+        pools = adapter.poolmanager.pools
+        return sum(getattr(pools[key], 'num_connections', 0) for key in pools.keys())
+
+    def counters(self):
+        """Raw per-host counters as ``host -> (requests, errors, seconds, max seconds, connections)``."""
+        with self._lock:
+            return {
+                host: (stats.requests, stats.errors, stats.total_seconds, stats.max_seconds,
+                       self._connections_opened(self._sessions[host][1]) if host in self._sessions else 0)
+                for host, stats in self._stats.items()
+            }
+
+    def merge(self, delta):
+        """Add counters measured in another process (see ``counters_delta``) to this pool's stats."""
+        with self._lock:
+            for host, (requests, errors, seconds, max_seconds, connections) in delta.items():
+                stats = self._stats.get(host)
+                if stats is None:
+                    stats = self._stats[host] = HostStats()
+                stats.requests += requests
+                stats.errors += errors
+                stats.total_seconds += seconds
+                stats.max_seconds = max(stats.max_seconds, max_seconds)
+                stats.remote_connections += connections
+
+    def stats(self):
+        with self._lock:
+            return {
+                host: stats.as_dict(stats.remote_connections + (
+                    self._connections_opened(self._sessions[host][1]) if host in self._sessions else 0))
+                for host, stats in self._stats.items()
+            }
+
+    def client(self):
+        return PooledHttpClient(self)
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session, _ in sessions.values():
+            session.close()
+
+
+class PooledHttpClient:
+    """The object skills receive as ``http_client``; mirrors the requests module API."""
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def request(self, method, url, **kwargs):
+        return self._pool.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+
+def counters_delta(before, after):
+    """What changed between two ``counters()`` snapshots; max seconds is the latest maximum."""
+    delta = {}
+    for host, now in after.items():
+        then = before.get(host, (0, 0, 0.0, 0.0, 0))
+        if now[0] != then[0] or now[1] != then[1]:
+            delta[host] = (now[0] - then[0], now[1] - then[1], now[2] - then[2], now[3], now[4] - then[4])
+    return delta
+
+
+def accepts_parameter(function, name):
+    code = function.__code__
+    return name in code.co_varnames[:code.co_argcount + code.co_kwonlyargcount]
+
+
+_http_pool = None
+_http_pool_lock = threading.Lock()
+
+
+def get_http_pool():
+    global _http_pool
+    if _http_pool is None:
+        with _http_pool_lock:
+            if _http_pool is None:
+                _http_pool = HttpSessionPool()
+    return _http_pool
@@ -0,0 +1,237 @@
+import os
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+import contextvars
+import logging.handlers
+from collections import Counter
+from datetime import datetime, timezone
+
+from octo_packages.tracing import current_trace_id
+
+# Logging used to be logging.basicConfig(): every record was formatted and written to stdout on
+# the thread that logged it, i.e. on the script and tool threads of the chat hot path. The root
+# logger now only gets a QueueHandler. Records are put on a bounded queue as they are (message
+# and arguments unformatted, so pass arguments the %-style way, not as f-strings) and one
+# listener thread formats and writes them. A full queue drops records instead of blocking.
+#
+# Records can carry an event name (``extra={'event': 'run.status'}``). Per event, LOG_SAMPLING
+# keeps only a fraction of the records and LOG_RATE_CAPS at most that many records per minute;
+# warnings and errors are always kept. Every record is stamped with the session, OpenAI run and
+# trace IDs of the context it was logged in, and LOG_FORMAT=json writes one JSON object per line
+# (the default on Cloud Foundry).
+
+CUSTOM_INFO_LEVEL_NUM = 25
+CUSTOM_INFO_LEVEL_NAME = 'LOGGING'
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', CUSTOM_INFO_LEVEL_NAME)
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json' if 'VCAP_APPLICATION' in os.environ else 'text').lower()
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+# event=fraction of its records that are written
+DEFAULT_SAMPLING = 'run.status=0.2'
+# event=records per minute
+DEFAULT_RATE_CAPS = 'page.environment=6,openai.client=6,skills.loaded=6,tools.loaded=6'
+RATE_WINDOW_SECONDS = 60.0
+
+CONTEXT_FIELDS = ('event', 'session_id', 'run_id', 'trace_id')
+
+_session_id = contextvars.ContextVar('octo_log_session', default=None)
+_run_id = contextvars.ContextVar('octo_log_run', default=None)
+
+
+def parse_event_settings(value, convert):
+    """``'run.status=0.2,skills.loaded=6'`` -> ``{'run.status': convert('0.2'), ...}``."""
+    settings = {}
+    for item in (value or '').split(','):
+        event, _, setting = item.partition('=')
+        if event.strip() and setting.strip():
+            try:
+                settings[event.strip()] = convert(setting.strip())
+            except ValueError:
+                logging.getLogger(__name__).warning(f"Ignoring log setting {item.strip()!r}")
+    return settings
+
+
+LOG_SAMPLING = parse_event_settings(os.getenv('LOG_SAMPLING', DEFAULT_SAMPLING), float)
+LOG_RATE_CAPS = parse_event_settings(os.getenv('LOG_RATE_CAPS', DEFAULT_RATE_CAPS), int)
+
+
+# -- correlation IDs ---------------------------------------------------------------------------
+
+def bind_log_context(session_id=None, run_id=None):
+    """Set the session and run that records logged from this context belong to."""
+    _session_id.set(session_id)
+    _run_id.set(run_id)
+
+
+def set_run_id(run_id):
+    _run_id.set(run_id)
+
+
+def current_session_id():
+    return _session_id.get()
+
+
+def current_run_id():
+    return _run_id.get()
+
+
+# -- handler, filter, formatters ---------------------------------------------------------------
+
+class EventFilter(logging.Filter):
+    """Samples and rate-caps records by their ``event``; runs before a record is queued."""
+
+    def __init__(self, sampling=None, rate_caps=None, seed=None):
+        super().__init__()
+        self.sampling = dict(sampling or {})
+        self.rate_caps = dict(rate_caps or {})
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._windows = {}  # event -> [window start, records kept in it]
+        self.sampled_out = Counter()
+        self.rate_capped = Counter()
+
+    def filter(self, record):
+        event = getattr(record, 'event', None)
+        if event is None or record.levelno >= logging.WARNING:
+            return True
+        rate = self.sampling.get(event)
+        if rate is not None and self._random.random() >= rate:
+            self.sampled_out[event] += 1
+            return False
+        cap = self.rate_caps.get(event)
+        if cap is not None:
+            with self._lock:
+                window = self._windows.get(event)
+                if window is None or record.created - window[0] >= RATE_WINDOW_SECONDS:
+                    window = self._windows[event] = [record.created, 0]
+                if window[1] >= cap:
+                    self.rate_capped[event] += 1
+                    return False
+                window[1] += 1
+        return True
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that neither formats on the logging thread nor blocks when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.enqueued = 0
+        self.dropped = 0
+
+    def prepare(self, record):
+        # the listener lives in this process, so the record can be queued unformatted; the
+        # message (and the repr of its arguments) is only built on the listener thread
+        record.session_id = _session_id.get()
+        record.run_id = _run_id.get()
+        record.trace_id = current_trace_id()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                payload[field] = value
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The ``LEVEL:logger:message`` lines of logging.basicConfig plus the correlation IDs."""
+
+    def __init__(self):
+        super().__init__('%(levelname)s:%(name)s:%(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        context = ' '.join(f"{field}={getattr(record, field)}" for field in CONTEXT_FIELDS[1:]
+                           if getattr(record, field, None) is not None)
+        return f"{line} [{context}]" if context else line
+
+
+def _custom_logger(self, message, *args, **kws):
+    if self.isEnabledFor(CUSTOM_INFO_LEVEL_NUM):
+        # Yes, logger takes its '*args' as 'args'.
+        self._log(CUSTOM_INFO_LEVEL_NUM, message, args, **kws)
+
+
+def parse_level(level):
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).upper())
+    return value if isinstance(value, int) else int(level)
+
+
+# -- setup -------------------------------------------------------------------------------------
+
+_handler = None
+_filter = None
+_listener = None
+_format = None
+_setup_lock = threading.Lock()
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, queue_size=LOG_QUEUE_SIZE, sampling=None, rate_caps=None):
+    """Route the root logger through the queue and start the listener; later calls are no-ops."""
+    global _handler, _filter, _listener, _format
+    # Define a new logging level and add the custom_logger method to the Logger class
+    logging.addLevelName(CUSTOM_INFO_LEVEL_NUM, CUSTOM_INFO_LEVEL_NAME)
+    logging.Logger.custom_logger = _custom_logger
+    with _setup_lock:
+        if _handler is not None:
+            return _handler
+        output = logging.StreamHandler()
+        output.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+        handler = AsyncQueueHandler(queue.Queue(queue_size))
+        event_filter = EventFilter(LOG_SAMPLING if sampling is None else sampling,
+                                   LOG_RATE_CAPS if rate_caps is None else rate_caps)
+        handler.addFilter(event_filter)
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(parse_level(level))
+
+        listener = logging.handlers.QueueListener(handler.queue, output)
+        listener.start()
+        # write what is still queued when the process stops
+        atexit.register(listener.stop)
+        _handler, _filter, _listener, _format = handler, event_filter, listener, fmt
+        return handler
+
+
+def logging_stats():
+    handler, event_filter = _handler, _filter
+    if handler is None:
+        return {'configured': False}
+    return {
+        'configured': True,
+        'format': _format,
+        'level': logging.getLevelName(logging.getLogger().level),
+        'queued': handler.queue.qsize(),
+        'enqueued': handler.enqueued,
+        'dropped_queue_full': handler.dropped,
+        'sampled_out': dict(event_filter.sampled_out),
+        'rate_capped': dict(event_filter.rate_capped),
+    }
@@ -0,0 +1,176 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 100
+# What the chat window keeps per session: the newest HISTORY_WINDOW messages, and never more
+# than HISTORY_MAX_BYTES of message text. Older messages stay in the thread and are fetched
+# again, HISTORY_PAGE_SIZE at a time, when the user asks for them.
+HISTORY_WINDOW = int(os.getenv('CHAT_HISTORY_WINDOW', '40'))
+HISTORY_MAX_BYTES = int(os.getenv('CHAT_HISTORY_MAX_BYTES', str(256 * 1024)))
+HISTORY_PAGE_SIZE = int(os.getenv('CHAT_HISTORY_PAGE_SIZE', '20'))
+
+
+def message_text(message):
+    return message.content[0].text.value if message.content else ""
+
+
+def entry_size(entry):
+    return len(entry["content"].encode('utf-8')) + len(entry["id"]) + len(entry["role"])
+
+
+def has_more_pages(page, page_size):
+    has_more = getattr(page, 'has_more', None)
+    if has_more is None:
+        return len(page.data) >= page_size
+    return has_more
+
+
+class MessageSync:
+    """Incremental, cursor-based copy of a thread's messages.
+
+    Remembers the last message ID it has seen and only asks the API for messages after it
+    (``order='asc'``), paging until the thread is exhausted. ``history`` keeps the messages
+    in thread order as ``{"id", "role", "content"}`` dicts; ``_index`` makes dedupe O(1).
+
+    With ``max_messages`` and/or ``max_bytes`` only the newest messages within those limits
+    are kept: the first sync reads just the newest page of the thread, older entries are
+    dropped from the front, and ``load_earlier()`` fetches the page before the oldest kept
+    message on demand (still within ``max_bytes``). ``has_earlier`` tells whether there is one.
+    """
+
+    def __init__(self, thread_id, page_size=DEFAULT_PAGE_SIZE, max_messages=None, max_bytes=None):
+        self.thread_id = thread_id
+        self.page_size = page_size
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.last_message_id = None
+        self.first_message_id = None  # API id of the oldest message in history
+        self.has_earlier = False
+        self.history = []
+        self.bytes = 0
+        self._index = {}
+        self._extra = 0  # older messages loaded on request, on top of max_messages
+
+    @property
+    def windowed(self):
+        return self.max_messages is not None or self.max_bytes is not None
+
+    def __contains__(self, unique_message_id):
+        return unique_message_id in self._index
+
+    def _entry(self, message_id, role, content):
+        # Construct a unique identifier for the message
+        unique_message_id = f"{message_id}-{role}"
+        if unique_message_id in self._index:
+            return None
+        return {"id": unique_message_id, "message_id": message_id, "role": role, "content": content}
+
+    def add(self, message_id, role, content):
+        entry = self._entry(message_id, role, content)
+        if entry is None:
+            return None
+        self._index[entry["id"]] = entry
+        self.history.append(entry)
+        self.bytes += entry_size(entry)
+        if self.first_message_id is None:
+            self.first_message_id = message_id
+        return entry
+
+    def _trim(self):
+        """Drop the oldest entries beyond the window or the memory budget; returns how many."""
+        dropped = 0
+        limit = None if self.max_messages is None else self.max_messages + self._extra
+        # the newest message is always kept, however large
+        while len(self.history) > 1 and (
+                (limit is not None and len(self.history) > limit)
+                or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+            entry = self.history.pop(0)
+            del self._index[entry["id"]]
+            self.bytes -= entry_size(entry)
+            dropped += 1
+        if dropped:
+            self._extra = max(0, len(self.history) - (self.max_messages or len(self.history)))
+            self.first_message_id = self.history[0]["message_id"]
+            self.has_earlier = True
+        return dropped
+
+    def sync(self, client):
+        """Fetch messages newer than the last one seen; returns the newly added entries."""
+        if self.last_message_id is None and self.windowed:
+            return self._sync_newest(client)
+        added = []
+        cursor = self.last_message_id
+        try:
+            while True:
+                params = {"order": "asc", "limit": self.page_size}
+                if cursor:
+                    params["after"] = cursor
+                page = client.beta.threads.messages.list(self.thread_id, **params)
+
+                for message in page.data:
+                    # a message that is still being written will be picked up by the next sync
+                    if getattr(message, 'status', None) == 'in_progress':
+                        return added
+                    entry = self.add(message.id, message.role, message_text(message))
+                    if entry is not None:
+                        added.append(entry)
+                    cursor = self.last_message_id = message.id
+
+                if not page.data or not has_more_pages(page, self.page_size):
+                    return added
+        finally:
+            self._trim()
+
+    def _sync_newest(self, client):
+        # first sync of a windowed copy: only the newest page of the thread, not all of it
+        limit = min(self.page_size, self.max_messages) if self.max_messages is not None else self.page_size
+        page = client.beta.threads.messages.list(self.thread_id, order="desc", limit=limit)
+        messages = list(page.data)
+        # a message that is still being written, and anything newer, is left for the next sync
+        cut = 0
+        for position, message in enumerate(messages):
+            if getattr(message, 'status', None) == 'in_progress':
+                cut = position + 1
+        messages = messages[cut:]
+        added = []
+        for message in reversed(messages):
+            entry = self.add(message.id, message.role, message_text(message))
+            if entry is not None:
+                added.append(entry)
+            self.last_message_id = message.id
+        self.has_earlier = bool(messages) and has_more_pages(page, limit)
+        self._trim()
+        return added
+
+    def load_earlier(self, client, count=None):
+        """Prepend up to ``count`` messages older than the oldest kept one; returns how many were added."""
+        if not self.has_earlier or self.first_message_id is None:
+            return 0
+        count = count or self.page_size
+        page = client.beta.threads.messages.list(self.thread_id, order="desc", after=self.first_message_id,
+                                                 limit=count)
+        older, size = [], 0
+        for message in page.data:
+            entry = self._entry(message.id, message.role, message_text(message))
+            if entry is None:
+                continue
+            if self.max_bytes is not None and self.bytes + size + entry_size(entry) > self.max_bytes:
+                # the budget is spent; there are still earlier messages
+                break
+            older.append(entry)
+            size += entry_size(entry)
+        else:
+            self.has_earlier = has_more_pages(page, count)
+        if not older:
+            return 0
+        older.reverse()
+        for entry in older:
+            self._index[entry["id"]] = entry
+        self.history[:0] = older
+        self.bytes += size
+        self.first_message_id = older[0]["message_id"]
+        if self.max_messages is not None:
+            self._extra = max(0, len(self.history) - self.max_messages)
+        return len(older)
@@ -0,0 +1,124 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+
+from octo_packages.bootstrap import lazy_import
+from octo_packages.rate_limit import RATE_LIMIT_ENABLED, get_rate_limiter, http_client, limited_client
+from octo_packages.tracing import TracedProxy, get_tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POSITIVE_TTL = float(os.getenv('OPENAI_KEY_POSITIVE_TTL', '600'))
+DEFAULT_NEGATIVE_TTL = float(os.getenv('OPENAI_KEY_NEGATIVE_TTL', '30'))
+
+
+def key_fingerprint(api_key):
+    # Never keep raw keys as cache keys (they would show up in reprs, metrics and dumps)
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+def is_auth_error(error):
+    return getattr(error, 'status_code', None) == 401 or type(error).__name__ == 'AuthenticationError'
+
+
+class OpenAIKeyCache:
+    """Process-wide cache of OpenAI key validation results and clients.
+
+    Validation results are kept for ``positive_ttl`` seconds when the key works and for
+    ``negative_ttl`` seconds when it does not. Entries are keyed by a sha256 of the key.
+    """
+
+    def __init__(self, positive_ttl=DEFAULT_POSITIVE_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL, client_factory=None):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._client_factory = client_factory
+        self._lock = threading.Lock()
+        self._validity = {}  # fingerprint -> (valid, expires_at)
+        self._clients = {}  # fingerprint -> OpenAI client
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def _new_client(self, api_key):
+        if self._client_factory is not None:
+            client = self._client_factory(api_key)
+        else:
+            options = {}
+            if RATE_LIMIT_ENABLED:
+                # the shared limiter retries and reads the rate limit headers instead of the SDK
+                options = {'max_retries': 0, 'http_client': http_client(get_rate_limiter())}
+            client = lazy_import('openai').OpenAI(api_key=api_key, **options)
+        # every API call made through the shared client is rate limited and shows up as an 'openai' span
+        return TracedProxy(limited_client(client), get_tracer())
+
+    def get_client(self, api_key):
+        """Return the one shared client for ``api_key``."""
+        fingerprint = key_fingerprint(api_key)
+        with self._lock:
+            client = self._clients.get(fingerprint)
+        if client is None:
+            client = self._new_client(api_key)
+            with self._lock:
+                client = self._clients.setdefault(fingerprint, client)
+        return client
+
+    def is_valid(self, api_key):
+        if not api_key:
+            return False
+        fingerprint = key_fingerprint(api_key)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._validity.get(fingerprint)
+            if cached is not None and cached[1] > now:
+                self._stats['hits'] += 1
+                return cached[0]
+            self._stats['misses'] += 1
+
+        try:
+            # Make a lightweight API call, such as listing available models
+            with get_tracer().span('openai.key_validation', 'key_validation'):
+                self.get_client(api_key).models.list()
+            valid = True
+        except Exception as e:
+            # If the call fails, the API key is likely invalid
+            logger.error(f"OpenAI API key validation failed: {e}")
+            valid = False
+
+        ttl = self.positive_ttl if valid else self.negative_ttl
+        with self._lock:
+            self._validity[fingerprint] = (valid, time.monotonic() + ttl)
+            if not valid:
+                self._clients.pop(fingerprint, None)
+        return valid
+
+    def invalidate(self, api_key):
+        """Forget everything about ``api_key``, e.g. after an API call returned 401."""
+        fingerprint = key_fingerprint(api_key)
+        with self._lock:
+            self._validity.pop(fingerprint, None)
+            self._clients.pop(fingerprint, None)
+            self._stats['invalidations'] += 1
+
+    def invalidate_on_auth_error(self, api_key, error):
+        if is_auth_error(error):
+            logger.warning("OpenAI returned 401, dropping cached key validation")
+            self.invalidate(api_key)
+            return True
+        return False
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, keys=len(self._validity), clients=len(self._clients))
+
+
+_key_cache = None
+_key_cache_lock = threading.Lock()
+
+
+def get_key_cache():
+    global _key_cache
+    if _key_cache is None:
+        with _key_cache_lock:
+            if _key_cache is None:
+                _key_cache = OpenAIKeyCache()
+    return _key_cache
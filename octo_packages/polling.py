@@ -0,0 +1,158 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Statuses in which an assistants run is still being worked on by OpenAI
+PENDING_STATUSES = ("queued", "in_progress", "cancelling")
+
+# What RunPoller.steps asks its driver to do next
+SUBMIT_TOOL_OUTPUTS = 'submit_tool_outputs'
+CANCEL = 'cancel'
+RETRIEVE = 'retrieve'
+
+
+class BackoffPolicy:
+    """Exponential backoff with jitter for polling a run.
+
+    ``deadline`` is the overall time budget (seconds) for a run; once it is exceeded the
+    run gets cancelled. ``None`` disables the deadline.
+    """
+
+    def __init__(self, initial=0.25, multiplier=1.6, max_interval=3.0, jitter=0.2, deadline=180.0):
+        self.initial = initial
+        self.multiplier = multiplier
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.deadline = deadline
+
+    @classmethod
+    def from_env(cls):
+        deadline = os.getenv('RUN_POLL_DEADLINE', '180')
+        return cls(
+            initial=float(os.getenv('RUN_POLL_INITIAL', '0.25')),
+            multiplier=float(os.getenv('RUN_POLL_MULTIPLIER', '1.6')),
+            max_interval=float(os.getenv('RUN_POLL_MAX_INTERVAL', '3.0')),
+            jitter=float(os.getenv('RUN_POLL_JITTER', '0.2')),
+            deadline=float(deadline) if deadline else None,
+        )
+
+    def intervals(self):
+        interval = self.initial
+        while True:
+            spread = interval * self.jitter
+            yield max(0.0, interval + random.uniform(-spread, spread))
+            interval = min(interval * self.multiplier, self.max_interval)
+
+
+class RunPoller:
+    """Waits on assistants runs using a BackoffPolicy and keeps per-run poll counters.
+
+    ``steps(run)`` holds the backoff, deadline and cancel logic without doing any I/O, so the
+    blocking ``wait`` here and the asyncio engine drive the same loop.
+
+    ``on_status(run)`` is called after every retrieve. ``on_requires_action(run)`` is
+    called when the run needs tool outputs and must return the run returned by
+    ``submit_tool_outputs``; the backoff restarts afterwards since the run is active again.
+    """
+
+    def __init__(self, policy=None, history=200, sleep=time.sleep):
+        self.policy = policy or BackoffPolicy()
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=history)
+        self._totals = {'runs': 0, 'polls': 0, 'cancelled': 0}
+
+    def steps(self, run, handles_actions=True):
+        """Generator of what waiting on ``run`` takes: yields ``(action, run, delay)``.
+
+        The driver carries out the action - SUBMIT_TOOL_OUTPUTS, CANCEL, or RETRIEVE after
+        sleeping ``delay`` seconds - and sends the resulting run back (the unchanged run if a
+        cancel failed). The generator returns the final run and records it.
+        """
+        started = time.monotonic()
+        deadline = started + self.policy.deadline if self.policy.deadline is not None else None
+        intervals = self.policy.intervals()
+        polls = 0
+        cancelled = False
+
+        while run.status in PENDING_STATUSES or (run.status == "requires_action" and handles_actions):
+            if run.status == "requires_action":
+                run = yield SUBMIT_TOOL_OUTPUTS, run, 0.0
+                intervals = self.policy.intervals()
+                continue
+
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.warning(f"Run {run.id} exceeded its {self.policy.deadline}s deadline, cancelling")
+                run = yield CANCEL, run, 0.0
+                cancelled = True
+                break
+
+            delay = next(intervals)
+            if deadline is not None:
+                delay = min(delay, max(0.0, deadline - time.monotonic()))
+            run = yield RETRIEVE, run, delay
+            polls += 1
+
+        self.record(run, polls, time.monotonic() - started, cancelled)
+        return run
+
+    def wait(self, client, thread_id, run, on_status=None, on_requires_action=None):
+        steps = self.steps(run, handles_actions=on_requires_action is not None)
+        try:
+            action, run, delay = next(steps)
+            while True:
+                if action == SUBMIT_TOOL_OUTPUTS:
+                    run = on_requires_action(run)
+                elif action == CANCEL:
+                    try:
+                        run = client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+                    except Exception as e:
+                        logger.error(f"Failed to cancel run {run.id}: {e}")
+                else:
+                    self._sleep(delay)
+                    run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+                    if on_status is not None:
+                        on_status(run)
+                action, run, delay = steps.send(run)
+        except StopIteration as done:
+            return done.value
+
+    def record(self, run, polls, elapsed, cancelled):
+        with self._lock:
+            self._totals['runs'] += 1
+            self._totals['polls'] += polls
+            self._totals['cancelled'] += int(cancelled)
+            self._recent.append({
+                'run_id': getattr(run, 'id', None),
+                'status': getattr(run, 'status', None),
+                'polls': polls,
+                'elapsed_s': elapsed,
+                'cancelled': cancelled,
+            })
+
+    def stats(self):
+        with self._lock:
+            totals = dict(self._totals)
+            recent = list(self._recent)
+        totals['avg_polls_per_run'] = totals['polls'] / totals['runs'] if totals['runs'] else 0.0
+        totals['recent'] = recent
+        return totals
+
+
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def get_poller():
+    """Return the process-wide poller configured from the RUN_POLL_* environment variables."""
+    global _poller
+    if _poller is None:
+        with _poller_lock:
+            if _poller is None:
+                _poller = RunPoller(BackoffPolicy.from_env())
+    return _poller
@@ -0,0 +1,413 @@
+import os
+import re
+import time
+import heapq
+import random
+import asyncio
+import inspect
+import logging
+import itertools
+import threading
+
+from octo_packages.bootstrap import lazy_import
+from octo_packages.tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+# At peak the sessions of one instance together ran into the organization's OpenAI request and
+# token limits, and every call over the limit raised straight into the page. All OpenAI calls
+# now pass through one process-wide RateLimiter: a request bucket and a token bucket (token cost
+# is estimated for calls that start model work), a priority queue so run polling yields to
+# user-facing creates, budgets that follow the x-ratelimit-* response headers, and retries with
+# backoff on 429 and 5xx responses. The client's own retries are turned off in favour of these.
+
+RATE_LIMIT_ENABLED = os.getenv('OPENAI_RATE_LIMIT', 'on').lower() not in ('off', '0', 'false', 'no')
+DEFAULT_REQUESTS_PER_MINUTE = int(os.getenv('OPENAI_REQUESTS_PER_MINUTE', '500'))
+DEFAULT_TOKENS_PER_MINUTE = int(os.getenv('OPENAI_TOKENS_PER_MINUTE', '160000'))
+# tokens charged up front for a call that makes the model run; the headers correct the budget afterwards
+RUN_TOKEN_ESTIMATE = int(os.getenv('OPENAI_RUN_TOKEN_ESTIMATE', '1000'))
+DEFAULT_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '4'))
+RETRY_BASE_DELAY = float(os.getenv('OPENAI_RETRY_BASE_DELAY', '0.5'))
+RETRY_MAX_DELAY = float(os.getenv('OPENAI_RETRY_MAX_DELAY', '20'))
+
+PRIORITY_CREATE = 0
+PRIORITY_POLL = 1
+PRIORITY_NAMES = {PRIORITY_CREATE: 'create', PRIORITY_POLL: 'poll'}
+
+# method paths (below the client) that only watch a run; everything else is user-facing
+POLL_CALLS = ('beta.threads.runs.retrieve', 'beta.threads.messages.list', 'beta.threads.runs.steps.list')
+# method paths that make the model run and therefore use up tokens
+RUN_CALLS = ('beta.threads.runs.create', 'beta.threads.runs.submit_tool_outputs', 'beta.threads.create_and_run',
+             'chat.completions.create')
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+THROTTLE_EPSILON = 0.001
+
+_DURATION = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def parse_duration(value):
+    """``'6m0s'``, ``'1.5s'``, ``'20ms'`` -> seconds; None if there is nothing to parse."""
+    if not value:
+        return None
+    parts = _DURATION.findall(str(value))
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def _header_int(headers, name):
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def retry_after(headers):
+    """Seconds the server asked us to wait, from ``retry-after-ms`` or ``retry-after``."""
+    value = headers.get('retry-after-ms')
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if value is not None:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return None
+
+
+def call_priority(path):
+    return PRIORITY_POLL if path.endswith(POLL_CALLS) else PRIORITY_CREATE
+
+
+def call_tokens(path):
+    return RUN_TOKEN_ESTIMATE if path.endswith(RUN_CALLS) else 0
+
+
+class TokenBucket:
+    """Refills ``rate`` units per second up to ``capacity``; not thread-safe on its own."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, now, amount):
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def adapt(self, now, limit, remaining):
+        """Follow what the server reports: its per-minute limit and what is left of it."""
+        self._refill(now)
+        if limit:
+            self.capacity = float(limit)
+            self.rate = limit / 60.0
+        if remaining is not None:
+            self.level = min(self.level, float(remaining))
+
+
+class RateLimiter:
+    """Process-wide request/token budget for the OpenAI API with a priority wait queue.
+
+    ``acquire(priority, tokens)`` blocks until both buckets allow the call and no caller of
+    higher priority (lower number) or an earlier one of the same priority is waiting, and
+    returns the seconds it waited. ``acquire_async`` waits in the same queue without holding a
+    thread: its waiters are woken on their own event loop.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                 max_retries=DEFAULT_MAX_RETRIES, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._cond = threading.Condition()
+        self._waiters = []  # heap of (priority, sequence)
+        self._async_waiters = {}  # ticket -> (loop, asyncio.Event) of the waiters in acquire_async
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._random = random.Random()
+        self._stats = {'calls': 0, 'throttled': 0, 'throttle_s': 0.0, 'max_wait_s': 0.0, 'retries': 0,
+                       'rate_limited': 0, 'server_errors': 0, 'header_updates': 0}
+
+    # -- budget ----------------------------------------------------------------------------
+
+    def _notify(self):
+        """Wake every waiter to re-check the queue and budget; call with ``_cond`` held."""
+        self._cond.notify_all()
+        for loop, event in self._async_waiters.values():
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # the loop is closed; its waiter is gone with it
+                pass
+
+    def _drop_waiter(self, ticket):
+        self._waiters.remove(ticket)
+        heapq.heapify(self._waiters)
+        self._async_waiters.pop(ticket, None)
+
+    def _wait_time(self, now, tokens):
+        return max(0.0, self._paused_until - now,
+                   self._requests.wait_time(now, 1), self._tokens.wait_time(now, tokens))
+
+    def _take(self, tokens):
+        self._requests.take(1)
+        self._tokens.take(tokens)
+        self._stats['calls'] += 1
+
+    def try_acquire(self, priority=PRIORITY_CREATE, tokens=0):
+        """Take the budget for one call if that needs no waiting; never blocks."""
+        with self._cond:
+            if self._waiters or self._wait_time(time.monotonic(), tokens) > 0:
+                return False
+            self._take(tokens)
+            return True
+
+    def acquire(self, priority=PRIORITY_CREATE, tokens=0):
+        started = time.monotonic()
+        with self._cond:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    if self._waiters[0] == ticket:
+                        wait = self._wait_time(time.monotonic(), tokens)
+                        if wait <= 0:
+                            heapq.heappop(self._waiters)
+                            self._take(tokens)
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+            except BaseException:
+                self._drop_waiter(ticket)
+                raise
+            finally:
+                # the next waiter in line re-checks the budget
+                self._notify()
+        waited = time.monotonic() - started
+        if waited > THROTTLE_EPSILON:
+            self._record_throttle(started, waited, priority)
+        return waited
+
+    async def acquire_async(self, priority=PRIORITY_CREATE, tokens=0):
+        if self.try_acquire(priority, tokens):
+            return 0.0
+        started = time.monotonic()
+        event = asyncio.Event()
+        with self._cond:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            self._async_waiters[ticket] = (asyncio.get_running_loop(), event)
+        try:
+            while True:
+                with self._cond:
+                    # cleared under the lock, so a wake-up after this check is never lost
+                    event.clear()
+                    wait = None
+                    if self._waiters[0] == ticket:
+                        wait = self._wait_time(time.monotonic(), tokens)
+                        if wait <= 0:
+                            heapq.heappop(self._waiters)
+                            del self._async_waiters[ticket]
+                            self._take(tokens)
+                            self._notify()
+                            break
+                try:
+                    await asyncio.wait_for(event.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._cond:
+                if ticket in self._async_waiters:
+                    self._drop_waiter(ticket)
+                    self._notify()
+            raise
+        waited = time.monotonic() - started
+        if waited > THROTTLE_EPSILON:
+            self._record_throttle(started, waited, priority)
+        return waited
+
+    def _record_throttle(self, started, waited, priority):
+        with self._cond:
+            self._stats['throttled'] += 1
+            self._stats['throttle_s'] += waited
+            self._stats['max_wait_s'] = max(self._stats['max_wait_s'], waited)
+        get_tracer().record('openai.throttle', 'rate_limit', time.time() - waited, waited,
+                            priority=PRIORITY_NAMES.get(priority, priority))
+
+    def pause(self, seconds):
+        """Hold every caller back for ``seconds`` (the server told us to slow down)."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._notify()
+
+    def update_from_headers(self, headers):
+        now = time.monotonic()
+        with self._cond:
+            for bucket, kind in ((self._requests, 'requests'), (self._tokens, 'tokens')):
+                limit = _header_int(headers, f'x-ratelimit-limit-{kind}')
+                remaining = _header_int(headers, f'x-ratelimit-remaining-{kind}')
+                if limit is None and remaining is None:
+                    continue
+                bucket.adapt(now, limit, remaining)
+                if remaining == 0:
+                    reset = parse_duration(headers.get(f'x-ratelimit-reset-{kind}'))
+                    if reset:
+                        self._paused_until = max(self._paused_until, now + reset)
+                self._stats['header_updates'] += 1
+            self._notify()
+
+    def observe_response(self, response):
+        """httpx response event hook: adapt the budgets to every response's rate limit headers."""
+        try:
+            self.update_from_headers(response.headers)
+        except Exception as e:
+            logger.debug(f"Could not read rate limit headers: {e}")
+
+    async def observe_response_async(self, response):
+        self.observe_response(response)
+
+    # -- retries ---------------------------------------------------------------------------
+
+    def retry_delay(self, error, attempt):
+        """Seconds to wait before retrying a call that raised ``error``, or None to give up."""
+        status = getattr(error, 'status_code', None)
+        connection_error = status is None and type(error).__name__ == 'APIConnectionError'
+        if attempt >= self.max_retries or not (status in RETRY_STATUSES or connection_error):
+            return None
+        if getattr(error, 'code', None) == 'insufficient_quota':
+            # out of credit, waiting won't help
+            return None
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+        backoff = min(self.max_delay, self.base_delay * 2 ** attempt) * (1 + 0.25 * self._random.random())
+        delay = retry_after(headers)
+        delay = min(self.max_delay, delay) if delay is not None else backoff
+        with self._cond:
+            self._stats['retries'] += 1
+            if status == 429:
+                self._stats['rate_limited'] += 1
+            elif status is not None:
+                self._stats['server_errors'] += 1
+        if status == 429:
+            # everybody slows down, not just this caller
+            self.update_from_headers(headers)
+            self.pause(delay)
+        logger.warning(f"OpenAI call failed with {status or type(error).__name__}, retry {attempt + 1} in {delay:.2f}s")
+        return delay
+
+    def stats(self):
+        now = time.monotonic()
+        with self._cond:
+            self._requests._refill(now)
+            self._tokens._refill(now)
+            queued = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._waiters:
+                queued[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            return dict(
+                self._stats,
+                queue_depth=len(self._waiters),
+                queued=queued,
+                paused_for_s=max(0.0, self._paused_until - now),
+                requests_per_minute=self._requests.capacity,
+                requests_available=round(self._requests.level, 1),
+                tokens_per_minute=self._tokens.capacity,
+                tokens_available=round(self._tokens.level, 1),
+            )
+
+
+class RateLimitedProxy:
+    """Wraps an OpenAI client so every resource method call (sync or async) goes through the limiter."""
+
+    def __init__(self, target, limiter, path=''):
+        self.__wrapped__ = target
+        self._target = target
+        self._limiter = limiter
+        self._path = path
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        path = f"{self._path}.{name}" if self._path else name
+        if type(value).__module__.startswith('openai.resources'):
+            return RateLimitedProxy(value, self._limiter, path)
+        if not callable(value) or name.startswith('_') or isinstance(value, type):
+            return value
+
+        limiter, priority, tokens = self._limiter, call_priority(path), call_tokens(path)
+        if type(self._target).__name__.startswith('Async'):
+            async def limited_async(*args, **kwargs):
+                for attempt in itertools.count():
+                    await limiter.acquire_async(priority, tokens)
+                    try:
+                        result = value(*args, **kwargs)
+                        return await result if inspect.isawaitable(result) else result
+                    except Exception as e:
+                        delay = limiter.retry_delay(e, attempt)
+                        if delay is None:
+                            raise
+                    with get_tracer().span('openai.retry', 'rate_limit', call=path):
+                        await asyncio.sleep(delay)
+            return limited_async
+
+        def limited(*args, **kwargs):
+            for attempt in itertools.count():
+                limiter.acquire(priority, tokens)
+                try:
+                    return value(*args, **kwargs)
+                except Exception as e:
+                    delay = limiter.retry_delay(e, attempt)
+                    if delay is None:
+                        raise
+                with get_tracer().span('openai.retry', 'rate_limit', call=path):
+                    time.sleep(delay)
+        return limited
+
+
+def http_client(limiter):
+    """An httpx client with the SDK's defaults that reports every response's headers to ``limiter``."""
+    return lazy_import('openai').DefaultHttpxClient(event_hooks={'response': [limiter.observe_response]})
+
+
+def async_http_client(limiter):
+    return lazy_import('openai').DefaultAsyncHttpxClient(event_hooks={'response': [limiter.observe_response_async]})
+
+
+def limited_client(client, limiter=None):
+    """Route ``client``'s calls through the process-wide limiter (unless OPENAI_RATE_LIMIT=off)."""
+    if not RATE_LIMIT_ENABLED:
+        return client
+    return RateLimitedProxy(client, limiter or get_rate_limiter())
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
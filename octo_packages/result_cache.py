@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from octo_packages.db import ensure_columns
+from octo_packages.tool_dispatch import to_tool_output
+
+logger = logging.getLogger(__name__)
+
+# Per-skill caching policy lives next to the skill in the Skills table:
+#   CachePolicy 'none' - never cache (default, skills may have side effects)
+#   CachePolicy 'ttl'  - cache results for CacheTTL seconds
+#   CachePolicy 'lru'  - cache until evicted or until the skill's source changes
+CACHE_POLICIES = ('none', 'ttl', 'lru')
+SKILL_CACHE_COLUMNS = {
+    'CachePolicy': "NVARCHAR(10) DEFAULT 'none'",
+    'CacheTTL': "INTEGER DEFAULT 300",
+}
+
+DEFAULT_MAX_ENTRIES = int(os.getenv('SKILL_CACHE_MAX_ENTRIES', '1024'))
+DEFAULT_MAX_BYTES = int(os.getenv('SKILL_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+# Skills report failures by returning {"error": ...} rather than raising, so those outputs
+# are not cached unless SKILL_CACHE_ERRORS=on
+CACHE_ERRORS = os.getenv('SKILL_CACHE_ERRORS', 'off').lower() in ('on', '1', 'true', 'yes')
+
+
+_columns_ready = False
+
+
+def ensure_cache_columns(pool):
+    """Add the cache policy columns to Skills once per process."""
+    global _columns_ready
+    if not _columns_ready:
+        ensure_columns(pool, 'Skills', SKILL_CACHE_COLUMNS)
+        # SKILLS_BACKUP is filled with SELECT * FROM SKILLS, so it needs the same columns
+        ensure_columns(pool, 'SKILLS_BACKUP', SKILL_CACHE_COLUMNS)
+        _columns_ready = True
+
+
+def is_error_output(output):
+    """True for the ``{"error": ...}`` payloads skills return instead of raising."""
+    if isinstance(output, str):
+        if not output.lstrip().startswith('{'):
+            return False
+        try:
+            output = json.loads(output)
+        except ValueError:
+            return False
+    return isinstance(output, dict) and 'error' in output
+
+
+def canonical_arguments(arguments):
+    return json.dumps(arguments, sort_keys=True, separators=(',', ':'), default=str)
+
+
+class SkillResultCache:
+    """LRU cache of skill results with a memory cap and per-skill policies.
+
+    Entries are keyed by skill name, skill source hash and the canonicalized JSON arguments,
+    so editing a skill never serves results of its previous version. Values are stored as the
+    tool output strings that get submitted to OpenAI, which is also what the byte cap counts.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, cache_errors=CACHE_ERRORS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_errors = cache_errors
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (output, expires_at or None, size)
+        self._bytes = 0
+        self._policies = {}  # skill name -> (policy, ttl)
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0, 'bypassed': 0, 'errors_not_cached': 0}
+
+    def set_policies(self, policies):
+        """Replace the policies with ``{skill name: (policy, ttl seconds)}``."""
+        cleaned = {}
+        for name, (policy, ttl) in policies.items():
+            policy = (policy or 'none').lower()
+            if policy not in CACHE_POLICIES:
+                logger.warning(f"Unknown cache policy {policy!r} for skill {name}, not caching")
+                policy = 'none'
+            cleaned[name] = (policy, ttl)
+        with self._lock:
+            self._policies = cleaned
+
+    def policy_for(self, skill_name):
+        return self._policies.get(skill_name, ('none', None))
+
+    def call(self, skill_name, source_hash, arguments, function):
+        """Return the cached output for these arguments or call ``function()`` and cache it.
+
+        Exceptions from ``function`` propagate and nothing is cached for them; neither are
+        error payloads unless ``cache_errors`` is set.
+        """
+        policy, ttl = self.policy_for(skill_name)
+        if policy == 'none' or (policy == 'ttl' and not ttl):
+            with self._lock:
+                self._stats['bypassed'] += 1
+            return function()
+
+        key = (skill_name, source_hash, canonical_arguments(arguments))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                output, expires_at, size = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return output
+                self._remove(key)
+                self._stats['expired'] += 1
+            self._stats['misses'] += 1
+
+        result = function()
+        output = to_tool_output(result)
+        if not self.cache_errors and is_error_output(result):
+            with self._lock:
+                self._stats['errors_not_cached'] += 1
+            return output
+        expires_at = time.monotonic() + ttl if policy == 'ttl' else None
+        self._put(key, output, expires_at)
+        return output
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _put(self, key, output, expires_at):
+        size = len(output.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (output, expires_at, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, skill_name=None):
+        with self._lock:
+            if skill_name is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            for key in [key for key in self._entries if key[0] == skill_name]:
+                self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return dict(
+                self._stats,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                hit_rate=self._stats['hits'] / lookups if lookups else 0.0,
+            )
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SkillResultCache()
+    return _cache
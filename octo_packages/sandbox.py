@@ -0,0 +1,374 @@
+import os
+import sys
+import time
+import socket
+import logging
+import threading
+import traceback
+import subprocess
+from multiprocessing.connection import Connection
+
+from octo_packages.bootstrap import rss_mb
+from octo_packages.http_pool import get_http_pool
+from octo_packages.tool_dispatch import DEFAULT_TOOL_TIMEOUT, to_tool_output
+
+logger = logging.getLogger(__name__)
+
+# Skills used to run on the streamlit process's threads, so a CPU-heavy skill held the GIL for
+# every session and a leaking or hanging skill took the whole app down. The sandbox runs them
+# in a pool of warm worker processes instead. Workers are started ahead of time as
+# ``python -m octo_packages.sandbox`` (not via multiprocessing, which would re-import the
+# streamlit entry point as __main__), keep their own compiled SkillRegistry, and exchange
+# pickled messages with the app over one socketpair each. A call that overruns its timeout
+# gets its worker killed and replaced; workers that grow past the memory limit or served
+# max_calls calls are recycled. Replies carry the worker's RSS and the HTTP pool counters the
+# call added, which are merged into the app's pool so the Performance page sees skill traffic.
+
+#
+# Without explicit settings the sandbox is sized from the container's memory limit (cgroup):
+# SKILL_SANDBOX_RESERVED_MB stay with the streamlit process and the rest is split between at
+# most two workers, each recycled once it outgrows its share. When that leaves less than
+# MIN_WORKER_MB per worker (e.g. a 128M Cloud Foundry instance) skills run inline.
+
+SANDBOX_MODES = ('process', 'inline')
+RESERVED_MB = int(os.getenv('SKILL_SANDBOX_RESERVED_MB', '112'))
+MIN_WORKER_MB = 64
+# a limit this large means the cgroup has none
+UNLIMITED_BYTES = 1 << 50
+
+
+def container_memory_mb():
+    """The memory limit of this process's cgroup in MB, or None when there is none."""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value == 'max':
+            return None
+        try:
+            limit = int(value)
+        except ValueError:
+            return None
+        return None if limit >= UNLIMITED_BYTES else limit / (1024 * 1024)
+    return None
+
+
+def default_sizing(limit_mb=None, cpus=None):
+    """``(mode, workers, memory limit per worker in MB)`` for a container of ``limit_mb``."""
+    workers = min(2, cpus or os.cpu_count() or 1)
+    if limit_mb is None:
+        return 'process', workers, 256
+    available = limit_mb - RESERVED_MB
+    workers = min(workers, int(available // MIN_WORKER_MB))
+    if workers < 1:
+        return 'inline', 1, MIN_WORKER_MB
+    return 'process', workers, int(available // workers)
+
+
+_SIZING = default_sizing(container_memory_mb())
+DEFAULT_MODE = os.getenv('SKILL_SANDBOX', _SIZING[0])
+DEFAULT_WORKERS = int(os.getenv('SKILL_SANDBOX_WORKERS', str(_SIZING[1])))
+DEFAULT_MEMORY_LIMIT_MB = int(os.getenv('SKILL_SANDBOX_MEMORY_MB', str(_SIZING[2])))
+DEFAULT_MAX_CALLS = int(os.getenv('SKILL_SANDBOX_MAX_CALLS', '1000'))
+# optional hard cap on a worker's address space; allocations past it raise MemoryError
+ADDRESS_SPACE_MB = int(os.getenv('SKILL_SANDBOX_ADDRESS_SPACE_MB', '0'))
+STARTUP_TIMEOUT = 60
+
+
+class SkillExecutionError(Exception):
+    """A skill raised inside a worker; ``error_type`` is the original exception's class name."""
+
+    def __init__(self, error_type, message):
+        super().__init__(message)
+        self.error_type = error_type
+
+
+class SandboxError(Exception):
+    pass
+
+
+def _worker_main(conn):
+    """Worker loop: ``('sync', rows)`` recompiles, ``('call', name, args, kwargs)`` runs a skill."""
+    from octo_packages.skills import SkillRegistry
+    from octo_packages.http_pool import HTTP_CLIENT_PARAMETER, accepts_parameter, counters_delta, get_http_pool
+
+    if ADDRESS_SPACE_MB:
+        import resource
+        limit = ADDRESS_SPACE_MB * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    registry = SkillRegistry()
+    conn.send(('ready', os.getpid()))
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message[0] == 'stop':
+            return
+        if message[0] == 'sync':
+            registry.sync(message[1])
+            continue
+
+        _, name, args, kwargs = message
+        function = registry.get(name)
+        http_before = None
+        try:
+            if function is None:
+                raise LookupError(registry.errors().get(name) or f"Skill {name} is not loaded in the sandbox")
+            if accepts_parameter(function, HTTP_CLIENT_PARAMETER):
+                http_before = get_http_pool().counters()
+                kwargs[HTTP_CLIENT_PARAMETER] = get_http_pool().client()
+            # results go back as tool output strings: always picklable and what the cache stores
+            reply = ('ok', to_tool_output(function(*args, **kwargs)))
+        except Exception as e:
+            logger.debug(traceback.format_exc())
+            reply = ('error', type(e).__name__, str(e))
+        http_delta = counters_delta(http_before, get_http_pool().counters()) if http_before is not None else None
+        conn.send(reply + (rss_mb(), http_delta))
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.version = None
+        self.calls = 0
+        self.rss_mb = 0.0
+
+    def kill(self):
+        self.conn.close()
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait(timeout=5)
+
+    def stop(self):
+        try:
+            self.conn.send(('stop',))
+        except (OSError, ValueError):
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.conn.close()
+
+
+class SkillSandbox:
+    """Pool of warm worker processes that execute skills.
+
+    ``sync(rows)`` hands the ``(SkillName, PythonFunction)`` rows to the workers (lazily, before
+    their next call); ``call(name, args, kwargs, timeout)`` runs one skill in an idle worker and
+    returns its tool output string or raises SkillExecutionError / TimeoutError / SandboxError.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB,
+                 max_calls=DEFAULT_MAX_CALLS, default_timeout=DEFAULT_TOOL_TIMEOUT):
+        self.workers = max(1, workers)
+        self.memory_limit_mb = memory_limit_mb
+        self.max_calls = max_calls
+        self.default_timeout = default_timeout
+        self._cond = threading.Condition()
+        self._idle = []
+        self._size = 0
+        self._rows = []
+        self._version = 0
+        self._closed = False
+        self._stats = {'calls': 0, 'errors': 0, 'timeouts': 0, 'crashes': 0, 'recycled': 0, 'started': 0}
+
+    # -- workers ---------------------------------------------------------------------------
+
+    def _spawn(self):
+        parent_sock, child_sock = socket.socketpair()
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [package_root, os.getenv('PYTHONPATH')])))
+        try:
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'octo_packages.sandbox', str(child_sock.fileno())],
+                pass_fds=(child_sock.fileno(),), env=env, stdin=subprocess.DEVNULL,
+            )
+        finally:
+            child_sock.close()
+        conn = Connection(parent_sock.detach())
+        if not conn.poll(STARTUP_TIMEOUT):
+            process.kill()
+            conn.close()
+            raise SandboxError("Skill sandbox worker did not start")
+        conn.recv()
+        worker = _Worker(process, conn)
+        # compile the current skills right away so the first call finds them loaded
+        with self._cond:
+            rows, version = self._rows, self._version
+            self._stats['started'] += 1
+        conn.send(('sync', rows))
+        worker.version = version
+        return worker
+
+    def start(self):
+        """Pre-fork the workers so the first tool call does not pay for process start-up."""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.workers:
+                    return self
+                self._size += 1
+            try:
+                worker = self._spawn()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            self._release(worker)
+
+    def _replenish(self):
+        # replace killed or recycled workers in the background so calls don't wait for a fork
+        def refill():
+            try:
+                self.start()
+            except Exception as e:
+                logger.error(f"Could not replace skill sandbox worker: {e}")
+        threading.Thread(target=refill, name='skill-sandbox-refill', daemon=True).start()
+
+    def _acquire(self, deadline):
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise SandboxError("Skill sandbox is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.workers:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("No skill sandbox worker became available in time")
+                self._cond.wait(remaining)
+        try:
+            return self._spawn()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, worker):
+        with self._cond:
+            if not self._closed:
+                self._idle.append(worker)
+                self._cond.notify()
+                return
+            self._size -= 1
+        worker.stop()
+
+    def _discard(self, worker, kill=True):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+        (worker.kill if kill else worker.stop)()
+        self._replenish()
+
+    # -- public API ------------------------------------------------------------------------
+
+    def sync(self, rows):
+        """Make ``rows`` the skill set of every worker; cheap when nothing changed."""
+        rows = [(name, func_code) for name, func_code in rows]
+        with self._cond:
+            if rows != self._rows:
+                self._rows = rows
+                self._version += 1
+
+    def call(self, name, args=(), kwargs=None, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        worker = self._acquire(deadline)
+        try:
+            with self._cond:
+                rows, version = self._rows, self._version
+            if worker.version != version:
+                worker.conn.send(('sync', rows))
+                worker.version = version
+            worker.conn.send(('call', name, tuple(args), dict(kwargs or {})))
+            if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                self._count('calls', 'timeouts')
+                self._discard(worker)
+                raise TimeoutError(f"{name} timed out after {timeout}s")
+            reply = worker.conn.recv()
+        except TimeoutError:
+            raise
+        except (EOFError, OSError) as e:
+            # the worker died mid-call (crash, OOM kill); replace it
+            self._count('calls', 'crashes')
+            self._discard(worker)
+            raise SandboxError(f"Skill sandbox worker running {name} died "
+                               f"(exit code {worker.process.returncode})") from e
+        except BaseException:
+            self._discard(worker)
+            raise
+
+        worker.calls += 1
+        worker.rss_mb, http_delta = reply[-2:]
+        if http_delta:
+            get_http_pool().merge(http_delta)
+        if worker.rss_mb > self.memory_limit_mb or worker.calls >= self.max_calls:
+            logger.info(f"Recycling skill sandbox worker {worker.process.pid} after {worker.calls} calls "
+                        f"at {worker.rss_mb:.0f} MB")
+            self._count('recycled')
+            self._discard(worker, kill=False)
+        else:
+            self._release(worker)
+
+        if reply[0] == 'error':
+            self._count('calls', 'errors')
+            raise SkillExecutionError(reply[1], reply[2])
+        self._count('calls')
+        return reply[1]
+
+    def _count(self, *keys):
+        with self._cond:
+            for key in keys:
+                self._stats[key] += 1
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, workers=self._size, idle=len(self._idle), max_workers=self.workers,
+                        memory_limit_mb=self.memory_limit_mb,
+                        skills=len(self._rows), worker_rss_mb=[round(w.rss_mb, 1) for w in self._idle])
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for worker in idle:
+            worker.stop()
+
+
+_sandbox = None
+_sandbox_failed = False
+_sandbox_lock = threading.Lock()
+
+
+def get_sandbox():
+    """The process-wide sandbox, or None when SKILL_SANDBOX=inline or the pool cannot start."""
+    global _sandbox, _sandbox_failed
+    if _sandbox is None and not _sandbox_failed and DEFAULT_MODE == 'process':
+        with _sandbox_lock:
+            if _sandbox is None and not _sandbox_failed:
+                try:
+                    _sandbox = SkillSandbox().start()
+                except Exception as e:
+                    # don't retry on every rerun
+                    _sandbox_failed = True
+                    logger.error(f"Could not start the skill sandbox, running skills inline: {e}")
+    return _sandbox
+
+
+def peek_sandbox():
+    """The process-wide sandbox if it was started already; never starts one."""
+    return _sandbox
+
+
+if __name__ == '__main__':
+    _worker_main(Connection(int(sys.argv[1])))
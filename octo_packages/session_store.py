@@ -0,0 +1,355 @@
+import os
+import re
+import time
+import uuid
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+
+from octo_packages.db import ensure_table
+from octo_packages.openai_keys import key_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# The conversation binding (assistant, thread and which key it belongs to) used to live only in
+# st.session_state, so a browser session could only ever talk to the instance that created it
+# and every restart or rebalance lost the conversation. The binding is now kept in a session
+# store under a session ID that the page puts in the URL (?session=...): any instance can look it
+# up and carry on with the same thread. The OpenAI key itself is never stored, only its sha256
+# fingerprint, and a session is only resumed with the key it was created with.
+#
+# SESSION_STORE=hana keeps the bindings in CHAT_SESSIONS. Writes are buffered and flushed in
+# batches by a background thread (a turn only touches its session's LastActiveAt), and reads go
+# through a short-lived local cache. SESSION_STORE=memory keeps them in this process only, for a
+# single instance and for development.
+
+SESSION_TABLE = 'CHAT_SESSIONS'
+SESSION_DDL = """
+CREATE COLUMN TABLE CHAT_SESSIONS (
+    SessionID NVARCHAR(64) PRIMARY KEY,
+    KeyHash NVARCHAR(64) NOT NULL,
+    AssistantID NVARCHAR(64),
+    ThreadID NVARCHAR(64),
+    CreatedAt TIMESTAMP,
+    LastActiveAt TIMESTAMP
+)
+"""
+
+DEFAULT_BACKEND = os.getenv('SESSION_STORE', 'hana').lower()
+DEFAULT_FLUSH_INTERVAL = float(os.getenv('SESSION_STORE_FLUSH_SECONDS', '2'))
+DEFAULT_MAX_BATCH = int(os.getenv('SESSION_STORE_MAX_BATCH', '200'))
+DEFAULT_CACHE_TTL = float(os.getenv('SESSION_STORE_CACHE_SECONDS', '30'))
+DEFAULT_CACHE_SIZE = int(os.getenv('SESSION_STORE_CACHE_SIZE', '10000'))
+# Sessions nobody has used for this long are deleted. 0 keeps them forever
+DEFAULT_SESSION_TTL = int(os.getenv('SESSION_TTL_SECONDS', str(30 * 24 * 3600)))
+GC_INTERVAL = 3600
+
+_SESSION_ID = re.compile(r'[0-9a-f]{32}')
+
+
+def to_timestamp(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')[:23]
+
+
+def from_timestamp(value):
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        text = str(value)[:26]
+        value = datetime.strptime(text, '%Y-%m-%d %H:%M:%S.%f' if '.' in text else '%Y-%m-%d %H:%M:%S')
+    # stored as UTC without a time zone
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def valid_session_id(value):
+    return bool(value) and _SESSION_ID.fullmatch(value) is not None
+
+
+class SessionBinding:
+    __slots__ = ('session_id', 'key_hash', 'assistant_id', 'thread_id', 'created_at', 'last_active_at')
+
+    def __init__(self, session_id, key_hash, assistant_id=None, thread_id=None, created_at=None, last_active_at=None):
+        self.session_id = session_id
+        self.key_hash = key_hash
+        self.assistant_id = assistant_id
+        self.thread_id = thread_id
+        self.created_at = created_at or time.time()
+        self.last_active_at = last_active_at or self.created_at
+
+    def touched(self):
+        return SessionBinding(self.session_id, self.key_hash, self.assistant_id, self.thread_id,
+                              self.created_at, time.time())
+
+    def as_row(self):
+        return (self.session_id, self.key_hash, self.assistant_id, self.thread_id,
+                to_timestamp(self.created_at), to_timestamp(self.last_active_at))
+
+    def __repr__(self):
+        return (f"SessionBinding({self.session_id!r}, key={self.key_hash[:12]}, "
+                f"assistant={self.assistant_id!r}, thread={self.thread_id!r})")
+
+
+class InMemorySessionStore:
+    """Session bindings of this process only; what SESSION_STORE=memory uses."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._stats = {'reads': 0, 'hits': 0, 'writes': 0}
+
+    def get(self, session_id):
+        with self._lock:
+            self._stats['reads'] += 1
+            binding = self._sessions.get(session_id)
+            if binding is not None:
+                self._stats['hits'] += 1
+            return binding
+
+    def put(self, binding):
+        with self._lock:
+            self._stats['writes'] += 1
+            self._sessions[binding.session_id] = binding
+
+    def touch(self, session_id):
+        with self._lock:
+            binding = self._sessions.get(session_id)
+            if binding is not None:
+                self._sessions[session_id] = binding.touched()
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def flush(self):
+        return 0
+
+    def close(self):
+        pass
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, backend='memory', sessions=len(self._sessions))
+
+
+class HanaSessionStore:
+    """Session bindings in CHAT_SESSIONS with write-behind batching and a local read cache.
+
+    ``put()`` and ``touch()`` only update the cache and queue the row; a background thread
+    UPSERTs everything queued every ``flush_interval`` seconds (or as soon as ``max_batch``
+    rows are waiting) in one transaction, and later writes to the same session replace earlier
+    ones in the queue. ``get()`` answers from the queue or the cache and reads the table when
+    the cached copy is older than ``cache_ttl`` seconds. ``flush()`` writes synchronously.
+    """
+
+    def __init__(self, pool, flush_interval=DEFAULT_FLUSH_INTERVAL, max_batch=DEFAULT_MAX_BATCH,
+                 cache_ttl=DEFAULT_CACHE_TTL, cache_size=DEFAULT_CACHE_SIZE, session_ttl=DEFAULT_SESSION_TTL):
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.session_ttl = session_ttl
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._cache = {}  # session id -> (binding or None, read at)
+        self._pending = {}  # session id -> binding waiting to be written
+        self._flusher = None
+        self._closed = False
+        self._table_ready = False
+        self._collected_at = 0.0
+        self._stats = {'reads': 0, 'cache_hits': 0, 'db_reads': 0, 'writes': 0, 'flushes': 0,
+                       'rows_flushed': 0, 'flush_errors': 0, 'expired': 0}
+
+    def _ensure_table(self):
+        if not self._table_ready:
+            ensure_table(self.pool, SESSION_TABLE, SESSION_DDL)
+            self._table_ready = True
+
+    # -- reading ---------------------------------------------------------------------------
+
+    def get(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            self._stats['reads'] += 1
+            binding = self._pending.get(session_id)
+            if binding is not None:
+                self._stats['cache_hits'] += 1
+                return binding
+            cached = self._cache.get(session_id)
+            if cached is not None and now - cached[1] < self.cache_ttl:
+                self._stats['cache_hits'] += 1
+                return cached[0]
+
+        self._ensure_table()
+        with self.pool.cursor() as cursor:
+            cursor.execute(
+                "SELECT SessionID, KeyHash, AssistantID, ThreadID, CreatedAt, LastActiveAt "
+                "FROM CHAT_SESSIONS WHERE SessionID = ?",
+                (session_id,)
+            )
+            row = cursor.fetchone()
+        binding = None
+        if row is not None:
+            binding = SessionBinding(row[0], row[1], row[2], row[3], from_timestamp(row[4]), from_timestamp(row[5]))
+        with self._lock:
+            self._stats['db_reads'] += 1
+            # a put() that raced with the read wins
+            binding = self._pending.get(session_id, binding)
+            self._remember(session_id, binding, now)
+        return binding
+
+    def _remember(self, session_id, binding, now):
+        if session_id not in self._cache and len(self._cache) >= self.cache_size:
+            # drop the entry read longest ago
+            del self._cache[min(self._cache, key=lambda key: self._cache[key][1])]
+        self._cache[session_id] = (binding, now)
+
+    # -- writing ---------------------------------------------------------------------------
+
+    def put(self, binding):
+        with self._lock:
+            self._stats['writes'] += 1
+            self._pending[binding.session_id] = binding
+            self._remember(binding.session_id, binding, time.monotonic())
+            backlog = len(self._pending)
+        self._start_flusher()
+        if backlog >= self.max_batch:
+            self._wake.set()
+
+    def touch(self, session_id):
+        """Mark the session active; a no-op for sessions this store does not know."""
+        try:
+            binding = self.get(session_id)
+        except Exception as e:
+            # only keeps the session from expiring, not worth failing a turn for
+            logger.error(f"Reading chat session {session_id[:8]} failed: {e}")
+            return
+        if binding is not None:
+            self.put(binding.touched())
+
+    def delete(self, session_id):
+        with self._lock:
+            self._pending.pop(session_id, None)
+            self._cache[session_id] = (None, time.monotonic())
+        self._ensure_table()
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("DELETE FROM CHAT_SESSIONS WHERE SessionID = ?", (session_id,))
+            conn.commit()
+
+    def flush(self):
+        """Write every queued binding now; returns how many rows were written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            try:
+                self._ensure_table()
+                with self.pool.connection() as conn, conn.cursor() as cursor:
+                    cursor.executemany(
+                        "UPSERT CHAT_SESSIONS (SessionID, KeyHash, AssistantID, ThreadID, CreatedAt, LastActiveAt) "
+                        "VALUES (?, ?, ?, ?, ?, ?) WHERE SessionID = ?",
+                        [binding.as_row() + (session_id,) for session_id, binding in batch.items()]
+                    )
+                    conn.commit()
+            except Exception as e:
+                logger.error(f"Writing {len(batch)} session binding(s) failed, retrying with the next flush: {e}")
+                with self._lock:
+                    self._stats['flush_errors'] += 1
+                    for session_id, binding in batch.items():
+                        # keep anything written in the meantime, it is newer
+                        self._pending.setdefault(session_id, binding)
+                return 0
+            with self._lock:
+                self._stats['flushes'] += 1
+                self._stats['rows_flushed'] += len(batch)
+            return len(batch)
+
+    def collect_garbage(self):
+        """Delete sessions that have not been active for ``session_ttl`` seconds."""
+        if self.session_ttl <= 0:
+            return 0
+        self._ensure_table()
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM CHAT_SESSIONS WHERE LastActiveAt < ADD_SECONDS(CURRENT_UTCTIMESTAMP, ?)",
+                (-self.session_ttl,)
+            )
+            expired = max(cursor.rowcount, 0)
+            conn.commit()
+        self._stats['expired'] += expired
+        if expired:
+            logger.info(f"Deleted {expired} expired chat session(s)")
+        return expired
+
+    def _start_flusher(self):
+        if self._flusher is None:
+            with self._lock:
+                if self._flusher is None and not self._closed:
+                    self._flusher = threading.Thread(target=self._flush_loop, name='session-store-flush', daemon=True)
+                    self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            if time.monotonic() - self._collected_at >= GC_INTERVAL:
+                self._collected_at = time.monotonic()
+                try:
+                    self.collect_garbage()
+                except Exception as e:
+                    logger.error(f"Chat session garbage collection failed: {e}")
+
+    def close(self):
+        """Stop the flusher and write what is still queued."""
+        self._closed = True
+        self._wake.set()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, backend='hana', pending=len(self._pending), cached=len(self._cache),
+                        flush_interval_s=self.flush_interval)
+
+
+def resume_session(store, session_id, api_key):
+    """The stored binding of ``session_id`` if it was created with ``api_key``, else None.
+
+    The binding's assistant may no longer exist (bindings outlive the assistant GC grace
+    period), so callers take over its thread and resolve the assistant again.
+    """
+    binding = store.get(session_id)
+    if binding is None or not binding.thread_id or not binding.assistant_id:
+        return None
+    if binding.key_hash != key_fingerprint(api_key):
+        logger.warning(f"Chat session {session_id[:8]} belongs to another OpenAI key, not resuming it")
+        return None
+    return binding
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store(pool):
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if DEFAULT_BACKEND == 'memory':
+                    store = InMemorySessionStore()
+                else:
+                    if DEFAULT_BACKEND != 'hana':
+                        logger.warning(f"Unknown SESSION_STORE {DEFAULT_BACKEND!r}, using hana")
+                    store = HanaSessionStore(pool)
+                # bindings still queued when the process stops would be lost otherwise
+                atexit.register(store.close)
+                _store = store
+    return _store
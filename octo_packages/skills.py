@@ -0,0 +1,204 @@
+import os
+import re
+import dis
+import json
+import time
+import builtins
+import hashlib
+import logging
+import datetime
+import threading
+
+from octo_packages.bootstrap import LazyModule
+from octo_packages.tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+# Skills used to be exec'd into the chat page's globals() on every rerun. The registry
+# below compiles each skill once per process and only recompiles rows whose source changed.
+# Each skill gets its own namespace with the page imports skills relied on plus every other
+# loaded skill, so skills can still call each other; a skill that uses a name none of these
+# provide (e.g. the page's st or conn) is logged when it is compiled.
+
+
+def source_hash(func_code):
+    return hashlib.sha256((func_code or '').encode('utf-8')).hexdigest()
+
+
+def declared_parameters(parameters):
+    """The property names a skill's Parameters JSON schema tells the model to provide."""
+    try:
+        schema = json.loads(parameters) if parameters and parameters.strip() else {}
+    except ValueError:
+        return frozenset()
+    properties = schema.get('properties') if isinstance(schema, dict) else None
+    return frozenset(properties) if isinstance(properties, dict) else frozenset()
+
+
+def default_skill_globals():
+    # Skills were historically exec'd into the chat page, so some of them rely on the
+    # page's imports without importing anything themselves.
+    # requests and pandas are only imported once a skill actually uses them
+    return {'json': json, 'os': os, 're': re, 'time': time, 'datetime': datetime.datetime,
+            'logging': logging, 'logger': logging.getLogger('skills'),
+            'requests': LazyModule('requests'), 'pd': LazyModule('pandas')}
+
+
+def unresolved_globals(function):
+    """Global names ``function`` (or a function nested in it) reads that its globals lack."""
+    names, codes = set(), [function.__code__]
+    while codes:
+        code = codes.pop()
+        for instruction in dis.get_instructions(code):
+            if instruction.opname in ('LOAD_GLOBAL', 'LOAD_NAME'):
+                names.add(instruction.argval)
+        codes.extend(const for const in code.co_consts if hasattr(const, 'co_code'))
+    return sorted(name for name in names if name not in function.__globals__ and not hasattr(builtins, name))
+
+
+class CompiledSkill:
+    def __init__(self, name, source_hash, function, namespace, own_names=()):
+        self.name = name
+        self.source_hash = source_hash
+        self.function = function
+        self.namespace = namespace
+        self.own_names = frozenset(own_names)  # names the skill's source defines itself
+        self.linked = set()  # other skills' names put into its namespace
+
+
+class SkillRegistry:
+    """Process-level cache of compiled skill callables keyed by skill name.
+
+    ``sync`` takes ``(SkillName, PythonFunction)`` rows and recompiles only the skills
+    whose source hash differs from what is already loaded. It can also be given each skill's
+    Parameters schema, whose declared names ``declared_parameters(name)`` then returns.
+    """
+
+    def __init__(self, base_globals=None):
+        self._base_globals = base_globals
+        self._lock = threading.Lock()
+        self._skills = {}
+        self._failed = {}  # name -> (source hash, error message)
+        self._declared = {}  # name -> parameter names of its Parameters schema
+        self.catalog_rows = None  # SkillCatalog rows last applied by chat.initialize_functions
+        self.compiles = 0
+        self.version = 0  # bumped whenever the set of loaded skills changes
+
+    def _namespace(self):
+        if self._base_globals is None:
+            self._base_globals = default_skill_globals()
+        return dict(self._base_globals)
+
+    def _compile(self, name, func_code, digest):
+        namespace = self._namespace()
+        base_names = set(namespace)
+        with get_tracer().span(f"skill.compile {name}", 'skill_exec'):
+            exec(compile(func_code, f"<skill {name}>", 'exec'), namespace)
+        self.compiles += 1
+        function = namespace.get(name)
+        if not callable(function):
+            raise ValueError(f"Skill code does not define a function called '{name}'")
+        return CompiledSkill(name, digest, function, namespace, set(namespace) - base_names)
+
+    @staticmethod
+    def _link(skills):
+        """Make every skill callable from every other one, like in the page's shared globals."""
+        functions = {name: skill.function for name, skill in skills.items()}
+        for skill in skills.values():
+            for name in skill.linked - set(functions):
+                skill.namespace.pop(name, None)
+            for name, function in functions.items():
+                if name not in skill.own_names:
+                    skill.namespace[name] = function
+            skill.linked = set(functions) - skill.own_names
+
+    def check(self, name, func_code):
+        """Compile ``func_code`` without registering it; raises if it is not a valid skill."""
+        return self._compile(name, func_code, source_hash(func_code))
+
+    def sync(self, rows, parameters=None):
+        """Bring the registry in line with ``rows``; returns the names that were (re)compiled."""
+        changed = []
+        with self._lock:
+            declared = self._declared
+            if parameters is not None:
+                declared = {name: declared_parameters(schema) for name, schema in parameters.items()}
+            skills = dict(self._skills)
+            seen = set()
+            for name, func_code in rows:
+                seen.add(name)
+                digest = source_hash(func_code)
+                current = skills.get(name)
+                if current is not None and current.source_hash == digest:
+                    continue
+                failed = self._failed.get(name)
+                if failed is not None and failed[0] == digest:
+                    continue
+                try:
+                    skills[name] = self._compile(name, func_code, digest)
+                    self._failed.pop(name, None)
+                    changed.append(name)
+                    logger.debug(f"Compiled skill {name}")
+                except Exception as e:
+                    skills.pop(name, None)
+                    self._failed[name] = (digest, str(e))
+                    logger.error(f"Failed to compile skill {name}. Error: {e}")
+            removed = set(skills) - seen
+            for name in removed:
+                del skills[name]
+            for name in set(self._failed) - seen:
+                del self._failed[name]
+            if changed or removed:
+                self._link(skills)
+                for name in changed:
+                    missing = unresolved_globals(skills[name].function)
+                    if missing:
+                        logger.warning(f"Skill {name} uses {', '.join(missing)} without defining or importing "
+                                       f"them; calls that reach them fail with NameError")
+            # swap in a fresh dict so readers never see a half-updated registry
+            if changed or removed or len(skills) != len(self._skills) or declared != self._declared:
+                self.version += 1
+            self._skills = skills
+            self._declared = declared
+        return changed
+
+    def get(self, name):
+        skill = self._skills.get(name)
+        return skill.function if skill is not None else None
+
+    def declared_parameters(self, name):
+        """Parameter names the model is told to provide, or None if no schema was synced."""
+        return self._declared.get(name)
+
+    def source_hash_of(self, name):
+        skill = self._skills.get(name)
+        return skill.source_hash if skill is not None else None
+
+    def items(self):
+        """``(name, function, source hash)`` of every loaded skill."""
+        return [(skill.name, skill.function, skill.source_hash) for skill in self._skills.values()]
+
+    def names(self):
+        return list(self._skills)
+
+    def errors(self):
+        return {name: error for name, (_, error) in self._failed.items()}
+
+    def __contains__(self, name):
+        return name in self._skills
+
+    def __len__(self):
+        return len(self._skills)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = SkillRegistry()
+    return _registry
@@ -0,0 +1,127 @@
+import os
+import time
+import logging
+import threading
+
+from octo_packages.logs import set_run_id
+from octo_packages.tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+# With polling the user sees nothing until the run has finished and the thread is re-read.
+# Streaming runs (``runs.create(stream=True)``) deliver server-sent events instead: text deltas
+# are collected into a StreamState that the page renders while the run is still going, and a
+# ``thread.run.requires_action`` event ends the stream so the tools can be dispatched and the
+# run continued with ``submit_tool_outputs(stream=True)``. CHAT_STREAMING=off, or a stream that
+# fails before its first event, falls back to the poll-based path.
+
+STREAMING_ENABLED = os.getenv('CHAT_STREAMING', 'on').lower() not in ('off', '0', 'false', 'no')
+
+RUN_EVENT_PREFIX = 'thread.run.'
+RUN_STEP_EVENT_PREFIX = 'thread.run.step.'
+MESSAGE_DELTA_EVENT = 'thread.message.delta'
+REQUIRES_ACTION_EVENT = 'thread.run.requires_action'
+ERROR_EVENT = 'error'
+
+
+class StreamError(Exception):
+    pass
+
+
+class StreamState:
+    """Text and timings of one streamed run, written by the stream reader and read by the page.
+
+    ``text`` grows as deltas arrive; ``ttft`` and ``duration`` are in seconds and None until known.
+    ``fell_back`` is set when the stream never started and the run is polled instead.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._lock = threading.Lock()
+        self.run = None
+        self.events = 0
+        self.tool_rounds = 0
+        self.fell_back = False
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self.first_token_at = None
+        self.finished_at = None
+
+    @property
+    def text(self):
+        with self._lock:
+            return ''.join(self._parts)
+
+    @property
+    def ttft(self):
+        return None if self.first_token_at is None else self.first_token_at - self._started
+
+    @property
+    def duration(self):
+        return None if self.finished_at is None else self.finished_at - self._started
+
+    def handle(self, event):
+        """Apply one stream event; returns the run when it needs tool outputs, else None."""
+        self.events += 1
+        name = event.event
+        if name == MESSAGE_DELTA_EVENT:
+            for part in event.data.delta.content or ():
+                text = getattr(getattr(part, 'text', None), 'value', None)
+                if text:
+                    with self._lock:
+                        if self.first_token_at is None:
+                            self.first_token_at = time.monotonic()
+                        self._parts.append(text)
+        elif name.startswith(RUN_EVENT_PREFIX) and not name.startswith(RUN_STEP_EVENT_PREFIX):
+            self.run = event.data
+            if name == REQUIRES_ACTION_EVENT:
+                return event.data
+        elif name == ERROR_EVENT:
+            raise StreamError(getattr(event.data, 'message', None) or str(event.data))
+        return None
+
+    def finish(self, tracer=None):
+        """Stop the clock and record the time to first token and the stream time as spans."""
+        self.finished_at = time.monotonic()
+        tracer = tracer or get_tracer()
+        status = getattr(self.run, 'status', None)
+        if self.ttft is not None:
+            tracer.record('openai.stream.first_token', 'stream_ttft', self.started_at, self.ttft)
+        tracer.record('openai.stream', 'stream', self.started_at, self.duration, status=status,
+                      events=self.events, tool_rounds=self.tool_rounds)
+
+
+def stream_run(client, tool_dispatcher, thread_id, assistant_id, execute_tool_call, instructions=None,
+               state=None, on_delta=None):
+    """Run the assistant as a stream on the calling thread; returns the final run.
+
+    ``on_delta(text so far)`` is called after every text delta. Tool calls are dispatched
+    inline whenever the stream stops at ``requires_action``.
+    """
+    state = state or StreamState()
+    params = {"thread_id": thread_id, "assistant_id": assistant_id}
+    if instructions:
+        params["instructions"] = instructions
+    stream = client.beta.threads.runs.create(stream=True, **params)
+    run_id = None
+    try:
+        while True:
+            required = None
+            with stream:
+                for event in stream:
+                    required = state.handle(event) or required
+                    if state.run is not None and run_id != state.run.id:
+                        run_id = state.run.id
+                        set_run_id(run_id)
+                    if on_delta is not None and event.event == MESSAGE_DELTA_EVENT:
+                        on_delta(state.text)
+            if required is None:
+                return state.run
+            tool_outputs = tool_dispatcher.dispatch(required.required_action.submit_tool_outputs.tool_calls,
+                                                    execute_tool_call)
+            state.tool_rounds += 1
+            stream = client.beta.threads.runs.submit_tool_outputs(
+                thread_id=thread_id, run_id=required.id, tool_outputs=tool_outputs, stream=True
+            )
+    finally:
+        state.finish()
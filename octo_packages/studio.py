@@ -0,0 +1,217 @@
+import os
+import time
+import logging
+import threading
+
+from octo_packages.backup import get_backup_sync, record_tombstone
+from octo_packages.bootstrap import lazy_import
+from octo_packages.catalog import DEFAULT_POLL_INTERVAL, bump_catalog_version, ensure_catalog_schema, read_catalog_version
+
+logger = logging.getLogger(__name__)
+
+# Database functions behind the Skills Studio page. Kept out of the page script so they can be
+# imported without a streamlit runtime, e.g. by the benchmarks.
+
+DEFAULT_PAGE_SIZE = int(os.getenv('STUDIO_PAGE_SIZE', '25'))
+
+# The browser only lists the narrow columns; Parameters and PythonFunction are fetched per skill
+SKILL_LIST_COLUMNS = ("SkillID", "SkillName", "SkillDescription", "CachePolicy", "CacheTTL")
+
+
+def like_pattern(search):
+    """Case-insensitive substring pattern for ``LIKE ? ESCAPE '\\'``."""
+    escaped = search.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+class SkillNameCache:
+    """Process-wide list of skill names for the studio dropdowns.
+
+    Invalidated by writes in this process; changes made by other app instances are noticed by
+    re-checking the catalog version every ``poll_interval`` seconds.
+    """
+
+    def __init__(self, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._names = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def get(self, pool):
+        with self._lock:
+            if self._names is not None and self._checked_at + self.poll_interval > time.monotonic():
+                return list(self._names)
+            cached, cached_version = self._names, self._version
+        ensure_catalog_schema(pool)
+        with pool.cursor() as cursor:
+            version = read_catalog_version(cursor)
+            if cached is not None and version == cached_version:
+                names = cached
+            else:
+                cursor.execute("SELECT SkillName FROM Skills ORDER BY SkillName")
+                names = [row[0] for row in cursor.fetchall()]
+        with self._lock:
+            self._names, self._version, self._checked_at = names, version, time.monotonic()
+        return list(names)
+
+    def invalidate(self):
+        with self._lock:
+            self._names = None
+
+
+_name_cache = SkillNameCache()
+
+
+def invalidate_skill_names():
+    _name_cache.invalidate()
+
+
+def fetch_data(pool):
+    pd = lazy_import('pandas')
+    try:
+        with pool.cursor() as cursor:
+            cursor.execute("SELECT * FROM Skills")
+            columns = [desc[0] for desc in cursor.description]  # This will capture column names
+            data = cursor.fetchall()
+            df = pd.DataFrame(data, columns=columns)
+            return df
+    except Exception as e:
+        logger.error(f"Error fetching data: {e}")
+        return pd.DataFrame()
+
+
+def insert_skill_data(pool, skill_name, skill_description, parameters, python_function, cache_policy='none', cache_ttl=300):
+    try:
+        ensure_catalog_schema(pool)
+        with pool.connection() as conn, conn.cursor() as cursor:
+            insert_query = """
+            INSERT INTO Skills (SkillName, SkillDescription, Parameters, PythonFunction, CachePolicy, CacheTTL, ModifiedAt) 
+            VALUES (?, ?, ?, ?, ?, ?, CURRENT_UTCTIMESTAMP)
+            """
+            # the insert and the version bump commit together
+            conn.setautocommit(False)
+            try:
+                cursor.execute(insert_query, (skill_name, skill_description, parameters, python_function, cache_policy, cache_ttl))
+                bump_catalog_version(cursor)
+                conn.commit()  # Important to commit the transaction
+            except Exception:
+                # re-enabling autocommit would commit the statements that already ran
+                conn.rollback()
+                raise
+            finally:
+                conn.setautocommit(True)
+            _name_cache.invalidate()
+            logger.info("Skill added successfully")
+            return "Skill added successfully!"
+    except Exception as e:
+        logger.error(f"Error inserting skill data: {e}")
+        return f"An error occurred: {e}"
+
+
+def delete_skill_data(pool, skill_name):
+    try:
+        ensure_catalog_schema(pool)
+        with pool.connection() as conn, conn.cursor() as cursor:
+            # the tombstone, the delete and the version bump commit together
+            conn.setautocommit(False)
+            try:
+                record_tombstone(cursor, skill_name)
+                delete_query = "DELETE FROM Skills WHERE SkillName = ?"
+                cursor.execute(delete_query, (skill_name,))
+                bump_catalog_version(cursor)
+                conn.commit()
+            except Exception:
+                # re-enabling autocommit would commit the statements that already ran
+                conn.rollback()
+                raise
+            finally:
+                conn.setautocommit(True)
+            _name_cache.invalidate()
+            logger.info("Skill deleted successfully")
+            return "Skill deleted successfully!"
+    except Exception as e:
+        logger.error(f"Error deleting skill data: {e}")
+        return f"An error occurred: {e}"
+
+
+def update_cache_policy(pool, skill_name, cache_policy, cache_ttl):
+    try:
+        ensure_catalog_schema(pool)
+        with pool.connection() as conn, conn.cursor() as cursor:
+            conn.setautocommit(False)
+            try:
+                cursor.execute("UPDATE Skills SET CachePolicy = ?, CacheTTL = ?, ModifiedAt = CURRENT_UTCTIMESTAMP WHERE SkillName = ?", (cache_policy, cache_ttl, skill_name))
+                bump_catalog_version(cursor)
+                conn.commit()
+            except Exception:
+                # re-enabling autocommit would commit the statements that already ran
+                conn.rollback()
+                raise
+            finally:
+                conn.setautocommit(True)
+            logger.info("Cache policy updated successfully")
+            return "Cache policy updated successfully!"
+    except Exception as e:
+        logger.error(f"Error updating cache policy: {e}")
+        return f"An error occurred: {e}"
+
+
+def fetch_skill_page(pool, search='', after=None, page_size=DEFAULT_PAGE_SIZE):
+    """One page of the skill browser, ordered by name.
+
+    Keyset pagination: ``after`` is the last SkillName of the previous page. Returns
+    ``(rows, has_more)`` where rows are dicts with the SKILL_LIST_COLUMNS.
+    """
+    conditions, params = [], []
+    if search:
+        pattern = like_pattern(search)
+        conditions.append("(LOWER(SkillName) LIKE ? ESCAPE '\\' OR LOWER(SkillDescription) LIKE ? ESCAPE '\\')")
+        params += [pattern, pattern]
+    if after is not None:
+        conditions.append("SkillName > ?")
+        params.append(after)
+    where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+    # one extra row tells us whether there is a next page; int() keeps the literal safe
+    query = f"SELECT {', '.join(SKILL_LIST_COLUMNS)} FROM Skills {where}ORDER BY SkillName LIMIT {int(page_size) + 1}"
+    try:
+        with pool.cursor() as cursor:
+            cursor.execute(query, tuple(params))
+            rows = [dict(zip(SKILL_LIST_COLUMNS, row)) for row in cursor.fetchall()]
+        return rows[:page_size], len(rows) > page_size
+    except Exception as e:
+        logger.error(f"Error fetching skill page: {e}")
+        return [], False
+
+
+def fetch_skill_detail(pool, skill_name):
+    """The large columns of one skill, loaded only when it is opened in the browser."""
+    try:
+        with pool.cursor() as cursor:
+            cursor.execute("SELECT Parameters, PythonFunction FROM Skills WHERE SkillName = ?", (skill_name,))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return {"Parameters": row[0], "PythonFunction": row[1]}
+    except Exception as e:
+        logger.error(f"Error fetching skill {skill_name}: {e}")
+        return None
+
+
+def fetch_function_names(pool):
+    try:
+        return _name_cache.get(pool)
+    except Exception as e:
+        logger.error(f"Error fetching function names: {e}")
+        return []
+
+
+def update_skills_backup(pool):
+    """Run an incremental SKILLS_BACKUP sync now; the page schedules one via request_sync instead."""
+    try:
+        report = get_backup_sync(pool).sync()
+        return (f"SKILLS_BACKUP table updated: {report['rows_copied']} rows copied "
+                f"in {report['duration_ms']} ms.")
+    except Exception as e:
+        logger.error(f"Error updating SKILLS_BACKUP: {e}")
+        return f"An error occurred while updating SKILLS_BACKUP: {e}"
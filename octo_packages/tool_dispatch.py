@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from octo_packages.tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = int(os.getenv('TOOL_MAX_WORKERS', '8'))
+DEFAULT_TOOL_TIMEOUT = float(os.getenv('TOOL_TIMEOUT', '30'))
+# A timed-out call cannot be interrupted and keeps its pool thread until it returns on its own.
+# Once this many calls of one skill are stuck like that, new calls of that skill are refused so
+# they cannot take the rest of the pool; other skills keep running. Defaults to a quarter of it.
+DEFAULT_MAX_STUCK = int(os.getenv('TOOL_MAX_STUCK_CALLS', str(max(1, DEFAULT_MAX_WORKERS // 4))))
+
+
+def to_tool_output(output):
+    # The assistants API only accepts strings as tool outputs
+    if isinstance(output, str):
+        return output
+    return json.dumps(output, default=str)
+
+
+def error_output(function_name, error_type, message):
+    return {"error": message, "error_type": error_type, "tool": function_name}
+
+
+class ToolCallDispatcher:
+    """Runs the tool calls of a ``requires_action`` run concurrently on a bounded thread pool.
+
+    Every call gets its own timeout (``timeouts`` maps function names to seconds, falling back
+    to ``default_timeout``). A call that times out or raises is turned into a structured error
+    output so the remaining calls can still be submitted. A timed-out call that is still running
+    counts as stuck until it returns; while ``max_stuck`` calls of a function are stuck, new calls
+    of that function are refused.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, default_timeout=DEFAULT_TOOL_TIMEOUT, timeouts=None,
+                 max_stuck=DEFAULT_MAX_STUCK):
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self.timeouts = dict(timeouts or {})
+        self.max_stuck = max_stuck
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tool-call')
+        self._lock = threading.Lock()
+        self._stuck = {}  # function name -> calls still running after their timeout
+        self._stats = {'calls': 0, 'errors': 0, 'timeouts': 0, 'rejected': 0}
+
+    def timeout_for(self, function_name):
+        return self.timeouts.get(function_name, self.default_timeout)
+
+    def dispatch(self, tool_calls, execute):
+        """Run ``execute(tool_call)`` for every call and return the ``tool_outputs`` list."""
+        with self._lock:
+            refused = {name for name, stuck in self._stuck.items() if stuck >= self.max_stuck}
+        started = time.monotonic()
+        futures = [
+            # each call runs in a copy of the caller's context so its span joins the current turn
+            (tool_call, None if tool_call.function.name in refused else
+             self._executor.submit(contextvars.copy_context().run, self._traced, execute, tool_call))
+            for tool_call in tool_calls
+        ]
+
+        tool_outputs = []
+        for tool_call, future in futures:
+            function_name = tool_call.function.name
+            if future is None:
+                logger.error(f"Refusing {function_name}: {self.max_stuck} earlier calls are stuck past their timeout")
+                output = error_output(function_name, 'unavailable',
+                                      f"{function_name} is temporarily unavailable, try again later")
+                self._count('rejected')
+                tool_outputs.append({"tool_call_id": tool_call.id, "output": to_tool_output(output)})
+                continue
+            timeout = self.timeout_for(function_name)
+            # all calls started together, so each one's budget counts from dispatch start
+            remaining = max(0.0, started + timeout - time.monotonic())
+            try:
+                output = future.result(timeout=remaining)
+                self._count('calls')
+            except FutureTimeout:
+                if not future.cancel():
+                    self._track_stuck(function_name, future)
+                logger.error(f"Tool {function_name} timed out after {timeout}s")
+                output = error_output(function_name, 'timeout', f"{function_name} timed out after {timeout}s")
+                self._count('calls', 'timeouts')
+            except Exception as e:
+                logger.error(f"Error executing {function_name}: {e}")
+                # sandboxed skills report the class name of what they raised in the worker
+                output = error_output(function_name, getattr(e, 'error_type', type(e).__name__), str(e))
+                self._count('calls', 'errors')
+            tool_outputs.append({"tool_call_id": tool_call.id, "output": to_tool_output(output)})
+        return tool_outputs
+
+    @staticmethod
+    def _traced(execute, tool_call):
+        with get_tracer().span(f"tool.{tool_call.function.name}", 'tool'):
+            return execute(tool_call)
+
+    def _track_stuck(self, function_name, future):
+        with self._lock:
+            self._stuck[function_name] = self._stuck.get(function_name, 0) + 1
+        # fires right away if the call finished in the meantime
+        future.add_done_callback(lambda _: self._release_stuck(function_name))
+
+    def _release_stuck(self, function_name):
+        with self._lock:
+            self._stuck[function_name] -= 1
+            if not self._stuck[function_name]:
+                del self._stuck[function_name]
+
+    def _count(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, max_workers=self.max_workers, stuck_workers=sum(self._stuck.values()),
+                        stuck_by_tool=dict(self._stuck), max_stuck=self.max_stuck)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = ToolCallDispatcher()
+    return _dispatcher
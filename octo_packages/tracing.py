@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import uuid
+import queue
+import inspect
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Lightweight span instrumentation for the hot path. Spans land in an in-memory ring buffer
+# that the Performance page reads; they can additionally be exported as JSONL
+# (TRACE_JSONL_PATH) or OTLP/HTTP JSON (OTEL_EXPORTER_OTLP_ENDPOINT) from a background thread.
+
+DEFAULT_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', '5000'))
+
+_current_trace = contextvars.ContextVar('octo_trace', default=None)
+_current_span = contextvars.ContextVar('octo_span', default=None)
+
+
+class Span:
+    __slots__ = ('name', 'stage', 'trace_id', 'span_id', 'parent_id', 'start', 'duration', 'attributes', 'error')
+
+    def __init__(self, name, stage, trace_id, parent_id, attributes):
+        self.name = name
+        self.stage = stage
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration = None
+        self.attributes = attributes
+        self.error = None
+
+    def as_dict(self):
+        return {
+            'name': self.name, 'stage': self.stage, 'trace_id': self.trace_id, 'span_id': self.span_id,
+            'parent_id': self.parent_id, 'start': self.start, 'duration_ms': (self.duration or 0) * 1000,
+            'attributes': self.attributes, 'error': self.error,
+        }
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Tracer:
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE):
+        self._spans = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._exporters = []
+        self._queue = None
+
+    # -- recording -------------------------------------------------------------------------
+
+    @contextmanager
+    def span(self, name, stage, **attributes):
+        span = Span(name, stage, _current_trace.get(), _current_span.get(), attributes)
+        token = _current_span.set(span.span_id)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+            self._record(span)
+
+    def record(self, name, stage, start, duration, **attributes):
+        """Record an interval measured elsewhere (e.g. time to first token) as a span.
+
+        ``start`` is a ``time.time()`` timestamp and ``duration`` is in seconds.
+        """
+        span = Span(name, stage, _current_trace.get(), _current_span.get(), attributes)
+        span.start = start
+        span.duration = duration
+        self._record(span)
+        return span
+
+    @contextmanager
+    def turn(self, name='chat.turn', **attributes):
+        """Start a new trace (one chat turn); spans opened inside belong to it."""
+        token = _current_trace.set(uuid.uuid4().hex)
+        try:
+            with self.span(name, 'turn', **attributes) as span:
+                yield span
+        finally:
+            _current_trace.reset(token)
+
+    def _record(self, span):
+        with self._lock:
+            self._spans.append(span)
+        if self._queue is not None:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                pass
+
+    # -- reading ---------------------------------------------------------------------------
+
+    def spans(self):
+        with self._lock:
+            return list(self._spans)
+
+    def stage_summary(self):
+        """``{stage: {count, p50_ms, p95_ms, p99_ms, max_ms}}`` over the ring buffer."""
+        durations = {}
+        for span in self.spans():
+            durations.setdefault(span.stage, []).append(span.duration * 1000)
+        return {
+            stage: {
+                'count': len(values),
+                'p50_ms': percentile(values, 0.50),
+                'p95_ms': percentile(values, 0.95),
+                'p99_ms': percentile(values, 0.99),
+                'max_ms': max(values),
+            }
+            for stage, values in sorted(durations.items())
+        }
+
+    def slowest_turns(self, limit=10):
+        turns = [span for span in self.spans() if span.stage == 'turn']
+        return sorted(turns, key=lambda span: span.duration, reverse=True)[:limit]
+
+    def trace(self, trace_id):
+        return sorted((span for span in self.spans() if span.trace_id == trace_id), key=lambda span: span.start)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    # -- export ----------------------------------------------------------------------------
+
+    def add_exporter(self, exporter):
+        self._exporters.append(exporter)
+        if self._queue is None:
+            self._queue = queue.Queue(maxsize=10000)
+            threading.Thread(target=self._export_loop, name='trace-export', daemon=True).start()
+
+    def _export_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + 1.0
+            while len(batch) < 500 and time.monotonic() < deadline:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            for exporter in self._exporters:
+                try:
+                    exporter.export(batch)
+                except Exception as e:
+                    logger.error(f"Span export via {type(exporter).__name__} failed: {e}")
+
+
+class JsonlExporter:
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, spans):
+        with open(self.path, 'a') as f:
+            for span in spans:
+                f.write(json.dumps(span.as_dict(), default=str) + '\n')
+
+
+class OtlpExporter:
+    """Posts spans to an OTLP/HTTP collector using the JSON encoding."""
+
+    def __init__(self, endpoint, service_name='glowing-octo-enigma'):
+        self.url = endpoint.rstrip('/') + '/v1/traces'
+        self.service_name = service_name
+
+    @staticmethod
+    def _attribute(key, value):
+        if isinstance(value, bool):
+            return {'key': key, 'value': {'boolValue': value}}
+        if isinstance(value, int):
+            return {'key': key, 'value': {'intValue': str(value)}}
+        if isinstance(value, float):
+            return {'key': key, 'value': {'doubleValue': value}}
+        return {'key': key, 'value': {'stringValue': str(value)}}
+
+    def _otlp_span(self, span):
+        start_ns = int(span.start * 1e9)
+        otlp = {
+            'traceId': (span.trace_id or span.span_id * 2)[:32].ljust(32, '0'),
+            'spanId': span.span_id,
+            'name': span.name,
+            'kind': 1,
+            'startTimeUnixNano': str(start_ns),
+            'endTimeUnixNano': str(start_ns + int((span.duration or 0) * 1e9)),
+            'attributes': [self._attribute('stage', span.stage)] +
+                          [self._attribute(key, value) for key, value in span.attributes.items()],
+            'status': {'code': 2, 'message': span.error} if span.error else {'code': 1},
+        }
+        if span.parent_id:
+            otlp['parentSpanId'] = span.parent_id
+        return otlp
+
+    def export(self, spans):
+        import requests
+        payload = {'resourceSpans': [{
+            'resource': {'attributes': [self._attribute('service.name', self.service_name)]},
+            'scopeSpans': [{'scope': {'name': 'octo_packages.tracing'}, 'spans': [self._otlp_span(s) for s in spans]}],
+        }]}
+        requests.post(self.url, json=payload, timeout=5).raise_for_status()
+
+
+class TracedProxy:
+    """Wraps an OpenAI client so every resource method call (sync or async) becomes a span."""
+
+    def __init__(self, target, tracer, path='openai', stage='openai'):
+        self._target = target
+        self._tracer = tracer
+        self._path = path
+        self._stage = stage
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        path = f"{self._path}.{name}"
+        # other wrappers (e.g. the rate limiter) expose what they wrap as __wrapped__
+        if type(getattr(value, '__wrapped__', value)).__module__.startswith('openai.resources'):
+            return TracedProxy(value, self._tracer, path, self._stage)
+        if not callable(value) or name.startswith('_') or isinstance(value, type):
+            return value
+
+        tracer, stage = self._tracer, self._stage
+        if type(getattr(self._target, '__wrapped__', self._target)).__name__.startswith('Async'):
+            # async resources return coroutines/awaitables; time the await, not the call
+            def traced_async(*args, **kwargs):
+                result = value(*args, **kwargs)
+                if not inspect.isawaitable(result):
+                    return result
+
+                async def awaited():
+                    with tracer.span(path, stage):
+                        return await result
+                return awaited()
+            return traced_async
+
+        def traced(*args, **kwargs):
+            with tracer.span(path, stage):
+                return value(*args, **kwargs)
+        return traced
+
+
+def current_trace_id():
+    return _current_trace.get()
+
+
+def set_trace_id(trace_id):
+    """Adopt ``trace_id`` in the current context, e.g. inside an engine task."""
+    _current_trace.set(trace_id)
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                tracer = Tracer()
+                if os.getenv('TRACE_JSONL_PATH'):
+                    tracer.add_exporter(JsonlExporter(os.environ['TRACE_JSONL_PATH']))
+                if os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT'):
+                    tracer.add_exporter(OtlpExporter(os.environ['OTEL_EXPORTER_OTLP_ENDPOINT']))
+                _tracer = tracer
+    return _tracer
@@ -1,106 +1,73 @@
 import streamlit as st
 import os
-from dotenv import load_dotenv
-from openai import OpenAI
 import time
-import json
-import pandas as pd
-import requests
-from cfenv import AppEnv
-from hdbcli import dbapi
-import re
 from datetime import datetime
 import logging
 
-# Define a new logging level
-CUSTOM_INFO_LEVEL_NUM = 25
-logging.addLevelName(CUSTOM_INFO_LEVEL_NUM, "LOGGING")
-
-def custom_logger(self, message, *args, **kws):
-    if self.isEnabledFor(CUSTOM_INFO_LEVEL_NUM):
-        # Yes, logger takes its '*args' as 'args'.
-        self._log(CUSTOM_INFO_LEVEL_NUM, message, args, **kws) 
-
-# Add the new method to Logger class
-logging.Logger.custom_logger = custom_logger
-logging.basicConfig(level=CUSTOM_INFO_LEVEL_NUM)
+from octo_packages.bootstrap import bootstrap
+from octo_packages.logs import bind_log_context
+from octo_packages.db import get_pool
+from octo_packages.catalog import get_catalog
+from octo_packages.skills import get_registry
+from octo_packages.dispatch_table import get_dispatch_table
+from octo_packages.polling import get_poller
+from octo_packages.tool_dispatch import get_dispatcher
+from octo_packages.openai_keys import get_key_cache, key_fingerprint
+from octo_packages.assistants import build_tools, get_assistant_registry
+from octo_packages.messages import HISTORY_MAX_BYTES, HISTORY_PAGE_SIZE, HISTORY_WINDOW, MessageSync
+from octo_packages.engine import get_engine
+from octo_packages.result_cache import get_result_cache
+from octo_packages.tracing import current_trace_id, get_tracer, set_trace_id
+from octo_packages.http_pool import get_http_pool
+from octo_packages.sandbox import get_sandbox
+from octo_packages.streaming import STREAMING_ENABLED, StreamState, stream_run
+from octo_packages.session_store import SessionBinding, get_session_store, new_session_id, resume_session, valid_session_id
+from octo_packages import chat
+
+# Logger setup, .env and the credential files are handled once per process
+process = bootstrap()
+page_run = process.begin_page('chat_window')
 logger = logging.getLogger(__name__)
 
-# Load .env file if it exists for local development
-load_dotenv()
-
-def get_db_credentials():
-    logger.custom_logger("Retrieving database credentials")
-    if 'VCAP_SERVICES' in os.environ:
-        logger.custom_logger("Running on Cloud Foundry - fetching credentials from VCAP_SERVICES")
-        env = AppEnv()
-        hana_service = env.get_service(label='hana')
-        credentials = hana_service.credentials
-        return credentials['host'], credentials['port'], credentials['user'], credentials['password']
-    else:
-        logger.custom_logger("Running locally - fetching credentials from environment")
-        return os.getenv('HANA_HOST'), os.getenv('HANA_PORT'), os.getenv('HANA_USER'), os.getenv('HANA_PASSWORD')
-
-host, port, user, password = get_db_credentials()
-try:
-    conn = dbapi.connect(address=host, port=int(port), user=user, password=password)
-    logger.custom_logger("Successfully connected to the database")
-except Exception as e:
-    logging.error(f"Failed to connect to the database. Error: {e}")
-
-def fetch_python_functions():
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT SkillName, PythonFunction FROM Skills")
-        return cursor.fetchall()
-
-def extract_and_run_imports(func_code):
-    import_re = r'^\s*(from\s+[^\s]+\s+import\s+[^\s]+|import\s+[^\s]+)'
-    imports = re.findall(import_re, func_code, re.MULTILINE)
-
-    for import_statement in imports:
-        logger.custom_logger(f"Executing import statement: {import_statement}")
-        try:
-            exec(import_statement)
-        except Exception as e:
-            logging.error(f"Failed to import: {import_statement}. Error: {e}")
+# Process-wide HANA pool, shared across pages, sessions and reruns
+pool = get_pool()
+skill_registry = get_registry()
+# Version-polled copy of the Skills rows, shared by every session of this instance
+skill_catalog = get_catalog(pool)
+run_poller = get_poller()
+tool_dispatcher = get_dispatcher()
+openai_key_cache = get_key_cache()
+assistant_registry = get_assistant_registry(pool)
+run_engine = get_engine()
+result_cache = get_result_cache()
+http_pool = get_http_pool()
+tracer = get_tracer()
+# Warm worker processes that run the skills; None when SKILL_SANDBOX=inline
+skill_sandbox = get_sandbox()
+# Conversation bindings shared by all instances, so any of them can resume a session
+session_store = get_session_store(pool)
+# Skill name -> prebound callable, with secrets resolved by parameter name from bootstrap()'s credential provider
+dispatch_table = get_dispatch_table(skill_registry)
+
+# CHAT_ENGINE=sync falls back to the blocking, per-script-thread run loop
+use_run_engine = os.getenv('CHAT_ENGINE', 'async') != 'sync'
+# How often a submitted engine run is checked (and its streamed text redrawn) between reruns
+RUN_REFRESH_SECONDS = float(os.getenv('CHAT_RUN_REFRESH_SECONDS', '0.25'))
+
+ASSISTANT_AVATAR = 'https://raw.githubusercontent.com/JHFVR/jle/main/jle_blue.svg'
 
 def initialize_functions():
-    functions = fetch_python_functions()
-    for _, func_code in functions:
-        extract_and_run_imports(func_code)    
-        try:
-            exec(func_code, globals())
-        except Exception as e:
-            logging.error(f"Failed to execute function code. Error: {e}")
+    # Polls the catalog version at most every few seconds and compiles changed skills only
+    try:
+        changed = chat.initialize_functions(pool, skill_registry, result_cache, skill_sandbox, skill_catalog)
+        if changed:
+            logger.custom_logger("Compiled skills: %s", changed)
+    except Exception as e:
+        logging.error(f"Failed to load skills. Error: {e}")
 
-# Functions are now loaded into the global scope
+# Functions are now loaded into the process-wide skill registry
 initialize_functions()
 
-# Load sap_credentials & weather (not pushed to github but exposed in cloud foundry until we switch to CF env vars)
-# Read the API key from the file
-try:
-    with open('.sap_credentials', 'r') as file:
-        sap_api_key = file.read().strip()
-    logger.custom_logger("SAP API key loaded successfully")
-except Exception as e:
-    logging.error(f"Error loading SAP API key: {e}")
-
-try:
-    with open('.weather_credentials', 'r') as file:
-        weather_api_key = file.read().strip()
-    logger.custom_logger("Weather API key loaded successfully")
-except Exception as e:
-    logging.error(f"Error loading Weather API key: {e}")
-
-
-def fetch_skill_details():
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT SKILLNAME, SKILLDESCRIPTION, PARAMETERS FROM SKILLS")
-            return cursor.fetchall()
-    except Exception as e:
-        logging.error(f"An error occurred while fetching skill details: {e}")
-        return []
 
 # App title
 st.set_page_config(page_title="Enterprise Assistant", page_icon="💎")
@@ -116,27 +83,23 @@ if 'previous_page' not in st.session_state:
 st.session_state.previous_page = st.session_state.current_page
 st.session_state.current_page = "chat_window"
 
+# The session ID travels in the URL, so a reconnect to another instance finds the same conversation
+if 'session_id' not in st.session_state:
+    requested_session = st.query_params.get('session')
+    st.session_state.session_id = requested_session if valid_session_id(requested_session) else new_session_id()
+if st.query_params.get('session') != st.session_state.session_id:
+    st.query_params['session'] = st.session_state.session_id
+# every record logged for this session carries its ID
+bind_log_context(st.session_state.session_id)
+
 # Initialize a state variable for process status
 if 'process_status' not in st.session_state:
     st.session_state.process_status = None
     st.session_state.process_status_before = None
 
 def test_openai_api_key(api_key):
-    try:
-        # Initialize a temporary OpenAI client with the provided API key
-        temp_client = OpenAI(api_key=api_key)
-        
-        # Make a lightweight API call, such as listing available models
-        response = temp_client.models.list()
-        
-        # If the call succeeds, the API key is valid
-        return True
-        print('openai api key ok')
-    except Exception as e:
-        # If the call fails, the API key is likely invalid
-        logging.error(f"OpenAI API key validation failed: {e}")
-        return False
-        print('openai api key not there')
+    # Cached per key hash with positive/negative TTLs, so reruns don't list models every time
+    return openai_key_cache.is_valid(api_key)
         
 # Start of the Streamlit sidebar
 with st.sidebar:
@@ -149,14 +112,14 @@ with st.sidebar:
         """, unsafe_allow_html=True)
 
     if 'VCAP_SERVICES' in os.environ or 'VCAP_APPLICATION' in os.environ:
-        logger.custom_logger("Running in a Cloud Foundry environment")
+        logger.custom_logger("Running in a Cloud Foundry environment", extra={'event': 'page.environment'})
         if 'openai_api_key' in st.session_state:
             st.success('OpenAI API key here, checking if it works!', icon='✅')
             openai_api_key = st.session_state.openai_api_key
             if test_openai_api_key(openai_api_key):
                 st.success('Dope, the OpenAI API key still works!', icon='✅')
-                client = OpenAI(api_key=openai_api_key)
-                logger.custom_logger("OpenAI client initialized with API key from session state")
+                client = openai_key_cache.get_client(openai_api_key)
+                logger.custom_logger("OpenAI client initialized with API key from session state", extra={'event': 'openai.client'})
             else:
                 st.error('Invalid OpenAI API key. Please enter a correct key!', icon='⚠️')
                 st.stop()
@@ -166,8 +129,8 @@ with st.sidebar:
                 st.session_state.openai_api_key = openai_api_key
                 if test_openai_api_key(openai_api_key):
                     st.success('API key stored in session for Cloud Foundry and validated!', icon='👉')
-                    client = OpenAI(api_key=openai_api_key)
-                    logger.custom_logger("OpenAI client initialized with API key in session state")
+                    client = openai_key_cache.get_client(openai_api_key)
+                    logger.custom_logger("OpenAI client initialized with API key in session state", extra={'event': 'openai.client'})
                 else:
                     st.error('Invalid OpenAI API key. Please enter a correct key!', icon='⚠️')
                     st.stop()
@@ -175,15 +138,15 @@ with st.sidebar:
                 st.info('Waiting for API key input...', icon='ℹ️')
                 st.stop()
     else:
-        logger.custom_logger("Running in a non-Cloud Foundry environment")
+        logger.custom_logger("Running in a non-Cloud Foundry environment", extra={'event': 'page.environment'})
         if 'OPENAI_API_KEY' in os.environ:
             st.success('OpenAI API key here, will check if it works!', icon='✅')
             openai_api_key = os.environ['OPENAI_API_KEY']
             st.session_state.openai_api_key = openai_api_key
             if test_openai_api_key(st.session_state.openai_api_key):
                 st.success('Dope, the OpenAI API works!', icon='✅')
-                client = OpenAI(api_key=openai_api_key)
-                logger.custom_logger("OpenAI client initialized with API key from session state")
+                client = openai_key_cache.get_client(openai_api_key)
+                logger.custom_logger("OpenAI client initialized with API key from session state", extra={'event': 'openai.client'})
         else:
             openai_api_key = st.text_input('Enter OpenAI API key:', type='password')
             st.session_state.openai_api_key = openai_api_key
@@ -191,53 +154,64 @@ with st.sidebar:
                 with open('.env', 'a') as f:
                     f.write(f'OPENAI_API_KEY={openai_api_key}\n')
                 st.success('Valid API key stored!', icon='👉')
-                client = OpenAI(api_key=openai_api_key)
-                logger.custom_logger("OpenAI client initialized with API key in session state")
+                client = openai_key_cache.get_client(openai_api_key)
+                logger.custom_logger("OpenAI client initialized with API key in session state", extra={'event': 'openai.client'})
             else:
                 st.warning('Please enter a correct API key!', icon='⚠️')
                 logger.custom_logger("OpenAI api key wrong")
 
+# Pick up the conversation of this session ID if another instance (or an earlier process) started it
+if 'assistant_id' not in st.session_state or 'thread_id' not in st.session_state:
+    try:
+        binding = resume_session(session_store, st.session_state.session_id, st.session_state.openai_api_key)
+        if binding is not None:
+            # Only the thread is taken over: the bound assistant may have been superseded and garbage
+            # collected since (bindings outlive the GC grace period), so the assistant for the current
+            # skills is looked up from the registry below
+            st.session_state.thread_id = binding.thread_id
+            st.session_state.resumed_binding = binding
+            session_store.touch(binding.session_id)
+            logger.custom_logger("Resumed chat session %s on thread %s", binding.session_id[:8], binding.thread_id)
+        elif session_store.get(st.session_state.session_id) is not None:
+            # the ID belongs to a conversation of another key; start a new one
+            st.session_state.session_id = new_session_id()
+            st.query_params['session'] = st.session_state.session_id
+            bind_log_context(st.session_state.session_id)
+    except Exception as e:
+        logging.error(f"Error resuming chat session: {e}")
+
 # Check if assistant and thread are already created
 if 'assistant_id' not in st.session_state or 'thread_id' not in st.session_state:
     
-    skill_details = fetch_skill_details()
-    logger.custom_logger(f"Loaded skills: {skill_details}")
-
-    tools = [{"type": "code_interpreter"}]  # Starting with the code interpreter tool
+    skill_details = chat.fetch_skill_details(pool)
+    # formatted on the log listener thread, and only if the record is not capped
+    logger.custom_logger("Loaded skills: %s", skill_details, extra={'event': 'skills.loaded'})
 
-    for skill_name, skill_description, parameters in skill_details:
-        try:
-            # Load parameters if not empty, else set to empty dict
-            parameters_data = json.loads(parameters) if parameters.strip() else {}
-        except json.JSONDecodeError as e:
-            # Fallback to empty dict if JSON parsing fails
-            logging.error(f"JSON decoding error for parameters of {skill_name}: {e}")
-            parameters_data = {}
-
-        tool = {
-            "type": "function",
-            "function": {
-                "name": skill_name,
-                "description": skill_description,
-                "parameters": parameters_data
-            }}
-        tools.append(tool)
-
-    logger.custom_logger(f"Loaded tools: {tools}")
+    tools = build_tools(skill_details)
+    logger.custom_logger("Loaded tools: %s", tools, extra={'event': 'tools.loaded'})
 
     try:
-        # Create an assistant and a thread
-        assistant = client.beta.assistants.create(
+        # Reuse the assistant registered for this exact definition; only a changed skill set creates one
+        assistant_id = assistant_registry.get_or_create(
+            client,
+            st.session_state.openai_api_key,
             name="Streamlit Jewel",
             instructions="Your name is Jewel. You are a second brain and a helpful assistant running within enterprise software. A person will ask you a question and you will provide a helpful answer. Write the answer in the same language as the question. If you don't know the answer, just say that you don't know. Don't try to make up an answer. Concise answers, no harmful language or unethical replies.",
             tools=tools,
             model="gpt-3.5-turbo-1106"
         )
-        thread = client.beta.threads.create()
+        resumed = st.session_state.pop('resumed_binding', None)
+        if 'thread_id' not in st.session_state:
+            st.session_state.thread_id = client.beta.threads.create().id
 
         # Store the IDs in session state
-        st.session_state.assistant_id = assistant.id
-        st.session_state.thread_id = thread.id
+        st.session_state.assistant_id = assistant_id
+        if resumed is None or resumed.assistant_id != assistant_id:
+            # written behind; other instances can resume the conversation once it is flushed
+            session_store.put(SessionBinding(st.session_state.session_id,
+                                             key_fingerprint(st.session_state.openai_api_key), assistant_id,
+                                             st.session_state.thread_id,
+                                             created_at=resumed.created_at if resumed is not None else None))
     except Exception as e:
         logging.error(f"Error creating assistant or thread: {e}")
 else:
@@ -245,139 +219,194 @@ else:
     assistant_id = st.session_state.assistant_id
     thread_id = st.session_state.thread_id
 
+def load_earlier_messages():
+    # on_click callback: fetch one older page, then show the history again on this rerun
+    message_sync = st.session_state.get('message_sync')
+    if message_sync is not None:
+        try:
+            if not message_sync.load_earlier(client, HISTORY_PAGE_SIZE) and message_sync.has_earlier:
+                st.session_state.history_budget_reached = True
+        except Exception as e:
+            logging.error(f"Error loading earlier messages: {e}")
+    st.session_state.history_requested = True
+
 def display_messages(thread_id):
     try:
-        # Fetch messages from the thread
-        thread_messages = client.beta.threads.messages.list(thread_id).data
-        thread_messages.reverse()  # Reverse the order for display
-
-        # Initialize the message list in session state if not present
-        if 'message_history' not in st.session_state:
-            st.session_state.message_history = []
-
-        # Process and display each message
-        for message in thread_messages:
-            role = message.role
-            message_id = message.id
-            message_content = message.content[0].text.value if message.content else ""
-
-            # Construct a unique identifier for the message
-            unique_message_id = f"{message_id}-{role}"
-
-            # Check if the message is already in the history
-            if unique_message_id not in [msg['id'] for msg in st.session_state.message_history]:
-                # Store new message in session state
-                st.session_state.message_history.append({
-                    "id": unique_message_id,
-                    "role": role,
-                    "content": message_content
-                })
+        # Keep one incremental sync per session/thread; it only fetches messages after the last one seen
+        # and holds a bounded window of the newest ones
+        if 'message_sync' not in st.session_state or st.session_state.message_sync.thread_id != thread_id:
+            st.session_state.message_sync = MessageSync(thread_id, max_messages=HISTORY_WINDOW, max_bytes=HISTORY_MAX_BYTES)
+        message_sync = st.session_state.message_sync
+        message_sync.sync(client)
+        st.session_state.message_history = message_sync.history
+
+        if message_sync.has_earlier:
+            if st.session_state.pop('history_budget_reached', False):
+                st.caption(f"Earlier messages don't fit the {HISTORY_MAX_BYTES // 1024} KB chat history budget of this session.")
+            else:
+                st.button('⬆️ Load earlier messages', on_click=load_earlier_messages)
 
         # Display messages from session state
         for msg in st.session_state.message_history:
-            with st.chat_message(msg['role'], avatar='https://raw.githubusercontent.com/JHFVR/jle/main/jle_blue.svg' if msg['role'] == "assistant" else None):
+            with st.chat_message(msg['role'], avatar=ASSISTANT_AVATAR if msg['role'] == "assistant" else None):
                 st.write(msg['content'])
 
     except Exception as e:
         logging.error(f"Error displaying messages: {e}")
 
-# Only call display_messages if coming from a different page
-if st.session_state.previous_page != "chat_window":
+# Only call display_messages if coming from a different page or after "load earlier"
+if st.session_state.previous_page != "chat_window" or st.session_state.pop('history_requested', False):
     display_messages(st.session_state.thread_id)
 
 # Display an initial greeting message
 if 'initialized' not in st.session_state:
-    with st.chat_message("assistant", avatar='https://raw.githubusercontent.com/JHFVR/jle/main/jle_blue.svg'):
+    with st.chat_message("assistant", avatar=ASSISTANT_AVATAR):
         st.write("Hi - how may I assist you today?")
     st.session_state.initialized = False
 
-def wait_on_run(run, thread_id):
-
-    while run.status in ["queued", "in_progress"]:
+# Tool calls resolve skills from the dispatch table (secrets included) and go through the result cache
+execute_tool_call = chat.make_tool_executor(dispatch_table, result_cache, http_pool,
+                                            sandbox=skill_sandbox, timeout_for=tool_dispatcher.timeout_for)
 
-        # logger.custom_logger(f"Run status: {run.status} at {timestamp}")
-        # print("heres the status", run.status[:10])
-
-        run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+def wait_on_run(run, thread_id):
 
+    def on_status(run):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         st.session_state.process_status = f'Status {run.status} at {timestamp}'
-        logger.custom_logger(st.session_state.process_status)
-
-        if run.status == "requires_action":
-            tools_to_call = run.required_action.submit_tool_outputs.tool_calls
-            tool_output_array = []
-
-            st.session_state.process_status = f'Status {run.status}'
-            logger.custom_logger(st.session_state.process_status)
-
-            for tool in tools_to_call:
-                tool_call_id = tool.id
-                function_name = tool.function.name
-                logger.custom_logger(f"Selected tool: {function_name}")
-                logger.custom_logger(f"Tool arguments: {json.loads(tool.function.arguments)}")
-
-                function_to_call = globals().get(function_name)
-                logger.custom_logger(f"Function as string: {function_to_call}")
-
-                # Initialize output
-                output = None
-
-                if function_to_call:
-                    try:
-                        function_args = json.loads(tool.function.arguments) if tool.function.arguments else {}
-                        logger.custom_logger(f"Function arguments: {function_args}")
-                        
-                        if 'sap_api_key' in function_to_call.__code__.co_varnames:
-                            output = function_to_call(sap_api_key, **function_args)
-                        elif 'weather_api_key' in function_to_call.__code__.co_varnames:
-                            output = function_to_call(weather_api_key, **function_args)
-                        else:
-                            output = function_to_call(**function_args)
-                    except Exception as e:
-                        logging.error(f"Error executing {function_name}: {e}")
-                        output = {"error": str(e)}
-
-                    logger.custom_logger(f"Output of {function_name}")
-
-                # else:
-                #     logging.warning(f"Function {function_name} not found")
-                #     output = {"error": f"Function {function_name} not found"}
-
-                # Ensure the output is a JSON string
-                if not isinstance(output, str):
-                    output = json.dumps(output)
-
-                # Append the output to the tool_output_array
-                tool_output_array.append({"tool_call_id": tool_call_id, "output": output})
+        logger.custom_logger(st.session_state.process_status, extra={'event': 'run.status'})
+
+    return chat.wait_on_run(client, run_poller, tool_dispatcher, run, thread_id, execute_tool_call, on_status=on_status)
+
+def render_stream(placeholder, text):
+    # the cursor shows the answer is still being written
+    placeholder.markdown(text + " ▌")
+
+def finish_engine_run(pending):
+    # The turn span runs from submit to completion, i.e. across the reruns in between
+    handle = pending['handle']
+    st.session_state.process_status = f'Status {handle.status} after {handle.polls} polls'
+    logger.custom_logger(st.session_state.process_status, extra={'event': 'run.status'})
+    set_trace_id(pending['trace_id'])
+    tracer.record('chat.turn', 'turn', pending['started_at'], time.time() - pending['started_at'],
+                  engine='async', status=handle.status)
+    try:
+        handle.result()
+    except Exception as e:
+        # A 401 means the cached validation is stale - drop it so the next rerun re-checks the key
+        if openai_key_cache.invalidate_on_auth_error(st.session_state.openai_api_key, e):
+            run_engine.forget_client(st.session_state.openai_api_key)
+            st.session_state.key_rejected = True
+        logging.error(f"Error running the assistant: {e}")
+    set_trace_id(None)
+
+@st.fragment(run_every=RUN_REFRESH_SECONDS)
+def show_pending_run():
+    # Reruns only this fragment until the engine is done, so no script thread waits on the run
+    pending = st.session_state.get('pending_run')
+    if pending is None:
+        return
+    handle = pending['handle']
+    if handle.done():
+        del st.session_state.pending_run
+        finish_engine_run(pending)
+        # Keep the session from expiring; batched with the other sessions' writes
+        session_store.touch(st.session_state.session_id)
+        # A full rerun replaces the live bubble with the thread view
+        st.session_state.history_requested = True
+        st.rerun()
+    with st.chat_message("user"):
+        st.write(pending['prompt'])
+    with st.chat_message("assistant", avatar=ASSISTANT_AVATAR):
+        # the engine keeps this object when it falls back to polling and only flags it
+        stream = handle.stream
+        if stream is not None and stream.text and not stream.fell_back:
+            # Render the answer as it streams in
+            render_stream(st.empty(), stream.text)
+        else:
+            st.caption("Thinking...")
 
-            # Submit the tool outputs
-            run = client.beta.threads.runs.submit_tool_outputs(
-                thread_id=thread_id,
-                run_id=run.id,
-                tool_outputs=tool_output_array
-            )
-    return run  
+if st.session_state.pop('key_rejected', False):
+    st.error('The OpenAI API key was rejected. Please enter a correct key!', icon='⚠️')
 
 # User-provided prompt
 if prompt := st.chat_input(disabled=not test_openai_api_key(st.session_state.openai_api_key)):
-
-    # Post user message
-    user_message = client.beta.threads.messages.create(
-        thread_id=st.session_state.thread_id,
-        role="user",
-        content=prompt
-    )
-
-    # Create a run for the assistant to process the conversation
-    run = client.beta.threads.runs.create(
-        thread_id=st.session_state.thread_id,
-        assistant_id=st.session_state.assistant_id,
-        instructions="Please address the user appropriately."
-    )
-
-    # Wait for the run to complete
-    completed_run = wait_on_run(run, st.session_state.thread_id)
-
-    # Retrieve and display updated messages
-    display_messages(st.session_state.thread_id)
\ No newline at end of file
+    if use_run_engine and 'pending_run' in st.session_state:
+        # the thread has an active run; OpenAI rejects new messages until it is done
+        st.toast("Still working on your last message")
+    elif use_run_engine:
+        try:
+            # Hand the run to the shared asyncio engine; show_pending_run below picks up the result
+            with tracer.turn('chat.submit', engine='async'):
+                handle = run_engine.submit(
+                    st.session_state.openai_api_key,
+                    st.session_state.thread_id,
+                    st.session_state.assistant_id,
+                    prompt,
+                    execute_tool_call,
+                    instructions="Please address the user appropriately."
+                )
+                trace_id = current_trace_id()
+            st.session_state.pending_run = {'handle': handle, 'prompt': prompt, 'trace_id': trace_id,
+                                            'started_at': time.time()}
+        except Exception as e:
+            logging.error(f"Error running the assistant: {e}")
+    else:
+        # Everything done for this prompt is recorded as one turn on the Performance page
+        with tracer.turn('chat.turn', engine='sync'):
+            try:
+                # Post user message
+                user_message = client.beta.threads.messages.create(
+                    thread_id=st.session_state.thread_id,
+                    role="user",
+                    content=prompt
+                )
+
+                completed_run = None
+                if STREAMING_ENABLED:
+                    stream_state = StreamState()
+                    live_reply = st.empty()
+                    try:
+                        with live_reply.container():
+                            with st.chat_message("user"):
+                                st.write(prompt)
+                            with st.chat_message("assistant", avatar=ASSISTANT_AVATAR):
+                                placeholder = st.empty()
+                                completed_run = stream_run(
+                                    client, tool_dispatcher, st.session_state.thread_id, st.session_state.assistant_id,
+                                    execute_tool_call, instructions="Please address the user appropriately.",
+                                    state=stream_state, on_delta=lambda text: render_stream(placeholder, text)
+                                )
+                    except Exception as e:
+                        if stream_state.events:
+                            raise
+                        logging.warning(f"Streaming run failed before its first event, falling back to polling: {e}")
+                    finally:
+                        live_reply.empty()
+
+                if completed_run is None:
+                    # Create a run for the assistant to process the conversation
+                    run = client.beta.threads.runs.create(
+                        thread_id=st.session_state.thread_id,
+                        assistant_id=st.session_state.assistant_id,
+                        instructions="Please address the user appropriately."
+                    )
+
+                    # Wait for the run to complete
+                    completed_run = wait_on_run(run, st.session_state.thread_id)
+            except Exception as e:
+                # A 401 means the cached validation is stale - drop it so the next rerun re-checks the key
+                if openai_key_cache.invalidate_on_auth_error(st.session_state.openai_api_key, e):
+                    run_engine.forget_client(st.session_state.openai_api_key)
+                    st.error('The OpenAI API key was rejected. Please enter a correct key!', icon='⚠️')
+                logging.error(f"Error running the assistant: {e}")
+
+            # Keep the session from expiring; batched with the other sessions' writes
+            session_store.touch(st.session_state.session_id)
+
+            # Retrieve and display updated messages
+            display_messages(st.session_state.thread_id)
+
+if 'pending_run' in st.session_state:
+    show_pending_run()
+
+page_run.finish()
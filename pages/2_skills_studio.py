@@ -1,121 +1,47 @@
+import io
 import os
-import pandas as pd
 import streamlit as st
-from cfenv import AppEnv
-from hdbcli import dbapi
-from dotenv import load_dotenv
 import logging
 
-# Define a new logging level
-CUSTOM_INFO_LEVEL_NUM = 25
-logging.addLevelName(CUSTOM_INFO_LEVEL_NUM, "LOGGING")
-
-def custom_logger(self, message, *args, **kws):
-    if self.isEnabledFor(CUSTOM_INFO_LEVEL_NUM):
-        # Yes, logger takes its '*args' as 'args'.
-        self._log(CUSTOM_INFO_LEVEL_NUM, message, args, **kws) 
-
-# Add the new method to Logger class
-logging.Logger.custom_logger = custom_logger
-logging.basicConfig(level=CUSTOM_INFO_LEVEL_NUM)
+from octo_packages.bootstrap import bootstrap
+from octo_packages.logs import bind_log_context
+from octo_packages.db import get_pool
+from octo_packages.result_cache import CACHE_POLICIES, ensure_cache_columns
+from octo_packages.backup import ensure_backup_schema, get_backup_sync
+from octo_packages.catalog import ensure_catalog_schema
+from octo_packages import bundles, studio
+
+# Logger setup and .env are handled once per process
+process = bootstrap()
+page_run = process.begin_page('skills_studio')
 logger = logging.getLogger(__name__)
+# the chat window's session ID, when this browser session has opened it
+bind_log_context(st.session_state.get('session_id'))
 
-# Load .env file if it exists for local development
-load_dotenv()
-
-def get_db_credentials():
-    logger.custom_logger("Fetching database credentials")
-    # Check if running on Cloud Foundry
-    if 'VCAP_SERVICES' in os.environ:
-        logger.custom_logger("Running on Cloud Foundry")
-        env = AppEnv()
-        hana_service = env.get_service(label='hana')
-        credentials = hana_service.credentials
-        return credentials['host'], credentials['port'], credentials['user'], credentials['password']
-    else:
-        logger.custom_logger("Running locally")
-        # Load credentials from .env file or environment for local development
-        return os.getenv('HANA_HOST'), os.getenv('HANA_PORT'), os.getenv('HANA_USER'), os.getenv('HANA_PASSWORD')
-
-host, port, user, password = get_db_credentials()
+# Process-wide HANA pool, shared across pages, sessions and reruns
+pool = get_pool()
 
 try:
-    conn = dbapi.connect(address=host, port=int(port), user=user, password=password)
-    logger.custom_logger("Database connection established successfully")
+    ensure_cache_columns(pool)
 except Exception as e:
-    logging.error(f"Database connection failed: {e}")
+    logging.error(f"Failed to add cache policy columns to Skills: {e}")
 
-# Fetch data from the database 
-def fetch_data():
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM Skills")
-            columns = [desc[0] for desc in cursor.description]  # This will capture column names
-            data = cursor.fetchall()
-            df = pd.DataFrame(data, columns=columns)
-            return df
-    except Exception as e:
-        logging.error(f"Error fetching data: {e}")
-        return pd.DataFrame()
+try:
+    ensure_backup_schema(pool)
+except Exception as e:
+    logging.error(f"Failed to prepare the SKILLS_BACKUP sync tables: {e}")
 
-def insert_skill_data(skill_name, skill_description, parameters, python_function):
-    try:
-        with conn.cursor() as cursor:
-            insert_query = """
-            INSERT INTO Skills (SkillName, SkillDescription, Parameters, PythonFunction) 
-            VALUES (?, ?, ?, ?)
-            """
-            cursor.execute(insert_query, (skill_name, skill_description, parameters, python_function))
-            conn.commit()  # Important to commit the transaction
-            logger.custom_logger("Skill added successfully")
-            return "Skill added successfully!"
-    except Exception as e:
-        logging.error(f"Error inserting skill data: {e}")
-        return f"An error occurred: {e}"
+try:
+    ensure_catalog_schema(pool)
+except Exception as e:
+    logging.error(f"Failed to prepare the skill catalog version table: {e}")
 
-def delete_skill_data(skill_name):
-    try:
-        with conn.cursor() as cursor:
-            delete_query = "DELETE FROM Skills WHERE SkillName = ?"
-            cursor.execute(delete_query, (skill_name,))
-            conn.commit()
-            logger.custom_logger("Skill deleted successfully")
-            return "Skill deleted successfully!"
-    except Exception as e:
-        logging.error(f"Error deleting skill data: {e}")
-        return f"An error occurred: {e}"
+backup_sync = get_backup_sync(pool)
 
-def fetch_function_names():
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT SkillName FROM Skills")
-            result = cursor.fetchall()
-            function_names = [row[0] for row in result]
-            return function_names
-    except Exception as e:
-        logging.error(f"Error fetching function names: {e}")
-        return []
-    
-def update_skills_backup():
-    try:
-        with conn.cursor() as cursor:
-            update_query = """
-            INSERT INTO SKILLS_BACKUP
-            SELECT * FROM SKILLS
-            WHERE SkillID NOT IN (SELECT SkillID FROM SKILLS_BACKUP)
-            """
-            cursor.execute(update_query)
-            conn.commit()
-            logger.custom_logger("SKILLS_BACKUP table updated successfully")
-            return "SKILLS_BACKUP table updated successfully with new skills."
-    except Exception as e:
-        logging.error(f"Error updating SKILLS_BACKUP: {e}")
-        return f"An error occurred while updating SKILLS_BACKUP: {e}"
-    
 # Streamlit app
 st.title('Find, add and delete skills here')
 st.text("")
-st.markdown('➡️ Scroll right to see more details of each skill')
+st.markdown('➡️ Select a row to see the parameters and code of a skill')
 
 # Initialize session state for page tracking (need that to properly refresh the chat box when i switch pages)
 if 'current_page' not in st.session_state:
@@ -129,14 +55,46 @@ if 'previous_page' not in st.session_state:
 st.session_state.previous_page = st.session_state.current_page
 st.session_state.current_page = "skill_studio"
 
-# Fetch and display the data
-data = fetch_data()
-if not data.empty:
-    data = data.iloc[:, 1:]  # Drop the first column
-    st.dataframe(data, width=1100)
+# Browse the skills page by page; only the narrow columns are loaded for the list
+if 'skill_search' not in st.session_state:
+    st.session_state.skill_search = ''
+    st.session_state.skill_page_cursors = [None]  # SkillName after which each visited page starts
+
+search = st.text_input("🔎 Search skills", placeholder="Name or description")
+if search != st.session_state.skill_search:
+    st.session_state.skill_search = search
+    st.session_state.skill_page_cursors = [None]
+
+cursors = st.session_state.skill_page_cursors
+skills, has_more = studio.fetch_skill_page(pool, search, after=cursors[-1])
+if skills:
+    event = st.dataframe(
+        [{k: v for k, v in skill.items() if k != "SkillID"} for skill in skills],
+        width=1100, on_select="rerun", selection_mode="single-row", key=f"skill_page_{len(cursors)}",
+    )
 else:
+    event = None
     st.write("No data found.")
 
+col_prev, col_page, col_next = st.columns([1, 2, 1])
+if col_prev.button("⬅️ Previous", disabled=len(cursors) == 1):
+    cursors.pop()
+    st.rerun()
+col_page.write(f"Page {len(cursors)}")
+if col_next.button("Next ➡️", disabled=not has_more):
+    cursors.append(skills[-1]["SkillName"])
+    st.rerun()
+
+# Parameters and code are only fetched for the selected skill
+selected_rows = event.selection.rows if event is not None else []
+if selected_rows:
+    selected_skill = skills[selected_rows[0]]["SkillName"]
+    detail = studio.fetch_skill_detail(pool, selected_skill)
+    if detail is not None:
+        st.markdown(f"**{selected_skill}**")
+        st.code(detail["Parameters"] or "", language="json")
+        st.code(detail["PythonFunction"] or "", language="python")
+
 # Add Skill Button and Form
 st.text("")
 st.markdown('💉 Inject more skills into my brain')
@@ -181,27 +139,76 @@ with st.expander("➕ Add Skill"):
                         return json.dumps({\"location\": \"Paris\", \"temperature\": \"22\", \"unit\": \"celsius\"})
                     else:
                         return json.dumps({\"location\": location, \"temperature\": \"unknown\"})"""
-        python_function = st.text_area("Python Function", help="Define your python function to call your backend API or agent. If you want to use SAP credentials, simply pass in \"sap_api_key\" as one argument of your function.", placeholder=python_function_placeholder)
+        python_function = st.text_area("Python Function", help="Define your python function to call your backend API or agent. If you need a backend secret, add it as an argument ending in \"_api_key\", \"_token\", \"_secret\" or \"_password\" (e.g. \"sap_api_key\"); it is filled in from a bound Cloud Foundry service, the SAP_API_KEY environment variable or a .sap_credentials file. For HTTP calls, add an \"http_client\" argument and use it like requests (http_client.get(...)) to reuse pooled keep-alive connections.", placeholder=python_function_placeholder)
+
+        # Result caching, only for skills without side effects
+        cache_policy = st.selectbox("Cache Policy", CACHE_POLICIES, help="none: always call the skill. ttl: reuse results for identical arguments for the TTL below. lru: reuse results until they are evicted or the skill changes.")
+        cache_ttl = st.number_input("Cache TTL (seconds)", min_value=0, value=300, step=60)
 
         submit_button = st.form_submit_button("Submit")
 
         if submit_button:
             logger.custom_logger(f"Attempting to add skill: {skill_name}")
-            result = insert_skill_data(skill_name, skill_description, parameters, python_function)
+            result = studio.insert_skill_data(pool, skill_name, skill_description, parameters, python_function, cache_policy, int(cache_ttl))
             if result.startswith("Skill added successfully"):
                 st.success(result)
-                backup_update_result = update_skills_backup()
-                st.info(backup_update_result)
-                logger.custom_logger(f"Skill {skill_name} added and backup updated successfully")
+                # the incremental backup runs on a background thread, not in this rerun
+                backup_sync.request_sync()
+                st.info("SKILLS_BACKUP update scheduled.")
+                logger.custom_logger(f"Skill {skill_name} added and backup scheduled")
             else:
                 st.error(result)
                 logging.error(f"Error adding skill {skill_name}: {result}")
 
+# Bulk import/export of JSON or JSONL skill bundles
+with st.expander("📦 Import / Export Skills"):
+    bundle_file = st.file_uploader("Skill bundle", type=["json", "jsonl"], help="A JSON array or one JSON object per line with name, description, parameters, source and optionally cache_policy and cache_ttl.")
+    on_conflict = st.selectbox("Existing skills", bundles.ON_CONFLICT, help="error: reject the bundle. skip: keep the stored skill. replace: overwrite it.")
+    dry_run = st.checkbox("Only validate", value=False)
+    if st.button("Import bundle", disabled=bundle_file is None):
+        try:
+            # validated and written in one transaction, read in chunks rather than as a whole
+            report = bundles.import_bundle(pool, io.TextIOWrapper(bundle_file, encoding="utf-8"), on_conflict, dry_run)
+            st.success(f"{'Validated' if dry_run else 'Imported'}: {report['inserted']} new, {report['updated']} replaced, "
+                       f"{report['skipped']} skipped in {report['duration_ms']} ms.")
+            if not dry_run:
+                backup_sync.request_sync()
+            logger.custom_logger(f"Skill bundle {bundle_file.name} imported: {report}")
+        except bundles.BundleError as e:
+            st.error(str(e))
+            st.dataframe([{"#": position, "skill": name, "error": message} for position, name, message in e.errors], width=1100)
+        except Exception as e:
+            st.error(f"An error occurred: {e}")
+            logging.error(f"Error importing skill bundle: {e}")
+
+    export_format = st.radio("Export format", bundles.BUNDLE_FORMATS, horizontal=True)
+    if st.button("Prepare export"):
+        out = io.StringIO()
+        count = bundles.export_bundle(pool, out, export_format)
+        st.session_state.skill_export = (export_format, out.getvalue().encode("utf-8"), count)
+    if 'skill_export' in st.session_state:
+        export_format, payload, count = st.session_state.skill_export
+        st.download_button(f"Download {count} skills", payload, file_name=f"skills.{export_format}", mime="application/json")
+
+# Edit the result cache policy of an existing skill
+with st.expander("⏱️ Edit Cache Policy"):
+    with st.form("cache_policy_form"):
+        cache_skill = st.selectbox("Skill", studio.fetch_function_names(pool))
+        new_cache_policy = st.selectbox("Cache Policy", CACHE_POLICIES)
+        new_cache_ttl = st.number_input("Cache TTL (seconds)", min_value=0, value=300, step=60)
+        if st.form_submit_button("Update"):
+            result = studio.update_cache_policy(pool, cache_skill, new_cache_policy, int(new_cache_ttl))
+            if result.startswith("Cache policy updated successfully"):
+                st.success(result)
+                backup_sync.request_sync()
+            else:
+                st.error(result)
+
 # Dropdown for deleting a skill
 st.text("")
 st.markdown('🪦 Take a skill 6ft under')
 
-function_names = fetch_function_names()
+function_names = studio.fetch_function_names(pool)
 selected_function = st.selectbox("Select a function to delete", function_names)
 
 if 'confirm_delete' not in st.session_state:
@@ -214,13 +221,33 @@ if st.session_state.confirm_delete:
     st.write(f"Are you sure you want to delete the function '{selected_function}'?")
     col1, col2 = st.columns(2)
     if col1.button("Yes, delete it"):
-        delete_result = delete_skill_data(selected_function)
+        delete_result = studio.delete_skill_data(pool, selected_function)
         st.write(delete_result)
         st.session_state.confirm_delete = False
         logger.custom_logger(f"Function {selected_function} deleted: {delete_result}")
     if col2.button("No, cancel"):
         st.session_state.confirm_delete = False
 
-# Close the database connection
-conn.close()
-logger.custom_logger("Database connection closed")
+
+# Incremental SKILLS_BACKUP status
+st.text("")
+with st.expander("🗄️ Backup"):
+    try:
+        state = backup_sync.last_state()
+    except Exception as e:
+        state = None
+        logging.error(f"Error reading SKILLS_BACKUP state: {e}")
+    if state:
+        st.write(f"Last sync at {state['last_run_at']}: {state['rows_copied']} rows copied, "
+                 f"{state['tombstones']} tombstones, {state['duration_ms']} ms (watermark {state['watermark']})")
+    else:
+        st.write("No backup sync has run yet.")
+    if st.button("Sync now (including deletes)"):
+        try:
+            report = backup_sync.sync(reconcile_deletes=True)
+            st.success(f"{report['rows_copied']} rows copied and {report['tombstones']} tombstones written "
+                       f"in {report['duration_ms']} ms.")
+        except Exception as e:
+            st.error(f"An error occurred while updating SKILLS_BACKUP: {e}")
+
+page_run.finish()
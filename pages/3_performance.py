@@ -0,0 +1,130 @@
+import streamlit as st
+import pandas as pd
+import altair as alt
+
+from octo_packages.bootstrap import bootstrap
+from octo_packages.db import get_pool
+from octo_packages.catalog import get_catalog
+from octo_packages.skills import get_registry
+from octo_packages.dispatch_table import get_dispatch_table
+from octo_packages.polling import get_poller
+from octo_packages.tool_dispatch import get_dispatcher
+from octo_packages.openai_keys import get_key_cache
+from octo_packages.rate_limit import get_rate_limiter
+from octo_packages.session_store import get_session_store
+from octo_packages.result_cache import get_result_cache
+from octo_packages.http_pool import get_http_pool
+from octo_packages.engine import get_engine
+from octo_packages.sandbox import DEFAULT_MODE as SANDBOX_MODE, peek_sandbox
+from octo_packages.tracing import get_tracer
+from octo_packages.logs import logging_stats
+
+process = bootstrap()
+page_run = process.begin_page('performance')
+tracer = get_tracer()
+
+st.title('Performance')
+st.markdown('Spans recorded by this app instance since it started (in-memory ring buffer, newest entries win).')
+
+# Initialize session state for page tracking (need that to properly refresh the chat box when i switch pages)
+if 'current_page' not in st.session_state:
+    st.session_state.current_page = None
+
+if 'previous_page' not in st.session_state:
+    st.session_state.previous_page = None
+
+st.session_state.previous_page = st.session_state.current_page
+st.session_state.current_page = "performance"
+
+col_refresh, col_clear = st.columns([1, 1])
+with col_refresh:
+    st.button('🔄 Refresh')
+with col_clear:
+    if st.button('🗑️ Clear spans'):
+        tracer.clear()
+
+# Per-stage latency percentiles
+st.subheader('Latency per stage')
+summary = tracer.stage_summary()
+if summary:
+    stages = pd.DataFrame.from_dict(summary, orient='index')
+    stages.index.name = 'stage'
+    st.dataframe(stages.style.format({col: '{:.1f}' for col in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms')}))
+else:
+    st.write("No spans recorded yet. Send a prompt in the Enterprise Assistant first.")
+
+# Slowest chat turns and a waterfall for the selected one
+st.subheader('Slowest turns')
+turns = tracer.slowest_turns(limit=20)
+if turns:
+    st.dataframe(pd.DataFrame([{
+        'trace_id': turn.trace_id,
+        'started': pd.to_datetime(turn.start, unit='s'),
+        'duration_ms': turn.duration * 1000,
+        'spans': len(tracer.trace(turn.trace_id)),
+        'error': turn.error,
+    } for turn in turns]), width=1100)
+
+    trace_id = st.selectbox('Turn', [turn.trace_id for turn in turns])
+    spans = tracer.trace(trace_id)
+    origin = min(span.start for span in spans)
+    waterfall = pd.DataFrame([{
+        'span': f"{i:02d} {span.name}",
+        'stage': span.stage,
+        'start_ms': (span.start - origin) * 1000,
+        'end_ms': (span.start - origin + span.duration) * 1000,
+        'duration_ms': span.duration * 1000,
+    } for i, span in enumerate(spans)])
+    chart = alt.Chart(waterfall).mark_bar().encode(
+        x=alt.X('start_ms:Q', title='ms since turn start'),
+        x2='end_ms:Q',
+        y=alt.Y('span:N', sort=None, title=None),
+        color='stage:N',
+        tooltip=['span', 'stage', alt.Tooltip('duration_ms:Q', format='.1f')],
+    ).properties(height=max(120, 22 * len(spans)))
+    st.altair_chart(chart)
+else:
+    st.write("No chat turns recorded yet.")
+
+# Counters of the process-wide components
+st.subheader('Components')
+components = {
+    'HANA pool': get_pool().metrics(),
+    'Run poller': get_poller().stats(),
+    'Tool dispatcher': get_dispatcher().stats(),
+    'Run engine': get_engine().stats(),
+    'Skill result cache': get_result_cache().stats(),
+    'Skill catalog': get_catalog(get_pool()).stats(),
+    'Session store': get_session_store(get_pool()).stats(),
+    'Skill dispatch table': get_dispatch_table(get_registry()).stats(),
+    'Logging': logging_stats(),
+    'HTTP pool': get_http_pool().stats(),
+    'OpenAI key cache': get_key_cache().stats(),
+    'OpenAI rate limiter': get_rate_limiter().stats(),
+}
+# peek only: opening this page must not start the worker processes
+skill_sandbox = peek_sandbox()
+if skill_sandbox is not None:
+    components['Skill sandbox'] = skill_sandbox.stats()
+else:
+    components['Skill sandbox'] = {'mode': SANDBOX_MODE, 'state': 'not started' if SANDBOX_MODE == 'process' else 'inline'}
+for title, stats in components.items():
+    with st.expander(title):
+        st.json(stats)
+
+# One-time process setup, first-import cost of the heavy dependencies and per-page script runs
+st.subheader('Startup')
+startup = process.startup_report()
+st.write(f"Process setup took {startup['setup_ms']:.1f} ms, up {startup['uptime_s'] / 60:.0f} min, "
+         f"{startup['rss_mb']:.0f} MB RSS ({startup['rss_after_setup_mb']:.0f} MB after setup), "
+         f"{startup['modules_loaded']} modules loaded.")
+if startup['lazy_imports_ms']:
+    imports = pd.DataFrame(list(startup['lazy_imports_ms'].items()), columns=['module', 'first_import_ms'])
+    st.dataframe(imports.style.format({'first_import_ms': '{:.1f}'}))
+if startup['pages']:
+    pages = pd.DataFrame.from_dict(startup['pages'], orient='index')
+    pages.index.name = 'page'
+    st.dataframe(pages.style.format({col: '{:.1f}' for col in ('cold_ms', 'cold_rss_delta_mb', 'last_ms', 'max_ms', 'rss_mb')},
+                                    na_rep='-'))
+
+page_run.finish()
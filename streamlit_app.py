@@ -1,10 +1,12 @@
 import streamlit as st
-import os
-from dotenv import load_dotenv
-from openai import OpenAI
 
 from st_pages import Page, show_pages, add_page_title
 
+from octo_packages.bootstrap import bootstrap
+
+process = bootstrap()
+page_run = process.begin_page('home')
+
 # App title
 st.set_page_config(page_title="Enterprise Assistant", page_icon="💎", layout = 'wide', initial_sidebar_state = 'auto')
 
@@ -34,7 +36,8 @@ show_pages(
     [
         Page("streamlit_app.py", "Home", "🏠"),
         Page("pages/1_chat_window.py", "Enterprise Assistant", "💬"),
-        Page("pages/2_skills_studio.py", "Skill Studio", "👩‍💻")
+        Page("pages/2_skills_studio.py", "Skill Studio", "👩‍💻"),
+        Page("pages/3_performance.py", "Performance", "📈")
     ]
 )
 
@@ -47,4 +50,6 @@ st.markdown('📖 Here\'s where you can generate your OpenAI API key: https://he
 
 st.markdown('<br>', unsafe_allow_html=True)
 
-st.markdown('🐙 Github: Here\'s the link to the project on Github: https://github.com/JHFVR/glowing-octo-enigma/')
\ No newline at end of file
+st.markdown('🐙 Github: Here\'s the link to the project on Github: https://github.com/JHFVR/glowing-octo-enigma/')
+
+page_run.finish()
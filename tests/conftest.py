@@ -0,0 +1,21 @@
+import pytest
+
+from benchmarks.fakes import FakeHana
+from octo_packages import backup, catalog, result_cache
+from octo_packages.db import ConnectionPool
+
+
+@pytest.fixture
+def hana(tmp_path, monkeypatch):
+    # each test gets a fresh database, so the once-per-process schema checks have to run again
+    monkeypatch.setattr(backup, '_schema_ready', False)
+    monkeypatch.setattr(catalog, '_schema_ready', False)
+    monkeypatch.setattr(result_cache, '_columns_ready', False)
+    return FakeHana(str(tmp_path / 'hana.sqlite3'))
+
+
+@pytest.fixture
+def pool(hana):
+    pool = ConnectionPool(hana.connect, ping_query="SELECT 1 FROM DUMMY")
+    yield pool
+    pool.close()
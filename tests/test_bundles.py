@@ -0,0 +1,41 @@
+import io
+import json
+
+import pytest
+
+from octo_packages import bundles
+
+SOURCE = "def {name}(value=None):\n    return {{'value': value}}\n"
+
+
+def bundle(*names):
+    return io.StringIO('\n'.join(json.dumps({
+        'name': name, 'parameters': {'type': 'object', 'properties': {}}, 'source': SOURCE.format(name=name),
+    }) for name in names))
+
+
+def skill_names(pool):
+    with pool.cursor() as cursor:
+        cursor.execute("SELECT SkillName FROM Skills ORDER BY SkillName")
+        return [row[0] for row in cursor.fetchall()]
+
+
+def test_import_writes_every_batch(pool):
+    report = bundles.import_bundle(pool, bundle('skill_a', 'skill_b', 'skill_c'), batch_size=2)
+    assert report['inserted'] == 3
+    assert skill_names(pool) == ['skill_a', 'skill_b', 'skill_c']
+
+
+def test_failure_in_a_later_batch_writes_nothing(hana, pool):
+    bundles.import_bundle(pool, bundle('existing'))
+    hana.fail_on(r'^\s*INSERT INTO Skills', skip=1)
+    with pytest.raises(Exception, match='injected failure'):
+        bundles.import_bundle(pool, bundle('skill_a', 'skill_b', 'skill_c', 'skill_d'), batch_size=2)
+    assert skill_names(pool) == ['existing']
+
+
+def test_malformed_entry_is_rejected_without_reading_the_rest():
+    stream = io.StringIO('{"name": "a", oops}\n' + '{"name": "b"}\n' * 100000)
+    with pytest.raises(json.JSONDecodeError):
+        next(bundles.iter_bundle(stream, chunk_size=1024))
+    assert stream.tell() == 1024
@@ -0,0 +1,18 @@
+import json
+
+from octo_packages.credentials import CredentialProvider
+from octo_packages.dispatch_table import DispatchTable
+from octo_packages.skills import SkillRegistry
+
+SOURCE = "def list_items(page_token=None, github_token=None):\n    return page_token, github_token\n"
+
+
+def test_declared_parameters_are_never_replaced_by_secrets():
+    registry = SkillRegistry()
+    schema = {'type': 'object', 'properties': {'page_token': {'type': 'string'}}}
+    registry.sync([('list_items', SOURCE)], {'list_items': json.dumps(schema)})
+    credentials = CredentialProvider({'page_token': 'env', 'github_token': 'secret'}, environ={}, vcap_services='{}')
+    entry = DispatchTable(registry, credentials).get('list_items')
+
+    kwargs = entry.arguments({'page_token': 'next', 'github_token': 'from the model'})
+    assert kwargs == {'page_token': 'next', 'github_token': 'secret'}
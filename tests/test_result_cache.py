@@ -0,0 +1,23 @@
+import json
+
+from octo_packages.result_cache import SkillResultCache
+
+
+def test_error_payloads_are_not_cached():
+    cache = SkillResultCache()
+    cache.set_policies({'fetch': ('ttl', 300)})
+    responses = iter([{"error": "Request failed with status code 500"}, json.dumps({"rate": 1.1})])
+
+    first = cache.call('fetch', 'hash', {}, lambda: next(responses))
+    assert json.loads(first)['error']
+    assert json.loads(cache.call('fetch', 'hash', {}, lambda: next(responses))) == {"rate": 1.1}
+    assert json.loads(cache.call('fetch', 'hash', {}, lambda: next(responses))) == {"rate": 1.1}
+    assert cache.stats()['errors_not_cached'] == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_error_payloads_can_be_cached_on_request():
+    cache = SkillResultCache(cache_errors=True)
+    cache.set_policies({'fetch': ('lru', None)})
+    cache.call('fetch', 'hash', {}, lambda: '{"error": "not found"}')
+    assert cache.call('fetch', 'hash', {}, lambda: 'fresh') == '{"error": "not found"}'
@@ -0,0 +1,23 @@
+import logging
+
+from octo_packages.skills import SkillRegistry
+
+CALLER = "def caller(x):\n    logger.info('calling')\n    return helper(x) + len(pd.DataFrame({'a': [1, 2]}))\n"
+HELPER_V1 = "def helper(x):\n    return x * 10\n"
+HELPER_V2 = "def helper(x):\n    return x * 100\n"
+
+
+def test_skills_see_page_imports_and_each_other():
+    registry = SkillRegistry()
+    registry.sync([('caller', CALLER), ('helper', HELPER_V1)])
+    assert registry.get('caller')(1) == 12
+
+    registry.sync([('caller', CALLER), ('helper', HELPER_V2)])
+    assert registry.get('caller')(1) == 102
+
+
+def test_names_no_namespace_provides_are_reported(caplog):
+    registry = SkillRegistry()
+    with caplog.at_level(logging.WARNING, logger='octo_packages.skills'):
+        registry.sync([('uses_page', "def uses_page():\n    return conn.cursor()\n")])
+    assert 'uses_page uses conn' in caplog.text
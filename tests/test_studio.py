@@ -0,0 +1,43 @@
+from octo_packages import studio
+from octo_packages.catalog import ensure_catalog_schema, read_catalog_version
+
+SOURCE = "def {name}():\n    return 'ok'\n"
+
+
+def catalog_version(pool):
+    with pool.cursor() as cursor:
+        return read_catalog_version(cursor)
+
+
+def skill_row(pool, name):
+    with pool.cursor() as cursor:
+        cursor.execute("SELECT SkillName, CachePolicy FROM Skills WHERE SkillName = ?", (name,))
+        return cursor.fetchone()
+
+
+def test_failed_delete_keeps_the_skill(hana, pool):
+    ensure_catalog_schema(pool)
+    studio.insert_skill_data(pool, 'doomed', '', '{}', SOURCE.format(name='doomed'))
+    version = catalog_version(pool)
+    hana.fail_on(r'^\s*UPDATE SKILL_CATALOG_VERSION')
+
+    assert studio.delete_skill_data(pool, 'doomed').startswith("An error occurred")
+    assert skill_row(pool, 'doomed') is not None
+    assert catalog_version(pool) == version
+
+
+def test_failed_cache_policy_update_changes_nothing(hana, pool):
+    ensure_catalog_schema(pool)
+    studio.insert_skill_data(pool, 'cached', '', '{}', SOURCE.format(name='cached'))
+    hana.fail_on(r'^\s*UPDATE SKILL_CATALOG_VERSION')
+
+    assert studio.update_cache_policy(pool, 'cached', 'ttl', 60).startswith("An error occurred")
+    assert skill_row(pool, 'cached') == ('cached', 'none')
+
+
+def test_failed_insert_writes_nothing(hana, pool):
+    ensure_catalog_schema(pool)
+    hana.fail_on(r'^\s*UPDATE SKILL_CATALOG_VERSION')
+
+    assert studio.insert_skill_data(pool, 'orphan', '', '{}', SOURCE.format(name='orphan')).startswith("An error")
+    assert skill_row(pool, 'orphan') is None
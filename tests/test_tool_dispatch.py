@@ -0,0 +1,39 @@
+import json
+import time
+import threading
+from types import SimpleNamespace
+
+from octo_packages.tool_dispatch import ToolCallDispatcher
+
+
+def tool_call(call_id, name):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments='{}'))
+
+
+def test_hung_skill_does_not_block_healthy_ones():
+    release = threading.Event()
+
+    def execute(call):
+        if call.function.name == 'hangs':
+            release.wait(10)
+            return 'late'
+        return 'ok'
+
+    dispatcher = ToolCallDispatcher(max_workers=4, default_timeout=0.1, max_stuck=2)
+    try:
+        for i in range(2):
+            outputs = dispatcher.dispatch([tool_call(f'hang{i}', 'hangs')], execute)
+            assert json.loads(outputs[0]['output'])['error_type'] == 'timeout'
+        assert dispatcher.stats()['stuck_by_tool'] == {'hangs': 2}
+
+        outputs = dispatcher.dispatch([tool_call('hang2', 'hangs'), tool_call('fine', 'healthy')], execute)
+        assert json.loads(outputs[0]['output'])['error_type'] == 'unavailable'
+        assert outputs[1]['output'] == 'ok'
+        assert dispatcher.stats()['rejected'] == 1
+    finally:
+        release.set()
+    deadline = time.monotonic() + 5
+    while dispatcher.stats()['stuck_workers'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert dispatcher.stats()['stuck_workers'] == 0
+    assert dispatcher.dispatch([tool_call('hang3', 'hangs')], execute)[0]['output'] == 'late'